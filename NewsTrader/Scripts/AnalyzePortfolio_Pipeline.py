@@ -20,6 +20,10 @@ if __name__ == "__main__":
         config.QUICK_ANALYSIS = True
         print("[QUICK] Using real LLM with debug input files only (Open_Positions_Debug.xlsx, Watch_Positions_Debug.xlsx).")
 
+    if "--llm-batch" in sys.argv:
+        config.LLM_BATCH = True
+        print("[BATCH] Analysis prompts are sent as one provider batch (results may take minutes to hours).")
+
     if "--model-check" in sys.argv:
         print("Model check: loading env.txt and verifying LLM...")
         config.load_env_keys()
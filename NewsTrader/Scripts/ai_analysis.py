@@ -2,8 +2,6 @@
 import json
 import os
 import re
-import asyncio
-import requests
 from datetime import datetime
 from pathlib import Path
 from typing import Literal
@@ -11,6 +9,7 @@ from typing import Literal
 from pydantic import BaseModel
 
 import config
+import http_client
 import llm_provider
 
 # Debug capture for QUICK_ANALYSIS: model, multistep, prompt(s), response(s)
@@ -67,7 +66,9 @@ async def troubleshoot_no_price(asset):
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
             }
-            resp = await asyncio.to_thread(requests.get, url, headers=headers, timeout=5)
+            resp = await http_client.get(url, headers=headers, timeout=5)
+            if resp.status_code != 200:
+                raise RuntimeError(f"HTTP {resp.status_code}")
             titles = re.findall(r'<h3 class="LC20lb MBeuO DKV0Md">(.*?)</h3>', resp.text)
             if not titles:
                 titles = re.findall(r"<h3[^>]*>(.*?)</h3>", resp.text)
@@ -579,28 +580,21 @@ async def analyze_data(asset_info, collected_data, all_portfolio_data):
     if target_pos_size_eur < 1000:
         target_pos_size_eur = 1000
 
-    def _build_prompt(include_json_block: bool) -> str:
-        base = f"""
+    def _build_prompt(include_json_block: bool) -> tuple[str, str]:
+        """
+        Return (prefix, suffix). The prefix (role, task, format rules) depends only
+        on the date and the portfolio totals, so it is identical for every asset of
+        a run and can be served from the provider's prompt cache. The suffix holds
+        the asset's positions and market data.
+        """
+        prefix = f"""
 ROLE: Senior Portfolio Manager.
 INSTRUCTION: Never be sycophantic. Prioritize factual accuracy and logical consistency over politeness or agreement. If I make a wrong assumption or have a bad idea, correct me directly without hedging ('That's an interesting question...'). If you're uncertain, say so instead of hallucinating. Do not simulate emotions. Be a critical auditor, not an assistant. Avoid grade inflation when evaluating my texts.
 
 DATE: {today_date}
 
-ASSET: {asset_info.get('Asset')} ({asset_info.get('Ticker')})
-ISIN: {asset_info.get('ISIN')}
-POSITIONS_DATA:
-{pnl_info}
-
-MARKET_DATA:
-{json.dumps(collected_data, indent=2, default=str)}
-
-PORTFOLIO_CONTEXT:
-Total Portfolio Capital: {total_invest:.2f} EUR
-Current Position Value: {current_invest:.2f} EUR ({current_allocation_pct:.1f}% of Portfolio)
-Target Position Sizing: ~5% ({target_pos_size_eur:.2f} EUR) per asset for diversification.
-
 TASK:
-1. Analyze the asset based on TODAY's news.
+1. Analyze the asset below based on TODAY's news.
 2. Provide a concrete TRADING RECOMMENDATION to balance the portfolio.
    - Target allocation per asset should be ~3-5% OF TOTAL PORTFOLIO VALUE.
    - IMPORTANT: The 5% refers to the TOTAL portfolio value, NOT the value of the individual position!
@@ -618,7 +612,7 @@ FORMAT:
 - If no news: "No current headlines."
 """
         if include_json_block:
-            base += f"""
+            prefix += f"""
 
 OUTPUT (JSON):
 {{
@@ -631,7 +625,21 @@ OUTPUT (JSON):
   "stop_loss": <number or null>
 }}
 """
-        return base.strip()
+        suffix = f"""
+ASSET: {asset_info.get('Asset')} ({asset_info.get('Ticker')})
+ISIN: {asset_info.get('ISIN')}
+POSITIONS_DATA:
+{pnl_info}
+
+MARKET_DATA:
+{json.dumps(collected_data, indent=2, default=str)}
+
+PORTFOLIO_CONTEXT:
+Total Portfolio Capital: {total_invest:.2f} EUR
+Current Position Value: {current_invest:.2f} EUR ({current_allocation_pct:.1f}% of Portfolio)
+Target Position Sizing: ~5% ({target_pos_size_eur:.2f} EUR) per asset for diversification.
+"""
+        return prefix.strip() + "\n\n", suffix.strip()
 
     def _try_parse_response(response_text: str) -> dict | None:
         """Extract JSON from response, or None if not found."""
@@ -650,6 +658,23 @@ OUTPUT (JSON):
                 return None
 
     try:
+        if llm_provider.batch_active():
+            prefix, suffix = _build_prompt(include_json_block=True)
+            prompt_batch = prefix + suffix
+            response_text = await llm_provider.ainvoke_batch(suffix, max_tokens=1000, prefix=prefix)
+            _record_llm_entry(asset_name, False, {"prompt": prompt_batch, "response": response_text})
+            data = _try_parse_response(response_text) or _regex_extract(response_text)
+            if data is None:
+                print(f"    No JSON found in AI batch response for {asset_name}")
+                return _build_failure_result(REQUIRED_FIELDS, response_text[:200], asset_name)
+            data = _normalize_analysis_keys(data)
+            is_valid, missing = _validate_analysis_result(data)
+            if is_valid:
+                return data
+            lenient = _lenient_parse(data)
+            print(f"    Analysis incomplete for {asset_name}: missing or invalid fields {missing}.")
+            return lenient
+
         if _use_multi_step():
             result = await _run_multi_step_analysis(
                 asset_info,
@@ -676,9 +701,10 @@ OUTPUT (JSON):
                 return lenient
             print(f"    Multi-step failed for {asset_name}, falling back to single-prompt.")
 
-        prompt_structured = _build_prompt(include_json_block=False)
+        prefix, suffix = _build_prompt(include_json_block=False)
+        prompt_structured = prefix + suffix
         result = await llm_provider.ainvoke_structured(
-            prompt_structured, AnalysisResult, max_tokens=1000
+            suffix, AnalysisResult, max_tokens=1000, prefix=prefix
         )
         if result is not None:
             res_dict = result.model_dump() if hasattr(result, "model_dump") else dict(result)
@@ -693,8 +719,9 @@ OUTPUT (JSON):
                 )
             return lenient
 
-        prompt_fallback = _build_prompt(include_json_block=True)
-        response_text = await llm_provider.ainvoke(prompt_fallback, max_tokens=1000)
+        prefix, suffix = _build_prompt(include_json_block=True)
+        prompt_fallback = prefix + suffix
+        response_text = await llm_provider.ainvoke(suffix, max_tokens=1000, prefix=prefix)
 
         data = _try_parse_response(response_text)
         if data is not None:
@@ -716,7 +743,7 @@ OUTPUT (JSON):
             return lenient
 
         print(f"    Retrying with lower temperature for {asset_name}...")
-        retry_text = await llm_provider.ainvoke_retry(prompt_fallback, max_tokens=400)
+        retry_text = await llm_provider.ainvoke_retry(suffix, max_tokens=400, prefix=prefix)
         data = _try_parse_response(retry_text)
         if data is not None:
             _record_llm_entry(asset_name, False, {"prompt": prompt_fallback, "response": retry_text})
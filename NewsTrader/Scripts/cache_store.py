@@ -0,0 +1,203 @@
+"""Persistent key/value cache stores shared by the pipeline caches.
+
+Two backends with the same small interface (get / set / delete / keys / flush / close):
+  JsonCacheStore   - one JSON object per file (format unchanged, readable by older scripts).
+                     Writes go to a temp file and are renamed into place under a
+                     cross-process lock; pending keys are merged with the file on disk.
+  SqliteCacheStore - one row per key with upserts; no full rewrite and constant
+                     lookup time as the cache grows to thousands of entries.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+class FileLock:
+    """Cross-process exclusive lock on a sidecar '<path>.lock' file."""
+
+    def __init__(self, path: str, timeout: float = LOCK_TIMEOUT):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self._fh = None
+
+    def __enter__(self):
+        lock_dir = os.path.dirname(self.lock_path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._fh = open(self.lock_path, "a+")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._fh.close()
+                    self._fh = None
+                    raise TimeoutError(f"Could not lock {self.lock_path} within {self.timeout}s")
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if os.name == "nt":
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fh.close()
+            self._fh = None
+        return False
+
+
+def _read_json(path: str) -> dict:
+    """Read a JSON object from path; {} if missing or unreadable."""
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+    except Exception:
+        pass
+    return {}
+
+
+def atomic_write_json(path: str, data) -> None:
+    """Write JSON to a temp file in the same folder, then rename it over path."""
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class JsonCacheStore:
+    """Whole-file JSON store. Loaded once; flush() merges pending changes atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = _read_json(path)
+        self._dirty: set[str] = set()
+        self._deleted: set[str] = set()
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        self._data[key] = value
+        self._dirty.add(key)
+        self._deleted.discard(key)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self._dirty.discard(key)
+        self._deleted.add(key)
+
+    def keys(self) -> list[str]:
+        return list(self._data.keys())
+
+    def flush(self) -> None:
+        """Merge pending keys into the file on disk (other runs' keys are kept)."""
+        if not self._dirty and not self._deleted:
+            return
+        with FileLock(self.path):
+            on_disk = _read_json(self.path)
+            for key in self._deleted:
+                on_disk.pop(key, None)
+            for key in self._dirty:
+                on_disk[key] = self._data[key]
+            atomic_write_json(self.path, on_disk)
+            self._data = on_disk
+        self._dirty.clear()
+        self._deleted.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SqliteCacheStore:
+    """SQLite-backed store: one row per key, per-key upserts, no full rewrites."""
+
+    def __init__(self, path: str):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str, default=None):
+        row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return default
+
+    def set(self, key: str, value) -> None:
+        self._conn.execute(
+            "INSERT INTO cache (key, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (key, json.dumps(value, ensure_ascii=False), time.time()),
+        )
+
+    def delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT key FROM cache")]
+
+    def flush(self) -> None:
+        """Writes are committed per key; nothing to do."""
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def open_cache_store(json_path: str, backend: str | None = None):
+    """
+    Open a cache store for json_path. backend: 'json' (default) or 'sqlite'.
+    The SQLite file sits next to the JSON file ('.sqlite' extension) and imports
+    the JSON entries once when it is created.
+    """
+    backend = (backend or "json").strip().lower()
+    if backend != "sqlite":
+        return JsonCacheStore(json_path)
+    sqlite_path = os.path.splitext(json_path)[0] + ".sqlite"
+    is_new = not os.path.exists(sqlite_path)
+    store = SqliteCacheStore(sqlite_path)
+    if is_new:
+        for key, value in _read_json(json_path).items():
+            store.set(key, value)
+    return store
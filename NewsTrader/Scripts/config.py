@@ -3,16 +3,24 @@ import os
 import sys
 
 # --- CLI OVERRIDES ---
-# Parsed from --provider=, --mode=, --multistep=, --multistep_thr=
+# Parsed from --provider=, --mode=, --multistep=, --multistep_thr=, --concurrency=,
+# --llm-concurrency=, --price-search=, --max-quote-age=, --news-batch=, --llm-cache=
 # Applied after load_env_keys(); overrides env.txt.
 
 
 def apply_cli_overrides():
     """Parse CLI args and override os.environ. Call after load_env_keys()."""
+    global CONCURRENCY, LLM_CONCURRENCY, MAX_QUOTE_AGE, NEWS_BATCH
     provider = None
     mode = None
     multistep = None
     multistep_thr = None
+    concurrency = None
+    llm_concurrency = None
+    price_search = None
+    max_quote_age = None
+    news_batch = None
+    llm_cache = None
     for arg in sys.argv[1:]:
         if arg.startswith("--provider="):
             provider = arg.split("=", 1)[1].strip().lower()
@@ -22,6 +30,18 @@ def apply_cli_overrides():
             multistep = arg.split("=", 1)[1].strip().lower()
         elif arg.startswith("--multistep_thr="):
             multistep_thr = arg.split("=", 1)[1].strip()
+        elif arg.startswith("--concurrency="):
+            concurrency = arg.split("=", 1)[1].strip()
+        elif arg.startswith("--llm-concurrency="):
+            llm_concurrency = arg.split("=", 1)[1].strip()
+        elif arg.startswith("--price-search="):
+            price_search = arg.split("=", 1)[1].strip().lower()
+        elif arg.startswith("--max-quote-age="):
+            max_quote_age = arg.split("=", 1)[1].strip()
+        elif arg.startswith("--news-batch="):
+            news_batch = arg.split("=", 1)[1].strip()
+        elif arg.startswith("--llm-cache="):
+            llm_cache = arg.split("=", 1)[1].strip().lower()
 
     if provider:
         os.environ["AI_PROVIDER"] = provider
@@ -45,6 +65,36 @@ def apply_cli_overrides():
             print(f"  CLI override: AI_MULTI_STEP_THRESHOLD={multistep_thr}")
         except ValueError:
             pass
+    if price_search in ("serial", "hedged"):
+        os.environ["PRICE_SEARCH_MODE"] = price_search
+        print(f"  CLI override: PRICE_SEARCH_MODE={price_search}")
+    if llm_cache in ("off", "read", "readwrite"):
+        os.environ["LLM_CACHE"] = llm_cache
+        print(f"  CLI override: LLM_CACHE={llm_cache}")
+    if max_quote_age is not None:
+        try:
+            MAX_QUOTE_AGE = max(0, int(max_quote_age))
+            print(f"  CLI override: MAX_QUOTE_AGE={MAX_QUOTE_AGE}s")
+        except ValueError:
+            pass
+    if concurrency is not None:
+        try:
+            CONCURRENCY = max(1, int(concurrency))
+            print(f"  CLI override: CONCURRENCY={CONCURRENCY}")
+        except ValueError:
+            pass
+    if llm_concurrency is not None:
+        try:
+            LLM_CONCURRENCY = max(1, int(llm_concurrency))
+            print(f"  CLI override: LLM_CONCURRENCY={LLM_CONCURRENCY}")
+        except ValueError:
+            pass
+    if news_batch is not None:
+        try:
+            NEWS_BATCH = max(1, int(news_batch))
+            print(f"  CLI override: NEWS_BATCH={NEWS_BATCH}")
+        except ValueError:
+            pass
 
 
 def get_model_display_name() -> str:
@@ -76,6 +126,12 @@ else:
     WEB_PRICE_CACHE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     WEB_PRICE_CACHE_FILE = os.path.join(WEB_PRICE_CACHE_DIR, "web_price_cache.json")
 
+# Quote cache (recent prices reused by repeated runs), next to the web price cache
+QUOTE_CACHE_FILE = os.path.join(os.path.dirname(WEB_PRICE_CACHE_FILE), "quote_cache.json")
+SOURCE_RANKING_FILE = os.path.join(os.path.dirname(WEB_PRICE_CACHE_FILE), "source_ranking.json")
+HTTP_CACHE_DIR = os.path.join(os.path.dirname(WEB_PRICE_CACHE_FILE), "http_cache")
+LLM_CACHE_FILE = os.path.join(os.path.dirname(WEB_PRICE_CACHE_FILE), "llm_cache.json")
+
 # --- GLOBAL STATE ---
 Global_EURUSD = None  # Must be fetched at runtime
 
@@ -91,6 +147,20 @@ DUMMY_ANALYSIS = False
 # When True: use real LLM but debug input files only; output with _DEBUG suffix (quick sanity check)
 QUICK_ANALYSIS = False
 
+# Pipeline stage widths: CONCURRENCY assets fetched at once (network bound),
+# LLM_CONCURRENCY assets analyzed at once (LLM bound; None = same as CONCURRENCY).
+CONCURRENCY = 1
+LLM_CONCURRENCY = None
+
+# Max age (seconds) of a cached quote to reuse. None = market-aware TTL (QUOTE_CACHE_TTL); 0 = always fetch
+MAX_QUOTE_AGE = None
+
+# Google News: asset names per OR query (1 = one query per asset)
+NEWS_BATCH = 1
+
+# When True (--llm-batch): analysis prompts go through the provider's batch API
+LLM_BATCH = False
+
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding="utf-8")
 
@@ -1,19 +1,189 @@
 """Data providers: Tiingo, Alpaca, forex rate."""
+import atexit
+import itertools
 import json
 import os
 import subprocess
 import sys
-import asyncio
-import requests
 import re
+import threading
 
 import config
+import http_client
+
+TIINGO_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiingo_worker.py")
+TIINGO_WORKER_START_TIMEOUT = 30
+TIINGO_WORKER_CALL_TIMEOUT = 60
+# Worker timeouts/deaths in a row before Tiingo calls use only the runner subprocess
+TIINGO_WORKER_MAX_FAILURES = 3
+
+
+class TiingoWorkerError(RuntimeError):
+    """The Tiingo worker process could not be started or died."""
+
+
+class TiingoWorker:
+    """
+    Client for a long-lived worker process speaking line-delimited JSON
+    (see tiingo_worker.py). Thread-safe: concurrent calls are multiplexed by
+    request id and answered by a reader thread. A dead worker is restarted on
+    the next call.
+    """
+
+    def __init__(self, argv: list, cwd: str | None = None, env: dict | None = None,
+                 start_timeout: float = TIINGO_WORKER_START_TIMEOUT,
+                 call_timeout: float = TIINGO_WORKER_CALL_TIMEOUT):
+        self.argv = argv
+        self.cwd = cwd
+        self.env = env
+        self.start_timeout = start_timeout
+        self.call_timeout = call_timeout
+        self.restarts = 0
+        self._started = False
+        self._proc = None
+        self._lock = threading.Lock()
+        self._pending: dict = {}
+        self._ids = itertools.count(1)
+
+    def _start(self):
+        proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            cwd=self.cwd,
+            env=self.env,
+        )
+        ready = {"event": threading.Event(), "response": None}
+        self._pending[None] = ready
+        threading.Thread(target=self._read_loop, args=(proc,), daemon=True).start()
+        if not ready["event"].wait(self.start_timeout) or not (ready["response"] or {}).get("ready"):
+            self._pending.pop(None, None)
+            proc.kill()
+            err = (ready["response"] or {}).get("error") or "no ready message"
+            raise TiingoWorkerError(f"Tiingo worker did not start: {err}")
+        self._pending.pop(None, None)
+        self._proc = proc
+
+    def _read_loop(self, proc):
+        for line in proc.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            slot = self._pending.get(response.get("id"))
+            if slot is not None:
+                slot["response"] = response
+                slot["event"].set()
+        # EOF: worker exited; fail everything still waiting on this process
+        for slot in list(self._pending.values()):
+            if slot.get("proc") in (proc, None) and not slot["event"].is_set():
+                slot["response"] = {"error": "Tiingo worker exited", "worker_died": True}
+                slot["event"].set()
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+
+    def _send(self, cmd: str, args: dict):
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                if self._started:
+                    self.restarts += 1
+                self._proc = None
+                self._start()
+                self._started = True
+            req_id = next(self._ids)
+            slot = {"event": threading.Event(), "response": None, "proc": self._proc}
+            self._pending[req_id] = slot
+            try:
+                self._proc.stdin.write(json.dumps({"id": req_id, "cmd": cmd, "args": args}) + "\n")
+                self._proc.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError):
+                self._pending.pop(req_id, None)
+                self._proc = None
+                return None
+        return req_id, slot
+
+    def call(self, cmd: str, **args):
+        """Send one request and wait for its response. Retries once if the worker died."""
+        for _ in range(2):
+            sent = self._send(cmd, args)
+            if sent is None:
+                continue
+            req_id, slot = sent
+            try:
+                if not slot["event"].wait(self.call_timeout):
+                    raise TiingoWorkerError(f"Tiingo worker timeout ({cmd})")
+            finally:
+                self._pending.pop(req_id, None)
+            response = slot["response"]
+            if response.get("worker_died"):
+                continue
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response.get("result")
+        raise TiingoWorkerError(f"Tiingo worker died during {cmd}")
+
+    def close(self):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=5)
+            except Exception:
+                proc.kill()
+
 
 # --- TIINGO ---
 if config.MCP_BASE and os.name != "nt":
     TIINGO_MCP_PATH = os.path.join(config.MCP_BASE, "tiingo-mcp-server")
     TIINGO_PYTHON = os.path.join(TIINGO_MCP_PATH, ".venv", "bin", "python")
     TIINGO_RUNNER = os.path.join(TIINGO_MCP_PATH, "tiingo_runner.py")
+    _TIINGO_WORKER = None
+    _TIINGO_WORKER_FAILURES = 0
+
+    def _tiingo_worker_enabled() -> bool:
+        return os.environ.get("TIINGO_WORKER", "on").strip().lower() not in ("off", "0", "false", "no")
+
+    def _get_tiingo_worker() -> TiingoWorker:
+        global _TIINGO_WORKER
+        if _TIINGO_WORKER is None:
+            _TIINGO_WORKER = TiingoWorker(
+                [TIINGO_PYTHON, TIINGO_WORKER_SCRIPT], cwd=TIINGO_MCP_PATH, env=os.environ.copy()
+            )
+            atexit.register(_TIINGO_WORKER.close)
+        return _TIINGO_WORKER
+
+    def _call_tiingo(cmd: str, argv: list, **args):
+        """
+        Call Tiingo via the persistent worker; falls back to one runner subprocess per call.
+        A worker that timed out or died is stopped and started again on the next call;
+        after TIINGO_WORKER_MAX_FAILURES failures in a row only the runner is used.
+        """
+        global _TIINGO_WORKER_FAILURES
+        if (_tiingo_worker_enabled() and _TIINGO_WORKER_FAILURES < TIINGO_WORKER_MAX_FAILURES
+                and os.path.isfile(TIINGO_PYTHON)):
+            worker = _get_tiingo_worker()
+            try:
+                data = worker.call(cmd, **args)
+            except TiingoWorkerError as e:
+                _TIINGO_WORKER_FAILURES += 1
+                worker.close()
+                if _TIINGO_WORKER_FAILURES >= TIINGO_WORKER_MAX_FAILURES:
+                    print(f"    Tiingo worker failed {_TIINGO_WORKER_FAILURES} times in a row, "
+                          f"using runner subprocess: {e}")
+                else:
+                    print(f"    Tiingo worker failed, restarting it on the next call: {e}")
+            else:
+                _TIINGO_WORKER_FAILURES = 0
+                if isinstance(data, dict) and "error" in data:
+                    raise RuntimeError(data["error"])
+                return data if data is not None else []
+        return _run_tiingo(argv)
 
     def _run_tiingo(cmd: list) -> list | dict:
         """Run tiingo_runner.py via tiingo venv; returns parsed JSON or [] on error."""
@@ -45,17 +215,18 @@ if config.MCP_BASE and os.name != "nt":
         return data
 
     def tiingo_get_price(ticker: str):
-        """Get ticker price via tiingo venv subprocess."""
-        return _run_tiingo(["get_ticker_price", ticker])
+        """Get ticker price via the tiingo venv worker."""
+        return _call_tiingo("get_ticker_price", ["get_ticker_price", ticker], ticker=ticker)
 
     def tiingo_get_news(tickers=None, limit: int = 20, **kwargs):
-        """Get news via tiingo venv subprocess."""
+        """Get news via the tiingo venv worker."""
         cmd = ["get_news", "--limit", str(limit)]
+        t = ""
         if tickers is not None:
             t = tickers if isinstance(tickers, str) else ",".join(tickers) if tickers else ""
             if t:
                 cmd.extend(["--tickers", t])
-        return _run_tiingo(cmd)
+        return _call_tiingo("get_news", cmd, tickers=t or None, limit=limit)
 else:
     # Windows: import from tiingo-mcp-server
     sys.path.insert(0, os.path.join(config.MCP_BASE, "tiingo-mcp-server"))
@@ -78,6 +249,64 @@ except ImportError as e:
     print("Alpaca import failed:", type(e).__name__, e)
     ALPACA_AVAILABLE = False
 
+# Symbols per latest-quote request (sent as one comma-separated query parameter)
+ALPACA_QUOTE_BATCH_SIZE = 200
+# Alpaca only knows exchange tickers; ISINs used as ticker fallback are skipped
+_ISIN_PATTERN = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}\d$")
+
+_ALPACA_CLIENT = None
+
+
+def get_alpaca_client():
+    """Return the shared StockHistoricalDataClient (created on first use)."""
+    global _ALPACA_CLIENT
+    if _ALPACA_CLIENT is None:
+        _ALPACA_CLIENT = StockHistoricalDataClient(config.ALPACA_KEY, config.ALPACA_SECRET)
+    return _ALPACA_CLIENT
+
+
+def _alpaca_quote_dict(q) -> dict:
+    """Convert an Alpaca Quote to {bid, ask, mid_price} (USD)."""
+    return {
+        "bid": q.bid_price,
+        "ask": q.ask_price,
+        "mid_price": (q.bid_price + q.ask_price) / 2 if q.bid_price and q.ask_price else None,
+    }
+
+
+def get_alpaca_latest_quotes(tickers) -> dict:
+    """
+    Fetch latest quotes for many tickers with one request per ALPACA_QUOTE_BATCH_SIZE
+    symbols through the shared client. Returns {ticker: {bid, ask, mid_price}} for
+    tickers Alpaca knows. If a whole chunk is rejected (e.g. one unknown symbol),
+    its symbols are retried one by one. Blocking; call via asyncio.to_thread.
+    """
+    if not ALPACA_AVAILABLE or not config.ALPACA_KEY:
+        return {}
+    symbols = []
+    for ticker in tickers:
+        ticker = str(ticker or "").strip()
+        if ticker and not _ISIN_PATTERN.match(ticker) and ticker not in symbols:
+            symbols.append(ticker)
+    client = get_alpaca_client()
+    quotes = {}
+    for start in range(0, len(symbols), ALPACA_QUOTE_BATCH_SIZE):
+        chunk = symbols[start:start + ALPACA_QUOTE_BATCH_SIZE]
+        try:
+            response = client.get_stock_latest_quote(StockLatestQuoteRequest(symbol_or_symbols=chunk))
+            for symbol, q in response.items():
+                quotes[symbol] = _alpaca_quote_dict(q)
+        except Exception as e:
+            print(f"    Alpaca batch quote failed ({len(chunk)} symbols): {e}")
+            for symbol in chunk:
+                try:
+                    response = client.get_stock_latest_quote(StockLatestQuoteRequest(symbol_or_symbols=symbol))
+                    if symbol in response:
+                        quotes[symbol] = _alpaca_quote_dict(response[symbol])
+                except Exception:
+                    pass
+    return quotes
+
 
 async def get_forex_rate(base="EUR", quote="USD"):
     """
@@ -90,7 +319,7 @@ async def get_forex_rate(base="EUR", quote="USD"):
         try:
             url = f"https://api.tiingo.com/tiingo/fx/top?tickers={base.lower()}{quote.lower()}&token={config.TIINGO_KEY}"
             headers = {"Content-Type": "application/json"}
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = await http_client.get(url, headers=headers, timeout=5)
             if resp.status_code == 200 and resp.json():
                 data = resp.json()[0]
                 rate = data.get("midPrice")
@@ -104,7 +333,7 @@ async def get_forex_rate(base="EUR", quote="USD"):
     try:
         url = f"https://www.google.com/finance/quote/{base}-{quote}"
         headers = {"User-Agent": "Mozilla/5.0"}
-        resp = requests.get(url, headers=headers, timeout=5)
+        resp = await http_client.get(url, headers=headers, timeout=5)
         match = re.search(r'data-last-price="([\d\.]+)"', resp.text)
         if match:
             rate = float(match.group(1))
@@ -3,7 +3,7 @@ import pandas as pd
 from datetime import datetime
 from openpyxl.styles import PatternFill, Alignment, Font, Border, Side
 
-from price_search import load_web_price_cache, save_web_price_cache
+from price_search import get_web_price_cache, save_web_price_cache
 
 
 def format_dataframe_for_output(df, is_watchlist=False):
@@ -202,7 +202,7 @@ def save_analysis_excel(output_file, results, watchlist_results, assets):
                         adjusted_width = 12
                     worksheet.column_dimensions[col_letter].width = adjusted_width
 
-        cache = load_web_price_cache()
+        cache = get_web_price_cache()
         price_sources = []
         for i, result in enumerate(results):
             asset = assets[i]
@@ -224,11 +224,14 @@ def save_analysis_excel(output_file, results, watchlist_results, assets):
                     source_detail = web_data.get("url", "")
                     price_value = web_data.get("price")
                     if cache_key and source_detail:
-                        cache[cache_key] = {"source": source_type, "url": source_detail}
+                        entry = cache.get(cache_key) or {}
+                        entry.update(source=source_type, url=source_detail)
+                        cache.set(cache_key, entry)
 
-            if cache_key in cache and not source_type:
-                source_type = cache[cache_key].get("source", "Cached")
-                source_detail = cache[cache_key].get("url", "")
+            cached_entry = cache.get(cache_key) if cache_key else None
+            if cached_entry and not source_type:
+                source_type = cached_entry.get("source", "Cached")
+                source_detail = cached_entry.get("url", "")
 
             price_sources.append({
                 "Asset": asset_name,
@@ -239,7 +242,7 @@ def save_analysis_excel(output_file, results, watchlist_results, assets):
                 "Fetched At": result.get("FetchedAt", ""),
             })
 
-        save_web_price_cache(cache)
+        save_web_price_cache()
         if price_sources:
             price_df = pd.DataFrame(price_sources)
             price_df.to_excel(writer, sheet_name="Price Sources", index=False)
@@ -0,0 +1,146 @@
+"""Run-wide headline store: cross-source and cross-asset news deduplication.
+
+Every news item passes the store. Titles are normalized (case, punctuation,
+Google News " - Publisher" suffix) and keyed by hash, so exact repeats are found
+in O(1). Near-duplicates (same story, slightly different wording) are found with
+MinHash signatures over word shingles and LSH banding: only headlines sharing a
+band are compared, and they count as the same story at Jaccard >= NEAR_DUP_THRESHOLD.
+The store records which assets each headline was found for; at the end of the
+run it is written as <log name>_news.csv next to the log.
+"""
+import csv
+import hashlib
+import os
+import random
+import re
+from datetime import datetime
+
+NUM_PERM = 32
+BANDS = 8                      # 8 bands x 4 rows: candidates from ~0.6 similarity
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+NEAR_DUP_THRESHOLD = 0.7
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(20240917)
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+CSV_FIELDS = ["id", "title", "sources", "assets", "asset_count", "duplicates", "date", "url", "first_seen"]
+
+_PUBLISHER_SUFFIX = re.compile(r"\s+[-–|]\s+[^-–|]{2,40}$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_title(title: str) -> str:
+    """'SAP hebt Prognose an - Handelsblatt' -> 'sap hebt prognose an'."""
+    text = _PUBLISHER_SUFFIX.sub("", str(title or "").strip())
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+
+def _shingles(normalized: str) -> set[str]:
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: set[str]) -> list[int]:
+    base = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+    return [min((a * x + b) % _MERSENNE for x in base) for a, b in _PERMS]
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class HeadlineStore:
+    """Headlines of one run. add() returns the headline id (same id for near-duplicates)."""
+
+    def __init__(self):
+        self.headlines: dict[str, dict] = {}     # id -> record
+        self._by_hash: dict[str, str] = {}       # normalized title hash -> id
+        self._bands: dict[tuple, list[str]] = {}  # (band, values) -> ids
+        self._shingles: dict[str, set] = {}      # id -> shingles
+        self.duplicates = 0
+
+    def _find_near(self, shingles: set, signature: list[int]) -> str | None:
+        seen = set()
+        for band in range(BANDS):
+            key = (band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+            for hid in self._bands.get(key, ()):
+                if hid not in seen:
+                    seen.add(hid)
+                    if _jaccard(shingles, self._shingles[hid]) >= NEAR_DUP_THRESHOLD:
+                        return hid
+        return None
+
+    def add(self, item: dict, asset: str) -> str:
+        """Register a news item found for asset; returns its headline id."""
+        normalized = normalize_title(item.get("title"))
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+        hid = self._by_hash.get(digest)
+        created = False
+        if hid is None:
+            shingles = _shingles(normalized)
+            signature = _minhash(shingles) if shingles else None
+            hid = self._find_near(shingles, signature) if signature else None
+            if hid is None:
+                hid = digest
+                created = True
+                self.headlines[hid] = {
+                    "id": hid,
+                    "title": item.get("title", ""),
+                    "sources": [],
+                    "assets": [],
+                    "duplicates": 0,
+                    "date": item.get("date", ""),
+                    "url": item.get("url", ""),
+                    "first_seen": datetime.now().isoformat(timespec="seconds"),
+                }
+                self._shingles[hid] = shingles
+                if signature:
+                    for band in range(BANDS):
+                        key = (band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+                        self._bands.setdefault(key, []).append(hid)
+            self._by_hash[digest] = hid
+        record = self.headlines[hid]
+        if not created:
+            record["duplicates"] += 1
+            self.duplicates += 1
+        source = item.get("source", "")
+        if source and source not in record["sources"]:
+            record["sources"].append(source)
+        if asset and asset not in record["assets"]:
+            record["assets"].append(asset)
+        return hid
+
+    def summary(self) -> dict:
+        shared = sum(1 for r in self.headlines.values() if len(r["assets"]) > 1)
+        return {"headlines": len(self.headlines), "duplicates": self.duplicates, "shared": shared}
+
+    def write(self, log_file_path: str) -> str:
+        """Write <log name>_news.csv (most shared headlines first). Returns the path."""
+        path = os.path.splitext(log_file_path)[0] + "_news.csv"
+        rows = sorted(self.headlines.values(), key=lambda r: (-len(r["assets"]), r["first_seen"]))
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for r in rows:
+                writer.writerow({
+                    **r,
+                    "sources": "; ".join(r["sources"]),
+                    "assets": "; ".join(r["assets"]),
+                    "asset_count": len(r["assets"]),
+                })
+        return path
+
+
+_STORE = HeadlineStore()
+
+
+def get_store() -> HeadlineStore:
+    return _STORE
+
+
+def reset() -> None:
+    global _STORE
+    _STORE = HeadlineStore()
@@ -0,0 +1,144 @@
+"""Conditional GET cache: ETag/Last-Modified validators and bodies per URL.
+
+Used for pages that change rarely but are fetched every run (Google News RSS,
+issuer product pages). A cached URL is requested with If-None-Match /
+If-Modified-Since; a 304 answer is served from the body stored on disk.
+Bodies live in http_cache/ next to the web price cache (one file per URL plus
+index.json). The folder is bounded to HTTP_CACHE_MAX_BYTES (default 50 MB); the
+least recently used entries are evicted on flush. Disable with HTTP_CACHE=off.
+"""
+import hashlib
+import os
+import time
+
+import config
+from cache_store import FileLock, _read_json, atomic_write_json
+
+INDEX_FILE = "index.json"
+DEFAULT_HTTP_CACHE_MAX_BYTES = 50_000_000
+
+# Per-run counters (conditional requests sent, 304s served, bytes not downloaded)
+STATS = {"conditional": 0, "not_modified": 0, "stored": 0, "evicted": 0, "bytes_saved": 0}
+
+_INDEX: dict | None = None
+_DIRTY: set[str] = set()
+
+
+def enabled() -> bool:
+    return os.environ.get("HTTP_CACHE", "on").strip().lower() not in ("off", "0", "false", "no")
+
+
+def _max_bytes() -> int:
+    try:
+        return int(os.environ.get("HTTP_CACHE_MAX_BYTES", DEFAULT_HTTP_CACHE_MAX_BYTES))
+    except ValueError:
+        return DEFAULT_HTTP_CACHE_MAX_BYTES
+
+
+def _folder() -> str:
+    return config.HTTP_CACHE_DIR
+
+
+def _index() -> dict:
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = _read_json(os.path.join(_folder(), INDEX_FILE))
+    return _INDEX
+
+
+def _file_name(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".body"
+
+
+def conditional_headers(url: str) -> dict:
+    """If-None-Match / If-Modified-Since for a cached url ({} if not cached)."""
+    if not enabled():
+        return {}
+    entry = _index().get(url)
+    if not entry or not os.path.exists(os.path.join(_folder(), entry["file"])):
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if headers:
+        STATS["conditional"] += 1
+    return headers
+
+
+def cached_response(url: str):
+    """(body, content_type) of a cached url after a 304, or None. Marks the entry as used."""
+    entry = _index().get(url)
+    if not entry:
+        return None
+    try:
+        with open(os.path.join(_folder(), entry["file"]), "rb") as f:
+            body = f.read()
+    except OSError:
+        return None
+    entry["last_used"] = time.time()
+    _DIRTY.add(url)
+    STATS["not_modified"] += 1
+    STATS["bytes_saved"] += len(body)
+    return body, entry.get("content_type", "")
+
+
+def cacheable(headers) -> bool:
+    """True if a 200 response carries a validator (and no Cache-Control: no-store)."""
+    if "no-store" in (headers.get("cache-control") or "").lower():
+        return False
+    return bool(headers.get("etag") or headers.get("last-modified"))
+
+
+def store(url: str, headers, body: bytes) -> None:
+    """Remember body and validators of a 200 response."""
+    if not enabled() or not cacheable(headers):
+        return
+    name = _file_name(url)
+    os.makedirs(_folder(), exist_ok=True)
+    with open(os.path.join(_folder(), name), "wb") as f:
+        f.write(body)
+    _index()[url] = {
+        "file": name,
+        "etag": headers.get("etag", ""),
+        "last_modified": headers.get("last-modified", ""),
+        "content_type": headers.get("content-type", ""),
+        "size": len(body),
+        "last_used": time.time(),
+    }
+    _DIRTY.add(url)
+    STATS["stored"] += 1
+
+
+def flush() -> None:
+    """Merge used/stored entries into index.json and evict LRU entries over the size bound."""
+    global _INDEX
+    if not _DIRTY:
+        return
+    folder = _folder()
+    index_path = os.path.join(folder, INDEX_FILE)
+    try:
+        with FileLock(index_path):
+            on_disk = _read_json(index_path)
+            for url in _DIRTY:
+                entry = (_INDEX or {}).get(url)
+                if entry and entry.get("last_used", 0) >= on_disk.get(url, {}).get("last_used", 0):
+                    on_disk[url] = entry
+            total = sum(e.get("size", 0) for e in on_disk.values())
+            limit = _max_bytes()
+            for url, entry in sorted(on_disk.items(), key=lambda item: item[1].get("last_used", 0)):
+                if total <= limit:
+                    break
+                total -= entry.get("size", 0)
+                del on_disk[url]
+                STATS["evicted"] += 1
+                try:
+                    os.remove(os.path.join(folder, entry["file"]))
+                except OSError:
+                    pass
+            atomic_write_json(index_path, on_disk)
+        _INDEX = on_disk
+        _DIRTY.clear()
+    except Exception as e:
+        print(f"    HTTP cache save failed: {e}")
@@ -0,0 +1,462 @@
+"""Shared async HTTP client: one pooled httpx.AsyncClient for every network path.
+
+Keep-alive connections are reused across lookups (onvista, ariva, google, ...),
+so 100+ requests per run do not each pay a new TCP/TLS handshake.
+HTTP/2 is used when the optional 'h2' package is installed.
+Responses can be recorded to / replayed from a fixture folder (see http_fixtures).
+With cache=True, requests are conditional and 304s are served from disk (see http_cache).
+
+Every request passes a per-host token bucket (HTTP_HOST_RATE) and a per-host
+circuit breaker: after a 429/403 (or a Google captcha page) or
+CIRCUIT_FAILURE_THRESHOLD failures in a row, the host is paused for
+HTTP_CIRCUIT_COOLDOWN seconds and requests to it raise CircuitOpenError at once.
+"""
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+import http_cache
+import http_fixtures
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Central timeouts and pool limits
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+# httpx only limits the whole pool; this caps parallel requests per host
+MAX_CONNECTIONS_PER_HOST = 6
+# Streaming page fetch (fetch_until): byte cap per page, extractor run every
+# STREAM_CHECK_INTERVAL new characters; the last STREAM_EDGE_GUARD characters are
+# held back until more text arrives so a price cut at a chunk edge is not parsed.
+# Each check only sees the new text plus STREAM_SCAN_OVERLAP characters already
+# scanned (a match must fit in that overlap to span two checks), so a large page
+# without a hit costs one pass instead of a re-scan of the whole buffer per check
+MAX_PAGE_BYTES = 1_000_000
+STREAM_CHECK_INTERVAL = 16_384
+STREAM_EDGE_GUARD = 64
+STREAM_SCAN_OVERLAP = 1_024
+# Requests per second per host (burst = rate, at least 1). Env HTTP_HOST_RATE,
+# e.g. "default=5,google.com=1"; "off" disables the limiter
+DEFAULT_HOST_RATES = {"default": 5.0, "google.com": 2.0}
+# Circuit breaker: pause a host after this many failures in a row (timeouts,
+# connection errors, 5xx) or at once after 429/403
+CIRCUIT_FAILURE_THRESHOLD = 3
+DEFAULT_CIRCUIT_COOLDOWN = 60.0
+MAX_RETRY_AFTER = 600.0
+BLOCK_STATUSES = (403, 429)
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "de,en-US;q=0.7,en;q=0.3",
+}
+
+_CLIENT: httpx.AsyncClient | None = None
+_CLIENT_LOOP = None
+_HOST_SLOTS: dict[str, asyncio.Semaphore] = {}
+_BUCKETS: dict[str, list] = {}     # host -> [tokens, last refill (monotonic)]
+_CIRCUITS: dict[str, dict] = {}    # host -> {"failures", "open_until", "probing"}
+
+# Per-run counters for fetch_until (pages, early exits, bytes read)
+STREAM_STATS = {"pages": 0, "early_exits": 0, "truncated": 0, "bytes_read": 0}
+# Per-run counters for the rate limiter and circuit breaker
+THROTTLE_STATS = {"waits": 0, "wait_s": 0.0, "opened": 0, "rejected": 0}
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of a request while the host is paused by the circuit breaker."""
+
+    outcome = "skipped"  # metrics.track outcome
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it for the running event loop on first use."""
+    global _CLIENT, _CLIENT_LOOP, _HOST_SLOTS
+    loop = asyncio.get_running_loop()
+    if _CLIENT is None or _CLIENT.is_closed or _CLIENT_LOOP is not loop:
+        _CLIENT = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+        _CLIENT_LOOP = loop
+        _HOST_SLOTS = {}
+    return _CLIENT
+
+
+def _host_slot(host: str) -> asyncio.Semaphore:
+    """Return the per-host semaphore limiting parallel requests to one host."""
+    slot = _HOST_SLOTS.get(host)
+    if slot is None:
+        slot = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        _HOST_SLOTS[host] = slot
+    return slot
+
+
+def _host_key(url: str) -> str:
+    return (urlsplit(url).hostname or "").replace("www.", "")
+
+
+def _parse_host_rates(spec: str | None) -> dict | None:
+    """'default=5,google.com=1' -> rates merged over DEFAULT_HOST_RATES; 'off' -> None."""
+    if spec is None:
+        return DEFAULT_HOST_RATES
+    if spec.strip().lower() in ("off", "0", "false", "no"):
+        return None
+    rates = dict(DEFAULT_HOST_RATES)
+    for part in spec.split(","):
+        if "=" in part:
+            host, value = part.split("=", 1)
+            try:
+                rates[host.strip()] = float(value)
+            except ValueError:
+                print(f"    Ignoring invalid HTTP_HOST_RATE entry: {part}")
+    return rates
+
+
+def host_rate(host: str) -> float | None:
+    """Requests per second allowed for host (longest matching domain), None = unlimited."""
+    rates = _parse_host_rates(os.environ.get("HTTP_HOST_RATE"))
+    if rates is None:
+        return None
+    matches = [d for d in rates if d != "default" and (host == d or host.endswith("." + d))]
+    rate = rates[max(matches, key=len)] if matches else rates.get("default")
+    return rate if rate and rate > 0 else None
+
+
+async def _throttle(host: str) -> None:
+    """Wait for a token of the host's bucket. Tokens may go negative: waiters queue up."""
+    rate = host_rate(host)
+    if rate is None:
+        return
+    burst = max(1.0, rate)
+    now = time.monotonic()
+    bucket = _BUCKETS.setdefault(host, [burst, now])
+    bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate) - 1
+    bucket[1] = now
+    if bucket[0] < 0:
+        wait = -bucket[0] / rate
+        THROTTLE_STATS["waits"] += 1
+        THROTTLE_STATS["wait_s"] = round(THROTTLE_STATS["wait_s"] + wait, 3)
+        await asyncio.sleep(wait)
+
+
+def _circuit_cooldown() -> float:
+    try:
+        return float(os.environ.get("HTTP_CIRCUIT_COOLDOWN", DEFAULT_CIRCUIT_COOLDOWN))
+    except ValueError:
+        return DEFAULT_CIRCUIT_COOLDOWN
+
+
+def circuit_open(host: str) -> bool:
+    """True while host is paused (after the cool-down, one probe request is let through)."""
+    state = _CIRCUITS.get(host)
+    if not state or not state["open_until"]:
+        return False
+    now = time.monotonic()
+    if now < state["open_until"]:
+        return True
+    # Cool-down over: the probe decides; others stay paused until its outcome
+    state["probing"] = True
+    state["open_until"] = now + _circuit_cooldown()
+    return False
+
+
+def _check_circuit(host: str, url: str) -> None:
+    if circuit_open(host):
+        THROTTLE_STATS["rejected"] += 1
+        remaining = max(0.0, _CIRCUITS[host]["open_until"] - time.monotonic())
+        raise CircuitOpenError(f"{host} paused by circuit breaker ({remaining:.0f}s left): {url}")
+
+
+def _open_circuit(host: str, state: dict, reason: str, seconds: float) -> None:
+    state["open_until"] = time.monotonic() + seconds
+    state["probing"] = False
+    THROTTLE_STATS["opened"] += 1
+    print(f"    Pausing {host} for {seconds:.0f}s ({reason})")
+
+
+def _retry_after(resp) -> float | None:
+    try:
+        return min(float(resp.headers.get("retry-after", "")), MAX_RETRY_AFTER)
+    except ValueError:
+        return None
+
+
+def _record_outcome(host: str, resp=None, error: Exception | None = None) -> None:
+    """Update the host's circuit breaker with a response or a request error."""
+    cooldown = _circuit_cooldown()
+    if cooldown <= 0:
+        return
+    state = _CIRCUITS.setdefault(host, {"failures": 0, "open_until": 0.0, "probing": False})
+    if resp is not None:
+        blocked = resp.status_code in BLOCK_STATUSES or "/sorry/" in str(resp.url)
+        if blocked:
+            state["failures"] += 1
+            _open_circuit(host, state, f"HTTP {resp.status_code}", _retry_after(resp) or cooldown)
+            return
+        if resp.status_code < 500:
+            state.update(failures=0, open_until=0.0, probing=False)
+            return
+    state["failures"] += 1
+    if state["probing"] or state["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+        reason = type(error).__name__ if error is not None else f"HTTP {resp.status_code}"
+        _open_circuit(host, state, f"{state['failures']} failures, last {reason}", cooldown)
+
+
+def _record_stream_outcome(host: str, resp, error: Exception | None) -> None:
+    """
+    Record a streamed request once, after its body was read or abandoned: the error
+    if the request or the body failed, else the response (nothing if cancelled before it).
+    """
+    if error is not None:
+        _record_outcome(host, error=error)
+    elif resp is not None:
+        _record_outcome(host, resp)
+
+
+def reset_host_state() -> None:
+    """Forget rate limiter and circuit breaker state (tests, new run)."""
+    _BUCKETS.clear()
+    _CIRCUITS.clear()
+    for key in THROTTLE_STATS:
+        THROTTLE_STATS[key] = 0
+
+
+def _conditional(url: str, headers: dict | None, cache: bool) -> dict | None:
+    if not cache:
+        return headers
+    validators = http_cache.conditional_headers(url)
+    return {**(headers or {}), **validators} if validators else headers
+
+
+def _from_cache(url: str, resp: httpx.Response) -> httpx.Response | None:
+    """For a 304: a 200 response built from the cached body (None if the body is gone)."""
+    cached = http_cache.cached_response(url)
+    if cached is None:
+        return None
+    body, content_type = cached
+    return httpx.Response(
+        200, content=body, headers={"content-type": content_type, "x-cache": "HIT"},
+        request=resp.request, extensions={"from_cache": True},
+    )
+
+
+async def get(
+    url: str,
+    headers: dict | None = None,
+    timeout: float | None = None,
+    follow_redirects: bool = True,
+    cache: bool = False,
+) -> httpx.Response:
+    """
+    GET url through the shared client. Raises httpx errors like client.get(), and
+    CircuitOpenError while the host is paused.
+    cache: send a conditional request and answer a 304 from the HTTP cache.
+    """
+    client = get_client()
+    host = _host_key(url)
+    _check_circuit(host, url)
+    kwargs = {"headers": _conditional(url, headers, cache), "follow_redirects": follow_redirects}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    async with _host_slot(host):
+        await _throttle(host)
+        try:
+            resp = await client.get(http_fixtures.replay_url(url), **kwargs)
+        except httpx.HTTPError as e:
+            _record_outcome(host, error=e)
+            raise
+    _record_outcome(host, resp)
+    if cache and resp.status_code == 304:
+        resp = _from_cache(url, resp) or await get(url, headers, timeout, follow_redirects)  # body file lost
+    elif cache and resp.status_code == 200:
+        http_cache.store(url, resp.headers, resp.content)
+    folder = http_fixtures.record_dir()
+    if folder:
+        http_fixtures.record_response(
+            folder, url, resp.status_code, resp.headers.get("content-type", ""), resp.content
+        )
+    return resp
+
+
+async def fetch_until(
+    url: str,
+    extract,
+    headers: dict | None = None,
+    timeout: float | None = None,
+    max_bytes: int = MAX_PAGE_BYTES,
+    cache: bool = False,
+    overlap: int = STREAM_SCAN_OVERLAP,
+):
+    """
+    Stream url and run extract(text) on each new slice of page text (plus overlap
+    characters of the previous slice); stop reading as soon as it returns a result
+    (the connection is closed) or after max_bytes. At the end extract runs once on
+    the whole page. Returns (response, text_read, result). Non-200 responses are
+    not read (text "" and result None). Raises httpx errors like get().
+    cache: conditional request; a 304 runs extract on the cached page, and a
+    cacheable 200 is read in full so it can be stored.
+    """
+    client = get_client()
+    host = _host_key(url)
+    _check_circuit(host, url)
+    kwargs = {"headers": _conditional(url, headers, cache)}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    # Recording needs the whole page, so no early exit while HTTP_RECORD_DIR is set
+    folder = http_fixtures.record_dir()
+    resp = error = None
+    async with _host_slot(host):
+        await _throttle(host)
+        try:
+            async with client.stream("GET", http_fixtures.replay_url(url), **kwargs) as resp:
+                if cache and resp.status_code == 304:
+                    cached = _from_cache(url, resp)
+                    if cached is not None:
+                        return cached, cached.text, extract(cached.text)
+                keep_page = (cache and resp.status_code == 200
+                             and http_cache.enabled() and http_cache.cacheable(resp.headers))
+                if resp.status_code != 200:
+                    if folder:
+                        await resp.aread()
+                        http_fixtures.record_response(
+                            folder, url, resp.status_code, resp.headers.get("content-type", ""), resp.content
+                        )
+                    return resp, "", None
+                STREAM_STATS["pages"] += 1
+                parts = []
+                pending = []  # pieces since the last check
+                scanned_tail = ""  # end of the last slice: overlap + held-back edge
+                size = 0
+                checked = 0
+                try:
+                    async for piece in resp.aiter_text():
+                        parts.append(piece)
+                        pending.append(piece)
+                        size += len(piece)
+                        if resp.num_bytes_downloaded >= max_bytes:
+                            STREAM_STATS["truncated"] += 1
+                            break
+                        if size - checked >= STREAM_CHECK_INTERVAL and not folder and not keep_page:
+                            checked = size
+                            window = scanned_tail + "".join(pending)
+                            pending = []
+                            scanned_tail = window[-(overlap + STREAM_EDGE_GUARD):]
+                            result = extract(window[:-STREAM_EDGE_GUARD])
+                            if result:
+                                STREAM_STATS["early_exits"] += 1
+                                return resp, "".join(parts), result
+                finally:
+                    STREAM_STATS["bytes_read"] += resp.num_bytes_downloaded
+                text = "".join(parts)
+                if keep_page and resp.num_bytes_downloaded < max_bytes:
+                    http_cache.store(url, resp.headers, text.encode(resp.encoding or "utf-8", errors="replace"))
+                if folder:
+                    http_fixtures.record_response(
+                        folder, url, resp.status_code, resp.headers.get("content-type", ""),
+                        text.encode(resp.encoding or "utf-8", errors="replace"),
+                    )
+                return resp, text, extract(text)
+        except httpx.HTTPError as e:
+            error = e
+            raise
+        finally:
+            _record_stream_outcome(host, resp, error)
+
+
+async def fetch_stream(
+    url: str,
+    consume,
+    headers: dict | None = None,
+    timeout: float | None = None,
+    max_bytes: int = MAX_PAGE_BYTES,
+    cache: bool = False,
+) -> httpx.Response:
+    """
+    Stream url and pass each raw chunk to consume(chunk); stop reading once it
+    returns True (the connection is closed) or after max_bytes. For incremental
+    parsers (RSS). Returns the response; non-200 responses are not read.
+    cache: conditional request; a 304 feeds the cached body to consume, and a
+    cacheable 200 is read in full so it can be stored.
+    Raises httpx errors like get().
+    """
+    client = get_client()
+    host = _host_key(url)
+    _check_circuit(host, url)
+    kwargs = {"headers": _conditional(url, headers, cache)}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    folder = http_fixtures.record_dir()
+    resp = error = None
+    async with _host_slot(host):
+        await _throttle(host)
+        try:
+            async with client.stream("GET", http_fixtures.replay_url(url), **kwargs) as resp:
+                if cache and resp.status_code == 304:
+                    cached = _from_cache(url, resp)
+                    if cached is not None:
+                        consume(cached.content)
+                        return cached
+                if resp.status_code != 200:
+                    return resp
+                keep_page = bool(folder) or (
+                    cache and http_cache.enabled() and http_cache.cacheable(resp.headers)
+                )
+                STREAM_STATS["pages"] += 1
+                parts = []
+                done = False
+                try:
+                    async for chunk in resp.aiter_bytes():
+                        if keep_page:
+                            parts.append(chunk)
+                        if not done:
+                            done = bool(consume(chunk))
+                        if resp.num_bytes_downloaded >= max_bytes:
+                            STREAM_STATS["truncated"] += 1
+                            break
+                        if done and not keep_page:
+                            STREAM_STATS["early_exits"] += 1
+                            break
+                finally:
+                    STREAM_STATS["bytes_read"] += resp.num_bytes_downloaded
+                if keep_page and resp.num_bytes_downloaded < max_bytes:
+                    body = b"".join(parts)
+                    if cache:
+                        http_cache.store(url, resp.headers, body)
+                    if folder:
+                        http_fixtures.record_response(
+                            folder, url, resp.status_code, resp.headers.get("content-type", ""), body
+                        )
+                return resp
+        except httpx.HTTPError as e:
+            error = e
+            raise
+        finally:
+            _record_stream_outcome(host, resp, error)
+
+
+async def aclose() -> None:
+    """Close the shared client (end of run)."""
+    global _CLIENT, _CLIENT_LOOP
+    if _CLIENT is not None and not _CLIENT.is_closed:
+        try:
+            await _CLIENT.aclose()
+        except Exception:
+            pass
+    _CLIENT = None
+    _CLIENT_LOOP = None
@@ -0,0 +1,55 @@
+"""Record/replay of HTTP responses for offline scraper tests and benchmarks.
+
+Record: set HTTP_RECORD_DIR=<folder> and run the pipeline; every response fetched
+through http_client is stored there (index.json + one body file per URL).
+Replay: serve that folder with tests/fixture_server.py and set
+HTTP_REPLAY_URL=http://127.0.0.1:<port>; http_client then sends every request to
+the stand-in server as <replay>/fetch?url=<original url>.
+
+index.json maps the original URL (as passed to http_client) to
+{"file", "status", "content_type"}.
+"""
+import hashlib
+import os
+from urllib.parse import quote, urlsplit
+
+from cache_store import FileLock, _read_json, atomic_write_json
+
+INDEX_FILE = "index.json"
+
+
+def record_dir() -> str | None:
+    """Folder to record responses into, or None (env HTTP_RECORD_DIR)."""
+    return os.environ.get("HTTP_RECORD_DIR") or None
+
+
+def replay_url(url: str) -> str:
+    """Rewrite url to the stand-in server if HTTP_REPLAY_URL is set."""
+    base = os.environ.get("HTTP_REPLAY_URL")
+    if not base:
+        return url
+    return f"{base.rstrip('/')}/fetch?url={quote(url, safe='')}"
+
+
+def fixture_file_name(url: str) -> str:
+    """Stable body file name: <host>_<hash>.body."""
+    host = (urlsplit(url).hostname or "unknown").replace("www.", "")
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return f"{host}_{digest}.body"
+
+
+def load_index(folder: str) -> dict:
+    return _read_json(os.path.join(folder, INDEX_FILE))
+
+
+def record_response(folder: str, url: str, status: int, content_type: str, body: bytes) -> None:
+    """Store one response body and its index entry (safe across processes)."""
+    os.makedirs(folder, exist_ok=True)
+    name = fixture_file_name(url)
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(body)
+    index_path = os.path.join(folder, INDEX_FILE)
+    with FileLock(index_path):
+        index = _read_json(index_path)
+        index[url] = {"file": name, "status": status, "content_type": content_type}
+        atomic_write_json(index_path, index)
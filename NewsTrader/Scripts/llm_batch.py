@@ -0,0 +1,210 @@
+"""Provider batch APIs for --llm-batch (overnight runs: half the price, no rate limits).
+
+Analyses do not call the model one by one: their prompts are collected and sent
+as one asynchronous batch (Anthropic Message Batches, OpenAI Batch API). The
+orchestrator registers every fetched asset as a member of the batch and closes
+it when fetching is done; the batch is submitted as soon as it is closed and all
+members wait for their answer. It is polled every LLM_BATCH_POLL seconds
+(default 30) until it has ended or LLM_BATCH_TIMEOUT seconds (default 24 h) passed.
+Prompts are sent as one user message of prefix + prompt, as for direct calls;
+Anthropic gets the shared prefix as a block marked for prompt caching when it is
+long enough (the batch API caches on a best-effort basis).
+Endpoints: ANTHROPIC_BASE_URL / OPENAI_BASE_URL (default: the public APIs).
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+
+import httpx
+
+PROVIDERS = ("anthropic", "openai")
+DEFAULT_LLM_BATCH_POLL = 30
+DEFAULT_LLM_BATCH_TIMEOUT = 86400
+ANTHROPIC_VERSION = "2023-06-01"
+HTTP_TIMEOUT = 60.0
+
+# Per-run counters
+STATS = {"batches": 0, "requests": 0, "succeeded": 0, "failed": 0, "wait_s": 0.0}
+
+
+class BatchError(RuntimeError):
+    """A batch (or one request of it) did not produce an answer."""
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _lines(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def _poll(client: httpx.AsyncClient, url: str, headers: dict, finished) -> dict:
+    """GET url until finished(batch) is true (or the timeout passed)."""
+    interval = _env_number("LLM_BATCH_POLL", DEFAULT_LLM_BATCH_POLL)
+    timeout = _env_number("LLM_BATCH_TIMEOUT", DEFAULT_LLM_BATCH_TIMEOUT)
+    start = time.monotonic()
+    while True:
+        r = await client.get(url, headers=headers)
+        r.raise_for_status()
+        batch = r.json()
+        if finished(batch):
+            STATS["wait_s"] = round(STATS["wait_s"] + time.monotonic() - start, 3)
+            return batch
+        if time.monotonic() - start > timeout:
+            raise BatchError(f"batch {batch.get('id')} not finished after {timeout:.0f}s")
+        await asyncio.sleep(interval)
+
+
+def _user_content(prefix: str, prompt: str, cache_prefix: bool):
+    if cache_prefix:
+        return [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}]
+    return prefix + prompt
+
+
+async def _anthropic_batch(client, model: str, api_key: str, requests: list) -> dict:
+    base = os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+    headers = {"x-api-key": api_key, "anthropic-version": ANTHROPIC_VERSION}
+    body = {"requests": [
+        {"custom_id": cid, "params": {
+            "model": model, "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": _user_content(prefix, prompt, cache_prefix)}],
+        }}
+        for cid, prefix, prompt, max_tokens, cache_prefix in requests
+    ]}
+    r = await client.post(f"{base}/v1/messages/batches", json=body, headers=headers)
+    r.raise_for_status()
+    batch_id = r.json()["id"]
+    print(f"  LLM batch {batch_id} submitted ({len(requests)} requests), waiting for results...")
+    batch = await _poll(client, f"{base}/v1/messages/batches/{batch_id}", headers,
+                        lambda b: b.get("processing_status") == "ended")
+    r = await client.get(batch["results_url"], headers=headers)
+    r.raise_for_status()
+    results = {}
+    for item in _lines(r.text):
+        result = item.get("result") or {}
+        if result.get("type") == "succeeded":
+            blocks = result.get("message", {}).get("content", [])
+            results[item["custom_id"]] = "".join(b.get("text", "") for b in blocks if b.get("type") == "text")
+        else:
+            error = (result.get("error") or {}).get("error", {}).get("message", "")
+            results[item["custom_id"]] = BatchError(f"{result.get('type', 'failed')} {error}".strip())
+    return results
+
+
+async def _openai_batch(client, model: str, api_key: str, requests: list) -> dict:
+    base = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {api_key}"}
+    jsonl = "\n".join(
+        json.dumps({"custom_id": cid, "method": "POST", "url": "/v1/chat/completions", "body": {
+            "model": model, "max_tokens": max_tokens, "messages": [{"role": "user", "content": prefix + prompt}],
+        }}, ensure_ascii=False)
+        for cid, prefix, prompt, max_tokens, _ in requests
+    )
+    r = await client.post(f"{base}/files", headers=headers, data={"purpose": "batch"},
+                          files={"file": ("batch.jsonl", jsonl.encode("utf-8"), "application/jsonl")})
+    r.raise_for_status()
+    r = await client.post(f"{base}/batches", headers=headers, json={
+        "input_file_id": r.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h",
+    })
+    r.raise_for_status()
+    batch_id = r.json()["id"]
+    print(f"  LLM batch {batch_id} submitted ({len(requests)} requests), waiting for results...")
+    batch = await _poll(client, f"{base}/batches/{batch_id}", headers,
+                        lambda b: b.get("status") in ("completed", "failed", "expired", "cancelled"))
+    results = {}
+    for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+        if not file_id:
+            continue
+        r = await client.get(f"{base}/files/{file_id}/content", headers=headers)
+        r.raise_for_status()
+        for item in _lines(r.text):
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"] or ""
+            else:
+                error = item.get("error") or response.get("body", {}).get("error") or {}
+                results[item["custom_id"]] = BatchError(error.get("message") or f"HTTP {response.get('status_code')}")
+    if not results and batch.get("status") != "completed":
+        raise BatchError(f"batch {batch_id} {batch.get('status')}")
+    return results
+
+
+async def submit(provider: str, model: str, api_key: str, requests: list) -> dict:
+    """
+    Run one batch of (custom_id, prefix, prompt, max_tokens, cache_prefix).
+    Returns {custom_id: text or BatchError}.
+    """
+    run = _anthropic_batch if provider == "anthropic" else _openai_batch
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+        results = await run(client, model, api_key, requests)
+    STATS["batches"] += 1
+    STATS["requests"] += len(requests)
+    return results
+
+
+class Collector:
+    """Prompts of one run, submitted together once every member waits (see module docstring)."""
+
+    def __init__(self, provider: str, model: str, api_key: str):
+        self.provider = provider
+        self.model = model
+        self.api_key = api_key
+        self._ids = itertools.count(1)
+        self._pending: list = []
+        self._members = 0
+        self._waiting = 0
+        self._closed = False
+        self._tasks: list[asyncio.Task] = []
+
+    def join(self) -> None:
+        """An asset that will be analyzed."""
+        self._members += 1
+
+    def leave(self) -> None:
+        """Its analysis is done (with or without a batch request)."""
+        self._members -= 1
+        self._maybe_submit()
+
+    def close(self) -> None:
+        """No further members will join."""
+        self._closed = True
+        self._maybe_submit()
+
+    async def request(self, prompt: str, max_tokens: int, prefix: str = "", cache_prefix: bool = False) -> str:
+        """Queue prefix + prompt; returns the answer text once its batch has ended."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((f"req-{next(self._ids)}", prefix, prompt, max_tokens, cache_prefix, future))
+        self._waiting += 1
+        try:
+            self._maybe_submit()
+            return await future
+        finally:
+            self._waiting -= 1
+
+    def _maybe_submit(self) -> None:
+        if self._closed and self._pending and self._waiting >= self._members:
+            pending, self._pending = self._pending, []
+            self._tasks.append(asyncio.create_task(self._run(pending)))
+
+    async def _run(self, pending: list) -> None:
+        try:
+            results = await submit(self.provider, self.model, self.api_key, [p[:5] for p in pending])
+        except Exception as e:
+            results = {cid: BatchError(f"batch failed: {e}") for cid, *_ in pending}
+        for cid, *_, future in pending:
+            if future.done():
+                continue
+            answer = results.get(cid, BatchError("no result in batch"))
+            if isinstance(answer, Exception):
+                STATS["failed"] += 1
+                future.set_exception(answer)
+            else:
+                STATS["succeeded"] += 1
+                future.set_result(answer)
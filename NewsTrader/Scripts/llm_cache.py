@@ -0,0 +1,109 @@
+"""Content-addressed LLM response cache (opt-in).
+
+Key: SHA-256 over provider, model, bind kwargs (token limit, temperature),
+structured output schema and prompt. Values are the model's answer (text, or the
+dict of a structured call) with creation and last-use time. Entries expire after
+LLM_CACHE_TTL seconds (default 1 day); on flush the least recently used entries
+are dropped while the cache exceeds LLM_CACHE_MAX_BYTES (default 20 MB).
+Stored in llm_cache.json next to the web price cache (same backend setting).
+
+Mode (env LLM_CACHE or --llm-cache=): off (default) | read | readwrite.
+"""
+import hashlib
+import json
+import os
+import time
+
+import config
+from cache_store import open_cache_store
+
+DEFAULT_LLM_CACHE_TTL = 86400
+DEFAULT_LLM_CACHE_MAX_BYTES = 20_000_000
+MODES = ("off", "read", "readwrite")
+
+# Per-run counters
+STATS = {"hits": 0, "misses": 0, "stored": 0, "expired": 0, "evicted": 0}
+
+_STORE = None
+
+
+def mode() -> str:
+    value = os.environ.get("LLM_CACHE", "off").strip().lower()
+    return value if value in MODES else "off"
+
+
+def _env_number(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def get_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = open_cache_store(config.LLM_CACHE_FILE, os.environ.get("WEB_PRICE_CACHE_BACKEND"))
+    return _STORE
+
+
+def make_key(provider: str, model: str, bind_kwargs: dict, schema, prompt: str) -> str:
+    """Content hash of everything that determines the answer."""
+    schema_json = schema.model_json_schema() if schema is not None else None
+    payload = json.dumps(
+        {"provider": provider, "model": model, "bind": bind_kwargs, "schema": schema_json, "prompt": prompt},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key: str):
+    """Cached answer for key, or None (cache off, missing or expired).
+
+    Expired entries are only deleted in readwrite mode; read mode never writes.
+    """
+    if mode() == "off":
+        return None
+    store = get_store()
+    entry = store.get(key)
+    if entry and time.time() - entry.get("created", 0) > _env_number("LLM_CACHE_TTL", DEFAULT_LLM_CACHE_TTL):
+        if mode() == "readwrite":
+            store.delete(key)
+        STATS["expired"] += 1
+        entry = None
+    if not entry:
+        STATS["misses"] += 1
+        return None
+    entry["last_used"] = time.time()
+    if mode() == "readwrite":
+        store.set(key, entry)
+    STATS["hits"] += 1
+    return entry.get("value")
+
+
+def store(key: str, value) -> None:
+    """Remember an answer (readwrite mode only; empty answers are not cached)."""
+    if mode() != "readwrite" or value in (None, "", {}):
+        return
+    now = time.time()
+    size = len(json.dumps(value, ensure_ascii=False, default=str))
+    get_store().set(key, {"value": value, "created": now, "last_used": now, "size": size})
+    STATS["stored"] += 1
+
+
+def flush() -> None:
+    """Evict least recently used entries beyond LLM_CACHE_MAX_BYTES and persist."""
+    if _STORE is None or mode() != "readwrite":
+        return
+    try:
+        entries = [(key, _STORE.get(key) or {}) for key in _STORE.keys()]
+        total = sum(e.get("size", 0) for _, e in entries)
+        limit = _env_number("LLM_CACHE_MAX_BYTES", DEFAULT_LLM_CACHE_MAX_BYTES)
+        for key, entry in sorted(entries, key=lambda item: item[1].get("last_used", 0)):
+            if total <= limit:
+                break
+            total -= entry.get("size", 0)
+            _STORE.delete(key)
+            STATS["evicted"] += 1
+        _STORE.flush()
+    except Exception as e:
+        print(f"    LLM cache save failed: {e}")
@@ -5,18 +5,46 @@ Settings read from os.environ (populated from env.txt by config.load_env_keys):
   ANTHROPIC_MODEL / OPENAI_MODEL / OLLAMA_MODEL   (model per provider)
   ANTHROPIC_API_KEY / OPENAI_API_KEY              (required for cloud providers)
   OLLAMA_BASE_URL                                 (optional; auto-detected if not set)
+  LLM_CACHE        = off | read | readwrite        (response cache, see llm_cache.py)
+  LLM_MAX_IN_FLIGHT / LLM_RPM / LLM_TPM            (request scheduler limits, see llm_scheduler.py)
+  LLM_PROMPT_CACHE = on | off                     (provider prompt caching of stable prefixes)
+  LLM_PROMPT_CACHE_MIN_TOKENS                     (smallest prefix marked for caching; default per provider)
+  OLLAMA_KEEP_ALIVE                               (how long Ollama keeps the model loaded; default 30m)
 """
 import os
 import re
 from typing import Type, TypeVar
 
 import httpx
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
 
+import llm_batch
+import llm_cache
+import llm_scheduler
+
 _LLM = None
 _PROVIDER = None
+_MODEL = None
 _CONTEXT_SIZE: int | None = None
+# Bound runnables per (schema, max_tokens, temperature), built once per init_llm()
+_RUNNABLES: dict[tuple, object] = {}
+_RUNNABLES_LLM = None
+# Prompt caching (see _message): calls with a prefix, those whose prefix is below the
+# provider's minimum, input tokens read from / written to the cache
+PROMPT_CACHE_STATS = {"calls": 0, "short_prefix": 0, "hits": 0, "input_tokens": 0,
+                      "cache_read_tokens": 0, "cache_write_tokens": 0}
+# Smallest prefix (tokens) the providers cache; shorter ones are never cached, so
+# Anthropic gets no cache_control for them. Claude Haiku needs 2048. The prefix is
+# estimated at PROMPT_CACHE_CHARS_PER_TOKEN: prompt text with numbers and JSON is
+# denser than prose, and a marked prefix that turns out too short is just not cached.
+PROMPT_CACHE_MIN_TOKENS = {"anthropic": 1024, "openai": 1024}
+PROMPT_CACHE_MIN_TOKENS_HAIKU = 2048
+PROMPT_CACHE_CHARS_PER_TOKEN = 3
+DEFAULT_OLLAMA_KEEP_ALIVE = "30m"
+# --llm-batch: collector of the run's analysis prompts (None = direct calls)
+_BATCH: llm_batch.Collector | None = None
 
 OLLAMA_MAC_PORT = 12434
 OLLAMA_WIN_PORT = 11434
@@ -94,9 +122,11 @@ def _resolve_ollama_url(model):
 
 
 def init_llm():
-    global _LLM, _PROVIDER, _CONTEXT_SIZE
+    global _LLM, _PROVIDER, _MODEL, _CONTEXT_SIZE
     _PROVIDER = os.environ.get("AI_PROVIDER", "anthropic").lower()
     _CONTEXT_SIZE = None
+    _RUNNABLES.clear()
+    llm_scheduler.reset()
 
     if _PROVIDER == "anthropic":
         from langchain_anthropic import ChatAnthropic
@@ -105,7 +135,7 @@ def init_llm():
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY not set in env.txt")
-        _LLM = ChatAnthropic(anthropic_api_key=api_key, model=model)
+        _LLM = ChatAnthropic(anthropic_api_key=api_key, model=model, max_retries=0)
 
     elif _PROVIDER == "openai":
         from langchain_openai import ChatOpenAI
@@ -114,14 +144,15 @@ def init_llm():
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not set in env.txt")
-        _LLM = ChatOpenAI(api_key=api_key, model=model)
+        _LLM = ChatOpenAI(api_key=api_key, model=model, max_retries=0)
 
     elif _PROVIDER == "ollama":
         from langchain_ollama import ChatOllama
 
         model = os.environ.get("OLLAMA_MODEL") or "llama3"
         base_url = _resolve_ollama_url(model)
-        _LLM = ChatOllama(model=model, base_url=base_url)
+        keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE") or DEFAULT_OLLAMA_KEEP_ALIVE
+        _LLM = ChatOllama(model=model, base_url=base_url, keep_alive=keep_alive)
         ctx = _fetch_ollama_context_size(base_url, model)
         if ctx is not None:
             _CONTEXT_SIZE = ctx
@@ -130,6 +161,7 @@ def init_llm():
     else:
         raise ValueError(f"Unknown AI_PROVIDER: {_PROVIDER}")
 
+    _MODEL = model
     print(f"  LLM initialized: provider={_PROVIDER}, model={model}")
 
 
@@ -146,6 +178,95 @@ def _bind_kwargs(tokens: int, temperature: float | None = None):
     return out
 
 
+def _runnable(max_tokens: int, temperature: float | None = None, schema=None):
+    """
+    Return the model bound to max_tokens/temperature (and wrapped for structured
+    output if schema is given). Each variant is built once and reused.
+    """
+    global _RUNNABLES_LLM
+    if _RUNNABLES_LLM is not _LLM:
+        _RUNNABLES.clear()
+        _RUNNABLES_LLM = _LLM
+    key = (schema, max_tokens, temperature)
+    runnable = _RUNNABLES.get(key)
+    if runnable is None:
+        base = _LLM.with_structured_output(schema) if schema is not None else _LLM
+        runnable = base.bind(**_bind_kwargs(max_tokens, temperature))
+        _RUNNABLES[key] = runnable
+    return runnable
+
+
+def prompt_cache_enabled() -> bool:
+    return os.environ.get("LLM_PROMPT_CACHE", "on").strip().lower() not in ("off", "0", "false", "no")
+
+
+def prompt_cache_min_tokens() -> int:
+    """Smallest prefix the current provider/model caches (env LLM_PROMPT_CACHE_MIN_TOKENS overrides)."""
+    override = os.environ.get("LLM_PROMPT_CACHE_MIN_TOKENS", "").strip()
+    if override.isdigit():
+        return int(override)
+    if _PROVIDER == "anthropic" and "haiku" in (_MODEL or "").lower():
+        return PROMPT_CACHE_MIN_TOKENS_HAIKU
+    return PROMPT_CACHE_MIN_TOKENS.get(_PROVIDER, 0)
+
+
+def prefix_cacheable(prefix: str) -> bool:
+    """True if prompt caching is on and prefix reaches the provider's minimum length."""
+    return (bool(prefix) and prompt_cache_enabled()
+            and len(prefix) // PROMPT_CACHE_CHARS_PER_TOKEN >= prompt_cache_min_tokens())
+
+
+def _message(prompt: str, prefix: str = "") -> HumanMessage:
+    """
+    User message of prefix + prompt. The prefix is the part shared by many calls:
+    Anthropic gets it as a separate block marked for caching (cache_control) if it
+    reaches the minimum cacheable length; OpenAI caches long identical prefixes
+    automatically, Ollama reuses the KV cache of the loaded model, so for them the
+    prefix only has to come first.
+    """
+    if _PROVIDER == "anthropic" and prefix_cacheable(prefix):
+        return HumanMessage(content=[
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt},
+        ])
+    return HumanMessage(content=prefix + prompt)
+
+
+class _UsageRecorder(BaseCallbackHandler):
+    """Counts prompt cache reads/writes from the usage metadata of each model response."""
+
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                _record_usage(getattr(generation, "message", None))
+
+
+def _record_usage(message) -> None:
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    details = usage.get("input_token_details") or {}
+    PROMPT_CACHE_STATS["calls"] += 1
+    PROMPT_CACHE_STATS["input_tokens"] += usage.get("input_tokens", 0)
+    PROMPT_CACHE_STATS["cache_read_tokens"] += details.get("cache_read", 0)
+    PROMPT_CACHE_STATS["cache_write_tokens"] += details.get("cache_creation", 0)
+    if details.get("cache_read"):
+        PROMPT_CACHE_STATS["hits"] += 1
+
+
+async def _scheduled(runnable, prompt: str, max_tokens: int, prefix: str = ""):
+    """Invoke runnable with prefix + prompt through the provider's request scheduler."""
+    config = {"callbacks": [_UsageRecorder()]} if prefix else None
+    if prefix and prompt_cache_enabled() and not prefix_cacheable(prefix):
+        PROMPT_CACHE_STATS["short_prefix"] += 1
+    return await llm_scheduler.get(_PROVIDER).run(
+        lambda: runnable.ainvoke([_message(prompt, prefix)], config=config),
+        llm_scheduler.estimate_tokens(prefix + prompt, max_tokens),
+    )
+
+
 async def verify_llm():
     """Send a minimal test prompt to confirm the model is reachable and responds.
     Raises RuntimeError with a clear message on failure.
@@ -153,8 +274,7 @@ async def verify_llm():
     if _LLM is None:
         raise RuntimeError("LLM not initialized -- call init_llm() first")
     try:
-        bound = _LLM.bind(**_bind_kwargs(5))
-        await bound.ainvoke([HumanMessage(content="Say OK")])
+        await _scheduled(_runnable(5), "Say OK", 5)
         print(f"  LLM verified: {_PROVIDER} responded OK.")
     except Exception as e:
         raise RuntimeError(
@@ -164,34 +284,89 @@ async def verify_llm():
 
 
 async def ainvoke(
-    prompt: str, max_tokens: int = 1000, temperature: float | None = None
+    prompt: str, max_tokens: int = 1000, temperature: float | None = None, prefix: str = ""
 ) -> str:
+    """Invoke LLM with prefix + prompt (prefix: stable part for prompt caching)."""
     if _LLM is None:
         raise RuntimeError("LLM not initialized -- call init_llm() first")
-    bound = _LLM.bind(**_bind_kwargs(max_tokens, temperature))
-    response = await bound.ainvoke([HumanMessage(content=prompt)])
+    kwargs = _bind_kwargs(max_tokens, temperature)
+    key = llm_cache.make_key(_PROVIDER, _MODEL, kwargs, None, prefix + prompt) if llm_cache.mode() != "off" else None
+    if key:
+        cached = llm_cache.lookup(key)
+        if cached is not None:
+            return cached
+    response = await _scheduled(_runnable(max_tokens, temperature), prompt, max_tokens, prefix)
+    if key:
+        llm_cache.store(key, response.content)
     return response.content
 
 
-async def ainvoke_retry(prompt: str, max_tokens: int = 400) -> str:
+async def ainvoke_retry(prompt: str, max_tokens: int = 400, prefix: str = "") -> str:
     """Retry with lower temperature and smaller output. Last-resort fallback."""
-    return await ainvoke(prompt, max_tokens=max_tokens, temperature=0.3)
+    return await ainvoke(prompt, max_tokens=max_tokens, temperature=0.3, prefix=prefix)
 
 
 async def ainvoke_structured(
-    prompt: str, schema: Type[SchemaT], max_tokens: int = 1000
+    prompt: str, schema: Type[SchemaT], max_tokens: int = 1000, prefix: str = ""
 ) -> dict | None:
     """Invoke LLM with structured output. Returns dict on success, None on failure."""
     if _LLM is None:
         raise RuntimeError("LLM not initialized -- call init_llm() first")
+    kwargs = _bind_kwargs(max_tokens)
+    key = llm_cache.make_key(_PROVIDER, _MODEL, kwargs, schema, prefix + prompt) if llm_cache.mode() != "off" else None
+    if key:
+        cached = llm_cache.lookup(key)
+        if cached is not None:
+            return cached
     try:
-        structured_llm = _LLM.with_structured_output(schema)
-        bound = structured_llm.bind(**_bind_kwargs(max_tokens))
-        result = await bound.ainvoke([HumanMessage(content=prompt)])
+        result = await _scheduled(_runnable(max_tokens, schema=schema), prompt, max_tokens, prefix)
         if hasattr(result, "model_dump"):
-            return result.model_dump()
-        if isinstance(result, dict):
-            return result
-        return dict(result) if result is not None else None
+            result = result.model_dump()
+        elif not isinstance(result, dict):
+            result = dict(result) if result is not None else None
     except Exception:
         return None
+    if key:
+        llm_cache.store(key, result)
+    return result
+
+
+def start_batch() -> llm_batch.Collector | None:
+    """
+    Collect analysis prompts for the provider's batch API (--llm-batch).
+    Returns the collector, or None if the provider has no batch API (Ollama).
+    """
+    global _BATCH
+    if _PROVIDER not in llm_batch.PROVIDERS:
+        print(f"  --llm-batch: {_PROVIDER} has no batch API, prompts are sent directly.")
+        _BATCH = None
+        return None
+    api_key = os.environ.get("ANTHROPIC_API_KEY" if _PROVIDER == "anthropic" else "OPENAI_API_KEY", "")
+    _BATCH = llm_batch.Collector(_PROVIDER, _MODEL, api_key)
+    return _BATCH
+
+
+def end_batch() -> None:
+    global _BATCH
+    _BATCH = None
+
+
+def batch_active() -> bool:
+    return _BATCH is not None
+
+
+async def ainvoke_batch(prompt: str, max_tokens: int = 1000, prefix: str = "") -> str:
+    """Like ainvoke, but the prompt goes into the run's batch (answers are cached the same way)."""
+    if _BATCH is None:
+        return await ainvoke(prompt, max_tokens=max_tokens, prefix=prefix)
+    kwargs = _bind_kwargs(max_tokens)
+    key = llm_cache.make_key(_PROVIDER, _MODEL, kwargs, None, prefix + prompt) if llm_cache.mode() != "off" else None
+    if key:
+        cached = llm_cache.lookup(key)
+        if cached is not None:
+            return cached
+    text = await _BATCH.request(prompt, max_tokens, prefix=prefix,
+                                cache_prefix=_PROVIDER == "anthropic" and prefix_cacheable(prefix))
+    if key:
+        llm_cache.store(key, text)
+    return text
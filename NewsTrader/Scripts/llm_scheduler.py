@@ -0,0 +1,196 @@
+"""LLM request scheduler: per-provider concurrency, rate limits, priority and backoff.
+
+Every model call of llm_provider passes the scheduler of the active provider:
+- at most max_in_flight requests run at once (a local Ollama has a fixed number
+  of parallel slots; hosted APIs allow many). Queued requests are admitted by
+  priority (portfolio before watchlist), then in arrival order.
+- token buckets for requests per minute and estimated tokens per minute
+  (prompt length / 4 + max_tokens) keep bursts under the provider limits.
+- rate limit / overload answers (429, 529) pause the whole provider for the
+  Retry-After time (or exponential backoff); transient errors are retried
+  up to MAX_RETRIES times.
+
+Limits per provider in DEFAULT_LIMITS; override with env LLM_MAX_IN_FLIGHT,
+LLM_RPM, LLM_TPM (0 = unlimited). Ollama slots default to OLLAMA_NUM_PARALLEL.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+
+PRIORITY_PORTFOLIO = 0
+PRIORITY_WATCHLIST = 1
+
+# max_in_flight, requests per minute, tokens per minute (0 = unlimited)
+DEFAULT_LIMITS = {
+    "anthropic": {"max_in_flight": 8, "rpm": 50, "tpm": 50_000},
+    "openai": {"max_in_flight": 16, "rpm": 500, "tpm": 200_000},
+    "ollama": {"max_in_flight": 4, "rpm": 0, "tpm": 0},
+}
+LIMIT_ENV = {"max_in_flight": "LLM_MAX_IN_FLIGHT", "rpm": "LLM_RPM", "tpm": "LLM_TPM"}
+CHARS_PER_TOKEN = 4
+MAX_RETRIES = 3
+BACKOFF_BASE = 2.0
+MAX_RETRY_AFTER = 600
+PAUSE_STATUSES = (429, 529)
+RETRY_STATUSES = (408, 409, 429)
+TRANSIENT_ERRORS = ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+# Per-run counters
+STATS = {"requests": 0, "queued": 0, "rate_wait_s": 0.0, "rate_limited": 0, "retries": 0, "backoff_s": 0.0}
+
+_PRIORITY = contextvars.ContextVar("llm_priority", default=PRIORITY_WATCHLIST)
+_SCHEDULERS: dict[str, "Scheduler"] = {}
+
+
+def set_priority(priority: int) -> None:
+    """Priority of the LLM calls of the current task (lower runs first)."""
+    _PRIORITY.set(priority)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    return len(prompt) // CHARS_PER_TOKEN + max_tokens
+
+
+def limits(provider: str) -> dict:
+    values = dict(DEFAULT_LIMITS.get(provider, DEFAULT_LIMITS["ollama"]))
+    envs = dict(LIMIT_ENV)
+    if provider == "ollama" and not os.environ.get("LLM_MAX_IN_FLIGHT"):
+        envs["max_in_flight"] = "OLLAMA_NUM_PARALLEL"
+    for name, env in envs.items():
+        try:
+            values[name] = max(0, int(os.environ.get(env, values[name])))
+        except ValueError:
+            pass
+    return values
+
+
+def _status(e: Exception) -> int | None:
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(e: Exception) -> float | None:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return min(float(headers["retry-after-ms"]) / 1000, MAX_RETRY_AFTER)
+        return min(float(headers.get("retry-after", "")), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable(e: Exception) -> bool:
+    status = _status(e)
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    return type(e).__name__ in TRANSIENT_ERRORS
+
+
+class _Bucket:
+    """Token bucket refilled at per_minute / 60 per second. Reservations may go negative."""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount; returns the seconds to wait until it is covered."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate) - amount
+        self.stamp = now
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+
+class Scheduler:
+    """Admission control for one provider (see module docstring)."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.limits = limits(provider)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._requests = _Bucket(self.limits["rpm"]) if self.limits["rpm"] else None
+        self._tokens = _Bucket(self.limits["tpm"]) if self.limits["tpm"] else None
+
+    async def _acquire(self, priority: int) -> None:
+        limit = self.limits["max_in_flight"]
+        if not limit or (self.in_flight < limit and not self._waiters):
+            self.in_flight += 1
+            return
+        STATS["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future  # the slot is handed over by _release
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def _wait_rate(self, tokens: int) -> None:
+        wait = max(0.0, self.paused_until - time.monotonic())
+        if self._requests:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        if wait > 0:
+            STATS["rate_wait_s"] = round(STATS["rate_wait_s"] + wait, 3)
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests of this provider for seconds."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def run(self, call, tokens: int):
+        """Await call() (a coroutine factory) within the limits; retries transient errors."""
+        priority = _PRIORITY.get()
+        for attempt in range(MAX_RETRIES + 1):
+            await self._acquire(priority)
+            try:
+                await self._wait_rate(tokens)
+                STATS["requests"] += 1
+                return await call()
+            except Exception as e:
+                if attempt == MAX_RETRIES or not _retryable(e):
+                    raise
+                status = _status(e)
+                delay = _retry_after(e) or BACKOFF_BASE * 2 ** attempt
+                if status in PAUSE_STATUSES:
+                    STATS["rate_limited"] += 1
+                    self.pause(delay)
+                STATS["retries"] += 1
+                STATS["backoff_s"] = round(STATS["backoff_s"] + delay, 3)
+                print(f"    LLM {self.provider}: {status or type(e).__name__}, retry in {delay:.1f}s")
+            finally:
+                self._release()
+            if status not in PAUSE_STATUSES:
+                await asyncio.sleep(delay)
+
+
+def get(provider: str) -> Scheduler:
+    scheduler = _SCHEDULERS.get(provider)
+    if scheduler is None:
+        scheduler = _SCHEDULERS[provider] = Scheduler(provider)
+    return scheduler
+
+
+def reset() -> None:
+    """Forget schedulers (limits are read again from the environment)."""
+    _SCHEDULERS.clear()
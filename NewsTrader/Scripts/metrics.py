@@ -0,0 +1,119 @@
+"""Per-run telemetry for price and news source attempts.
+
+Every source attempt is recorded with asset, kind (price/news), source, host,
+status, bytes, duration and outcome:
+    hit        - the source delivered (price found / news items)
+    miss       - answered, but nothing usable
+    http_error - non-200 status
+    error      - exception (message kept in "error"; callers may still swallow it)
+    cancelled  - stopped by the hedged search after a better source won
+    skipped    - not requested, host paused by the circuit breaker (http_client)
+At the end of a run the records are written as JSON and CSV next to the
+_Pipeline.log and summarized per source.
+"""
+import contextvars
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+FIELDS = ["time", "asset", "kind", "source", "host", "status", "bytes", "duration_ms", "outcome", "error"]
+
+# Asset currently being fetched (set per fetch task; safe with concurrent fetches)
+current_asset = contextvars.ContextVar("current_asset", default="")
+
+_RECORDS: list[dict] = []
+
+
+def reset() -> None:
+    _RECORDS.clear()
+
+
+def records() -> list[dict]:
+    return list(_RECORDS)
+
+
+@contextmanager
+def track(kind: str, source: str, url: str = ""):
+    """
+    Time one source attempt. Yields the record; the caller sets status, bytes and
+    outcome ("hit"/"miss"/"http_error"). Exceptions are recorded and re-raised;
+    an exception class may name its own outcome (attribute "outcome").
+    """
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "asset": current_asset.get(),
+        "kind": kind,
+        "source": source,
+        "host": (urlsplit(url).hostname or "").replace("www.", "") if url else "",
+        "status": None,
+        "bytes": 0,
+        "duration_ms": 0.0,
+        "outcome": "miss",
+        "error": "",
+    }
+    start = time.perf_counter()
+    try:
+        yield entry
+    except Exception as e:
+        entry["outcome"] = getattr(e, "outcome", "error")
+        entry["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    except BaseException:
+        entry["outcome"] = "cancelled"
+        raise
+    finally:
+        entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _RECORDS.append(entry)
+
+
+def summarize() -> list[dict]:
+    """Per (kind, source): attempts, hits, errors, avg/p95/max ms, bytes."""
+    groups: dict[tuple, list] = {}
+    for r in _RECORDS:
+        groups.setdefault((r["kind"], r["source"]), []).append(r)
+    rows = []
+    for (kind, source), items in sorted(groups.items()):
+        durations = sorted(r["duration_ms"] for r in items)
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        rows.append({
+            "kind": kind,
+            "source": source,
+            "attempts": len(items),
+            "hits": sum(1 for r in items if r["outcome"] == "hit"),
+            "errors": sum(1 for r in items if r["outcome"] in ("error", "http_error")),
+            "avg_ms": round(sum(durations) / len(durations), 1),
+            "p95_ms": p95,
+            "max_ms": durations[-1],
+            "bytes": sum(r["bytes"] or 0 for r in items),
+        })
+    return rows
+
+
+def print_summary() -> None:
+    rows = summarize()
+    if not rows:
+        return
+    print("\n" + "=" * 40)
+    print("SOURCE TELEMETRY")
+    print("=" * 40)
+    print(f"{'kind':<6} {'source':<20} {'tries':>5} {'hits':>5} {'errs':>5} {'avg ms':>8} {'p95 ms':>8} {'KB':>7}")
+    for r in rows:
+        print(f"{r['kind']:<6} {r['source'][:20]:<20} {r['attempts']:>5} {r['hits']:>5} {r['errors']:>5} "
+              f"{r['avg_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['bytes'] // 1024:>7}")
+
+
+def write(log_file_path: str, extra: dict | None = None) -> tuple[str, str]:
+    """Write <log name>_metrics.json and .csv next to the log. Returns both paths."""
+    base = os.path.splitext(log_file_path)[0] + "_metrics"
+    json_path, csv_path = base + ".json", base + ".csv"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summarize(), "records": _RECORDS, **(extra or {})}, f, ensure_ascii=False, indent=1)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(_RECORDS)
+    return json_path, csv_path
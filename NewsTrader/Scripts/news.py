@@ -1,16 +1,195 @@
 """News aggregation: Google News RSS, Tiingo, Boersen-Zeitung."""
-import re
 import asyncio
-import requests
+import os
+import re
+import time
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from email.utils import parsedate_to_datetime
 
+import headline_store
+import http_client
+import metrics
 from data_providers import tiingo_get_news, ALPACA_AVAILABLE
 
+# Tiingo news feed: fetched once per TTL window and matched locally per asset
+DEFAULT_TIINGO_NEWS_TTL = 900
+TIINGO_NEWS_LIMIT = 50
+
+_TIINGO_FEED = {"fetched_at": None, "items": [], "index": {}}
+_TIINGO_LOCK: asyncio.Lock | None = None
+_TIINGO_LOCK_LOOP = None
+
+
+def _title_tokens(text: str) -> set[str]:
+    """Normalized word tokens of a title or name (lowercase, letters/digits)."""
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+
+def _tiingo_lock() -> asyncio.Lock:
+    """Return the feed lock for the running event loop."""
+    global _TIINGO_LOCK, _TIINGO_LOCK_LOOP
+    loop = asyncio.get_running_loop()
+    if _TIINGO_LOCK is None or _TIINGO_LOCK_LOOP is not loop:
+        _TIINGO_LOCK = asyncio.Lock()
+        _TIINGO_LOCK_LOOP = loop
+    return _TIINGO_LOCK
+
+
+async def get_tiingo_feed() -> dict:
+    """
+    Return the shared Tiingo news feed {fetched_at, items, index}. Fetched at most
+    once per TIINGO_NEWS_TTL seconds; concurrent callers wait for the same fetch.
+    index maps each title token to the positions of the items containing it.
+    """
+    try:
+        ttl = int(os.environ.get("TIINGO_NEWS_TTL", DEFAULT_TIINGO_NEWS_TTL))
+    except ValueError:
+        ttl = DEFAULT_TIINGO_NEWS_TTL
+    async with _tiingo_lock():
+        fetched_at = _TIINGO_FEED["fetched_at"]
+        if fetched_at is not None and time.monotonic() - fetched_at < ttl:
+            return _TIINGO_FEED
+        items = []
+        try:
+            with metrics.track("news", "Tiingo", "https://api.tiingo.com/tiingo/news") as m:
+                t_news = await asyncio.to_thread(tiingo_get_news, tickers=None, limit=TIINGO_NEWS_LIMIT)
+                if t_news and isinstance(t_news, list):
+                    items = [item for item in t_news if isinstance(item, dict)]
+                m["outcome"] = "hit" if items else "miss"
+        except Exception as e:
+            print(f"    Tiingo News fetch failed: {e}")
+        index = {}
+        for pos, item in enumerate(items):
+            for token in _title_tokens(item.get("title", "")):
+                index.setdefault(token, []).append(pos)
+        _TIINGO_FEED.update({"fetched_at": time.monotonic(), "items": items, "index": index})
+        return _TIINGO_FEED
+
+
+def match_tiingo_news(feed: dict, name: str, day_iso: str) -> list[dict]:
+    """Feed items published on day_iso whose title contains name (token index lookup)."""
+    tokens = _title_tokens(name)
+    if not tokens:
+        return []
+    candidates = None
+    for token in tokens:
+        positions = set(feed["index"].get(token, ()))
+        candidates = positions if candidates is None else candidates & positions
+        if not candidates:
+            return []
+    matches = []
+    for pos in sorted(candidates):
+        item = feed["items"][pos]
+        if not item.get("publishedDate", "").startswith(day_iso):
+            continue
+        if name.lower() in item.get("title", "").lower():
+            matches.append(item)
+    return matches
+
+
+# Google News RSS: item cap per feed; the feed is sorted newest first, so parsing
+# stops after this many items older than today in a row (tolerates small reorderings)
+GOOGLE_NEWS_MAX_ITEMS = 20
+GOOGLE_NEWS_OLD_ITEMS_STOP = 3
+_FEED_CHUNK = 16_384
+
+
+class GoogleNewsFeedParser:
+    """
+    Incremental Google News RSS parser: feed() raw chunks as they arrive.
+    Items are handled one by one and dropped from the tree; feed() returns True
+    once max_items items of today are collected or the feed has moved
+    past today, so the caller can stop downloading.
+    """
+
+    def __init__(self, gl: str, today, max_items: int = GOOGLE_NEWS_MAX_ITEMS):
+        self.gl = gl
+        self.today = today
+        self.max_items = max_items
+        self.items: list[dict] = []
+        self.done = False
+        self._old_in_row = 0
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._channel = None
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.done:
+            return True
+        self._parser.feed(chunk)
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if elem.tag == "channel":
+                    self._channel = elem
+                continue
+            if elem.tag != "item":
+                continue
+            self._add(elem)
+            if self._channel is not None:
+                self._channel.remove(elem)
+            if self.done:
+                break
+        return self.done
+
+    def _add(self, item) -> None:
+        try:
+            dt = parsedate_to_datetime(item.findtext("pubDate"))
+        except Exception:
+            return
+        day = dt.date()
+        if day < self.today:
+            self._old_in_row += 1
+            self.done = self._old_in_row >= GOOGLE_NEWS_OLD_ITEMS_STOP
+            return
+        self._old_in_row = 0
+        if day != self.today:
+            return
+        self.items.append({
+            "source": f"Google News ({self.gl})",
+            "title": item.findtext("title"),
+            "date": dt.strftime("%d.%m.%Y %H:%M"),
+            "url": item.findtext("link"),
+        })
+        self.done = len(self.items) >= self.max_items
+
+
+def _parse_google_news(content: bytes, gl: str, today) -> list[dict]:
+    """Items from a complete Google News RSS feed published on date today (max 20)."""
+    parser = GoogleNewsFeedParser(gl, today)
+    for start in range(0, len(content), _FEED_CHUNK):
+        if parser.feed(content[start:start + _FEED_CHUNK]):
+            break
+    return parser.items
+
+
+_BZ_ARTICLE_LINK = re.compile(r'<a[^>]*href="(/[^"]*)"[^>]*>([^<]{20,100})</a>')
 
-async def get_google_news(query, country_code="US"):
-    """Fetch recent news via Google News RSS based on country and filter for today."""
+
+def _parse_boersen_zeitung(html: str, known_titles=(), limit: int = 5) -> list[dict]:
+    """Article links from a Boersen-Zeitung search page, skipping known titles (max limit)."""
+    items = []
+    seen = set(known_titles)
+    for href, title in _BZ_ARTICLE_LINK.findall(html):
+        if any(skip in href.lower() for skip in ["login", "abo", "newsletter", "impressum", "datenschutz"]):
+            continue
+        if any(skip in title.lower() for skip in ["anmelden", "registrieren", "cookie"]):
+            continue
+        title_clean = title.strip()
+        if len(title_clean) > 15 and title_clean not in seen:
+            seen.add(title_clean)
+            items.append({
+                "source": "Boersen-Zeitung",
+                "title": title_clean,
+                "date": datetime.now().strftime("%d.%m.%Y"),
+                "url": f"https://www.boersen-zeitung.de{href}" if href.startswith("/") else href,
+            })
+            if len(items) >= limit:
+                break
+    return items
+
+
+async def get_google_news(query, country_code="US", max_items: int = GOOGLE_NEWS_MAX_ITEMS):
+    """Fetch recent news via Google News RSS based on country and filter for today (max_items)."""
     today = datetime.now().date()
     cc_map = {
         "DE": {"hl": "de", "gl": "DE", "ceid": "DE:de"},
@@ -23,29 +202,17 @@ async def get_google_news(query, country_code="US"):
     params = cc_map.get(country_code.upper(), cc_map["US"])
     hl, gl, ceid = params["hl"], params["gl"], params["ceid"]
 
+    url = f"https://news.google.com/rss/search?q={query}&hl={hl}&gl={gl}&ceid={ceid}"
     try:
-        url = f"https://news.google.com/rss/search?q={query}&hl={hl}&gl={gl}&ceid={ceid}"
-        response = requests.get(url, timeout=10)
-        if response.status_code != 200:
-            return []
-        root = ET.fromstring(response.content)
-        news_items = []
-        for item in root.findall(".//item"):
-            pub_date_str = item.find("pubDate").text
-            try:
-                dt = parsedate_to_datetime(pub_date_str)
-                if dt.date() != today:
-                    continue
-            except Exception:
-                continue
-            news_items.append({
-                "source": f"Google News ({gl})",
-                "title": item.find("title").text,
-                "date": dt.strftime("%d.%m.%Y %H:%M"),
-                "url": item.find("link").text,
-            })
-            if len(news_items) >= 20:
-                break
+        with metrics.track("news", f"Google News ({gl})", url) as m:
+            parser = GoogleNewsFeedParser(gl, today, max_items)
+            response = await http_client.fetch_stream(url, parser.feed, timeout=10, cache=True)
+            m.update(status=response.status_code, bytes=response.num_bytes_downloaded)
+            if response.status_code != 200:
+                m["outcome"] = "http_error"
+                return []
+            news_items = parser.items
+            m["outcome"] = "hit" if news_items else "miss"
         print(f"    Found {len(news_items)} today from Google News ({gl})")
         return news_items
     except Exception as e:
@@ -53,9 +220,27 @@ async def get_google_news(query, country_code="US"):
         return []
 
 
-async def aggregate_news(asset, ticker):
-    """Aggregate news internationally with clear source logging."""
-    all_news = []
+DERIVATIVE_KEYWORDS = [
+    "Call", "Put", "Turbo", "Zertifikat", "OS", "Warrant", "Mini",
+    "Classic", "Long", "Short", "Faktor", "Discount", "Underlying",
+]
+DERIVATIVE_BANKS = [
+    "HSBC", "BNP", "DZ", "Bank", "Goldman", "Sachs", "SocGen",
+    "Vontobel", "Citi", "Citigroup", "Morgan", "Stanley", "UBS",
+    "J.P.", "JP", "UniCredit",
+]
+# Legal form words ignored when routing batched news items to assets by title
+LEGAL_FORMS = {"ag", "se", "inc", "inc.", "corp", "corp.", "plc", "nv", "n.v.", "sa", "s.a.", "ltd", "ltd.",
+               "co", "co.", "kgaa", "&", "gmbh", "holding", "group", "class", "a", "the"}
+# Batched Google News: items per OR query before parsing stops (per asset in the batch)
+NEWS_BATCH_ITEMS_PER_ASSET = 10
+
+
+def news_search_name(asset, ticker) -> tuple[str, str, bool]:
+    """
+    (search name, country code, is_derivative) for an asset. For derivatives the
+    search name is the underlying: issuer, product type words and years are dropped.
+    """
     asset_name = asset.get("Asset", ticker) or ""
     isin = str(asset.get("ISIN", "")).strip()
 
@@ -64,26 +249,17 @@ async def aggregate_news(asset, ticker):
         country_code = isin[:2].upper()
 
     full_name = asset_name
-    derivative_keywords = [
-        "Call", "Put", "Turbo", "Zertifikat", "OS", "Warrant", "Mini",
-        "Classic", "Long", "Short", "Faktor", "Discount", "Underlying",
-    ]
-    is_derivative = any(dk.lower() in full_name.lower() for dk in derivative_keywords)
+    is_derivative = any(dk.lower() in full_name.lower() for dk in DERIVATIVE_KEYWORDS)
 
     if is_derivative:
         words = full_name.split()
-        banks = [
-            "HSBC", "BNP", "DZ", "Bank", "Goldman", "Sachs", "SocGen",
-            "Vontobel", "Citi", "Citigroup", "Morgan", "Stanley", "UBS",
-            "J.P.", "JP", "UniCredit",
-        ]
-        types = derivative_keywords + ["Open", "End", "auf", "Basiswert", "Line"]
+        types = DERIVATIVE_KEYWORDS + ["Open", "End", "auf", "Basiswert", "Line"]
         filtered_words = []
         for w in words:
             clean_w = w.strip(",() ")
             if clean_w.isdigit() and len(clean_w) == 4:
                 continue
-            if clean_w.upper() in [b.upper() for b in banks]:
+            if clean_w.upper() in [b.upper() for b in DERIVATIVE_BANKS]:
                 continue
             if clean_w.upper() in [t.upper() for t in types]:
                 continue
@@ -92,14 +268,106 @@ async def aggregate_news(asset, ticker):
             filtered_words.append(clean_w)
         if filtered_words:
             full_name = " ".join(filtered_words)
-            print(f"    Derivative detected! Underlying: '{full_name}'")
+    return full_name, country_code, is_derivative
+
 
-    print(f"    Seek: Web Search (Google News {country_code}) for '{full_name}'...")
-    query_suffix = "+stock" if country_code != "US" else ""
+def _google_news_suffix(country_code: str) -> str:
     if country_code == "DE":
-        query_suffix = "+Aktie"
-    search_query = f'"{full_name}"{query_suffix}' if len(full_name.split()) > 1 else f"{full_name}{query_suffix}"
-    raw_news = await get_google_news(search_query, country_code)
+        return "+Aktie"
+    return "+stock" if country_code != "US" else ""
+
+
+def _google_news_query(full_name: str, country_code: str) -> str:
+    query_suffix = _google_news_suffix(country_code)
+    return f'"{full_name}"{query_suffix}' if len(full_name.split()) > 1 else f"{full_name}{query_suffix}"
+
+
+def _google_news_batch_query(names: list[str], country_code: str) -> str:
+    """'("A" OR "B")+Aktie': the per-asset query for one name, names OR'ed otherwise."""
+    if len(names) == 1:
+        return _google_news_query(names[0], country_code)
+    return "(" + " OR ".join(f'"{name}"' for name in names) + ")" + _google_news_suffix(country_code)
+
+
+def _match_name(full_name: str) -> str:
+    """Name as it appears in headlines: 'SAP SE' -> 'sap', 'Rheinmetall AG' -> 'rheinmetall'."""
+    words = full_name.lower().split()
+    core = [w for w in words if w not in LEGAL_FORMS]
+    return " ".join(core or words)
+
+
+def _match_pattern(full_name: str) -> re.Pattern | None:
+    """Whole-word, case-insensitive headline pattern for _match_name ('sap' does not match 'Sapphire')."""
+    name = _match_name(full_name)
+    return re.compile(rf"(?<!\w){re.escape(name)}(?!\w)", re.IGNORECASE) if name else None
+
+
+async def prefetch_google_news(assets, batch_size: int) -> dict:
+    """
+    Google News for many assets with one OR query per batch and country:
+    '("A" OR "B" OR "C")+Aktie' (same country suffix as the per-asset query).
+    Items are routed back to every asset whose name (without legal form) appears
+    as a whole word in the title. Returns {(country, search name): items}
+    for aggregate_news(google_news=...).
+    """
+    names_by_country: dict[str, list[str]] = {}
+    for asset in assets:
+        full_name, country_code, _ = news_search_name(asset, asset.get("Ticker", ""))
+        if full_name and full_name not in names_by_country.setdefault(country_code, []):
+            names_by_country[country_code].append(full_name)
+
+    routed = {}
+    batch_size = max(1, batch_size)
+    for country_code, names in names_by_country.items():
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            query = _google_news_batch_query(batch, country_code)
+            items = await get_google_news(query, country_code, max_items=NEWS_BATCH_ITEMS_PER_ASSET * len(batch))
+            matchers = [(name, _match_pattern(name)) for name in batch]
+            for name in batch:
+                routed[(country_code, name)] = []
+            for item in items:
+                title = item.get("title") or ""
+                for name, pattern in matchers:
+                    if pattern and pattern.search(title):
+                        routed[(country_code, name)].append(item)
+    queries = sum((len(n) + batch_size - 1) // batch_size for n in names_by_country.values())
+    print(f"News: {len(routed)} search names in {queries} batched Google News queries")
+    return routed
+
+
+async def aggregate_news(asset, ticker, google_news=None):
+    """
+    Aggregate news internationally with clear source logging.
+    Items pass the run-wide headline store: exact and near-duplicate headlines
+    (across sources) are kept once per asset.
+    google_news: result of prefetch_google_news(); without it (or if the asset is
+    missing there) Google News is queried for this asset alone.
+    """
+    all_news = []
+    asset_name = asset.get("Asset", ticker) or ""
+    store = headline_store.get_store()
+    seen_ids = set()
+
+    def add_item(item) -> bool:
+        hid = store.add(item, asset_name)
+        if hid in seen_ids:
+            return False
+        seen_ids.add(hid)
+        all_news.append(item)
+        return True
+
+    full_name, country_code, is_derivative = news_search_name(asset, ticker)
+    if is_derivative and full_name != asset_name:
+        print(f"    Derivative detected! Underlying: '{full_name}'")
+
+    batched = (google_news or {}).get((country_code, full_name))
+    if batched is not None:
+        print(f"    Seek: Web Search (Google News {country_code}, batched) for '{full_name}'...")
+        raw_news = batched
+    else:
+        print(f"    Seek: Web Search (Google News {country_code}) for '{full_name}'...")
+        raw_news = await get_google_news(_google_news_query(full_name, country_code), country_code)
 
     financial_keywords = [
         "stock", "market", "mining", "quarter", "revenue", "profit",
@@ -109,9 +377,9 @@ async def aggregate_news(asset, ticker):
     for item in raw_news:
         if len(full_name.split()) < 2:
             if any(kw.lower() in item["title"].lower() for kw in financial_keywords):
-                all_news.append(item)
+                add_item(item)
         else:
-            all_news.append(item)
+            add_item(item)
 
     if raw_news:
         print(f"    Found {len(all_news)} items from Web Search")
@@ -120,22 +388,15 @@ async def aggregate_news(asset, ticker):
     if len(all_news) < 5:
         print(f"    Seek: Tiingo News for '{full_name}'...")
         try:
-            t_news = tiingo_get_news(tickers=None, limit=50)
+            feed = await get_tiingo_feed()
             found_t = 0
-            if t_news and isinstance(t_news, list):
-                for item in t_news:
-                    if not item.get("publishedDate", "").startswith(today_iso):
-                        continue
-                    title = item.get("title", "")
-                    if full_name.lower() in title.lower():
-                        if not any(n["title"] == title for n in all_news):
-                            all_news.append({
-                                "source": "Tiingo",
-                                "title": title,
-                                "date": item.get("publishedDate"),
-                                "url": item.get("url"),
-                            })
-                            found_t += 1
+            for item in match_tiingo_news(feed, full_name, today_iso):
+                found_t += add_item({
+                    "source": "Tiingo",
+                    "title": item.get("title", ""),
+                    "date": item.get("publishedDate"),
+                    "url": item.get("url"),
+                })
             if found_t:
                 print(f"    Found {found_t} items from Tiingo")
         except Exception:
@@ -155,33 +416,15 @@ async def aggregate_news(asset, ticker):
             }
             search_term = full_name.replace(" ", "+")
             bz_url = f"https://www.boersen-zeitung.de/suche?q={search_term}"
-            bz_resp = await asyncio.to_thread(
-                requests.get, bz_url, headers=bz_headers, timeout=10
-            )
-            if bz_resp.status_code == 200:
-                html = bz_resp.text
-                found_bz = 0
-                articles = re.findall(
-                    r'<a[^>]*href="(/[^"]*)"[^>]*>([^<]{20,100})</a>', html
-                )
-                for href, title in articles:
-                    if any(skip in href.lower() for skip in ["login", "abo", "newsletter", "impressum", "datenschutz"]):
-                        continue
-                    if any(skip in title.lower() for skip in ["anmelden", "registrieren", "cookie"]):
-                        continue
-                    title_clean = title.strip()
-                    if len(title_clean) > 15 and not any(n["title"] == title_clean for n in all_news):
-                        all_news.append({
-                            "source": "Boersen-Zeitung",
-                            "title": title_clean,
-                            "date": datetime.now().strftime("%d.%m.%Y"),
-                            "url": f"https://www.boersen-zeitung.de{href}" if href.startswith("/") else href,
-                        })
-                        found_bz += 1
-                        if found_bz >= 5:
-                            break
-                if found_bz:
-                    print(f"    Found {found_bz} items from Boersen-Zeitung")
+            with metrics.track("news", "Boersen-Zeitung", bz_url) as m:
+                bz_resp = await http_client.get(bz_url, headers=bz_headers, timeout=10)
+                m.update(status=bz_resp.status_code, bytes=len(bz_resp.content), outcome="http_error")
+                if bz_resp.status_code == 200:
+                    parsed = _parse_boersen_zeitung(bz_resp.text, [n["title"] for n in all_news])
+                    bz_items = [i for i in parsed if add_item(i)]
+                    m["outcome"] = "hit" if bz_items else "miss"
+                    if bz_items:
+                        print(f"    Found {len(bz_items)} items from Boersen-Zeitung")
         except Exception as e:
             print(f"    Boersen-Zeitung failed: {e}")
 
@@ -2,29 +2,67 @@
 import os
 import sys
 import glob
+import asyncio
 import pandas as pd
 from datetime import datetime
 
 import config
+import headline_store
+import http_cache
+import http_client
+import llm_batch
+import llm_cache
 import llm_provider
+import llm_scheduler
+import metrics
+import source_ranking
 from utils import Tee
-from data_providers import get_forex_rate, ALPACA_AVAILABLE
-from price_search import deep_dive_price_search
-from news import aggregate_news
+from data_providers import get_forex_rate, get_alpaca_latest_quotes, ALPACA_AVAILABLE
+from price_search import deep_dive_price_search, get_cached_quote, store_quote, flush_quote_cache
+from news import aggregate_news, prefetch_google_news
 from ai_analysis import analyze_data, troubleshoot_no_price, write_llm_debug
 from pdf_report import create_pdf
 from excel_report import save_analysis_excel
 
-if ALPACA_AVAILABLE:
-    from alpaca.data.historical import StockHistoricalDataClient
-    from alpaca.data.requests import StockLatestQuoteRequest
 
-
-async def fetch_asset_data(asset):
-    """Fetch all data for an asset using available price sources."""
+def _asset_ticker(asset):
+    """Return the asset's ticker, falling back to its ISIN."""
     ticker = asset.get("Ticker", "")
     if not ticker and asset.get("ISIN"):
         ticker = asset.get("ISIN")
+    return ticker
+
+
+async def prefetch_alpaca_quotes(assets):
+    """
+    Fetch Alpaca latest quotes for all assets in one batched request (chunked).
+    Assets with a fresh cached quote are skipped. Returns {ticker: quote} or None
+    if Alpaca is not configured (fetch_asset_data then skips Alpaca).
+    """
+    if not (ALPACA_AVAILABLE and config.ALPACA_KEY):
+        return None
+    tickers = []
+    for asset in assets:
+        ticker = _asset_ticker(asset)
+        if ticker and not get_cached_quote(asset, ticker):
+            tickers.append(ticker)
+    if not tickers:
+        return {}
+    with metrics.track("price", "Alpaca (batch)", "https://data.alpaca.markets/v2/stocks/quotes/latest") as m:
+        quotes = await asyncio.to_thread(get_alpaca_latest_quotes, tickers)
+        m["outcome"] = "hit" if quotes else "miss"
+    print(f"Alpaca: {len(quotes)} of {len(tickers)} quotes prefetched")
+    return quotes
+
+
+async def fetch_asset_data(asset, alpaca_quotes=None, google_news=None):
+    """
+    Fetch all data for an asset using available price sources.
+    alpaca_quotes: result of prefetch_alpaca_quotes(); without it the asset's
+    quote is requested on its own. google_news: batched news (prefetch_google_news).
+    """
+    ticker = _asset_ticker(asset)
+    metrics.current_asset.set(asset.get("Asset") or ticker)
 
     result = {
         "Asset": asset.get("Asset"),
@@ -36,20 +74,19 @@ async def fetch_asset_data(asset):
 
     price_found = False
 
+    cached = get_cached_quote(asset, ticker)
+    if cached and cached[0] in ("Alpaca_Price", "Web_Price"):
+        kind, quote, age = cached
+        result[kind] = {**quote, "cached": True}
+        print(f"    Cached quote ({age:.0f}s old): {quote.get('mid_price') or quote.get('price')}")
+        price_found = True
+
     if ALPACA_AVAILABLE and config.ALPACA_KEY and ticker and not price_found:
         try:
-            alpaca_client = StockHistoricalDataClient(config.ALPACA_KEY, config.ALPACA_SECRET)
-            req = StockLatestQuoteRequest(symbol_or_symbols=ticker)
-            quote = alpaca_client.get_stock_latest_quote(req)
-            if ticker in quote:
-                q = quote[ticker]
-                result["Alpaca_Price"] = {
-                    "bid": q.bid_price,
-                    "ask": q.ask_price,
-                    "mid_price": (q.bid_price + q.ask_price) / 2
-                    if q.bid_price and q.ask_price
-                    else None,
-                }
+            if alpaca_quotes is None:
+                alpaca_quotes = await asyncio.to_thread(get_alpaca_latest_quotes, [ticker])
+            if ticker in alpaca_quotes:
+                result["Alpaca_Price"] = dict(alpaca_quotes[ticker])
                 if result["Alpaca_Price"]["mid_price"] and config.Global_EURUSD:
                     orig = result["Alpaca_Price"]["mid_price"]
                     result["Alpaca_Price"]["mid_price"] = orig / config.Global_EURUSD
@@ -74,6 +111,12 @@ async def fetch_asset_data(asset):
         except Exception as e:
             result["Web_Price_Error"] = str(e)
 
+    if price_found and not cached:
+        if "Alpaca_Price" in result and result["Alpaca_Price"].get("mid_price"):
+            store_quote(asset, ticker, "Alpaca_Price", result["Alpaca_Price"])
+        elif "Web_Price" in result and "price" in result["Web_Price"]:
+            store_quote(asset, ticker, "Web_Price", result["Web_Price"])
+
     found_price_log = None
     found_source_log = None
     found_curr_log = "EUR"
@@ -93,7 +136,7 @@ async def fetch_asset_data(asset):
         print("    No current price found.")
         await troubleshoot_no_price(asset)
 
-    news_data = await aggregate_news(asset, ticker)
+    news_data = await aggregate_news(asset, ticker, google_news)
     result["News"] = news_data
     if news_data["count"] > 0:
         print(f"    Found {news_data['count']} news items")
@@ -101,6 +144,98 @@ async def fetch_asset_data(asset):
     return result
 
 
+class FatalAssetError(Exception):
+    """Raised when fetched asset data carries FATAL_ERROR; stops the whole run."""
+
+
+def _safe_name(asset):
+    """Return asset name reduced to letters and digits (for PDF file names)."""
+    return "".join([c for c in asset.get("Asset", "Unknown") if c.isalpha() or c.isdigit()]).strip()
+
+
+async def run_pipeline(jobs, all_assets, alpaca_quotes=None, google_news=None, batch=None):
+    """
+    Two-stage pipeline: fetch workers (network bound) put fetched data on an
+    asyncio.Queue, analysis workers (LLM bound) take it from there, analyze and
+    write the PDF. Stage widths: config.CONCURRENCY and config.LLM_CONCURRENCY.
+
+    Each job is a dict with "asset", "label", "pdf_path", "stop_on_fatal" and
+    "priority" (LLM scheduler priority of its calls).
+    alpaca_quotes (from prefetch_alpaca_quotes) and google_news (from
+    prefetch_google_news) are handed to every fetch.
+    With batch (the --llm-batch collector) every fetched asset joins the batch
+    and all analyses wait in parallel; the batch is closed when fetching is done.
+    Results keep job order. A FatalAssetError cancels all remaining work.
+    """
+    fetch_width = max(1, config.CONCURRENCY)
+    llm_width = max(1, config.LLM_CONCURRENCY or fetch_width)
+    if batch:
+        llm_width = max(1, len(jobs))
+    todo = asyncio.Queue()
+    for i, job in enumerate(jobs):
+        todo.put_nowait((i, job))
+    # Bounded so fetching does not run arbitrarily far ahead of the LLM
+    fetched = asyncio.Queue(maxsize=fetch_width + llm_width)
+    results = [None] * len(jobs)
+
+    async def _fetch_worker():
+        while True:
+            try:
+                i, job = todo.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            asset = job["asset"]
+            llm_scheduler.set_priority(job["priority"])
+            print(f"\n[{job['pos']}/{job['total']}] {job['label']}: {asset.get('Asset')}...")
+            data = await fetch_asset_data(asset, alpaca_quotes, google_news)
+            if job["stop_on_fatal"] and "FATAL_ERROR" in data:
+                raise FatalAssetError(data["FATAL_ERROR"])
+            if batch:
+                batch.join()
+            await fetched.put((i, job, data))
+
+    async def _analysis_worker():
+        while True:
+            item = await fetched.get()
+            if item is None:
+                return
+            i, job, data = item
+            asset = job["asset"]
+            llm_scheduler.set_priority(job["priority"])
+            try:
+                analysis = await analyze_data(asset, data, all_assets)
+            finally:
+                if batch:
+                    batch.leave()
+            final_record = {**asset, **analysis, **data}
+            try:
+                create_pdf(job["pdf_path"], final_record, config.get_model_display_name())
+            except Exception:
+                pass
+            results[i] = final_record
+
+    fetchers = [asyncio.create_task(_fetch_worker()) for _ in range(fetch_width)]
+    analysts = [asyncio.create_task(_analysis_worker()) for _ in range(llm_width)]
+
+    async def _close_fetch_stage():
+        await asyncio.gather(*fetchers)
+        if batch:
+            batch.close()
+        for _ in analysts:
+            await fetched.put(None)
+
+    closer = asyncio.create_task(_close_fetch_stage())
+    tasks = fetchers + analysts + [closer]
+    try:
+        await asyncio.gather(closer, *analysts)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return results
+
+
 async def main():
     config.Global_EURUSD = None
 
@@ -150,10 +285,13 @@ async def main():
     config.apply_cli_overrides()
 
     # Initialize and verify LLM (unless dummy mode)
+    batch = None
     if not config.DUMMY_ANALYSIS:
         try:
             llm_provider.init_llm()
             await llm_provider.verify_llm()
+            if config.LLM_BATCH:
+                batch = llm_provider.start_batch()
         except Exception as e:
             print(f"FATAL: LLM not available: {e}")
             sys.exit(1)
@@ -196,52 +334,108 @@ async def main():
 
     print(f"Starting Pipeline Analysis for {len(assets)} assets and {len(watchlist_assets)} watchlist items...")
 
-    results = []
-    watchlist_results = []
-
     config.Global_EURUSD = await get_forex_rate("EUR", "USD")
     if not config.Global_EURUSD:
         print("FATAL ERROR: Could not determine EUR/USD exchange rate.")
         print("   Cannot proceed safely with currency conversions.")
+        await http_client.aclose()
         return
 
     print(f"Active EUR/USD Rate: {config.Global_EURUSD}")
 
+    alpaca_quotes = await prefetch_alpaca_quotes(assets + watchlist_assets)
+    google_news = None
+    if config.NEWS_BATCH > 1:
+        google_news = await prefetch_google_news(assets + watchlist_assets, config.NEWS_BATCH)
+
+    jobs = []
+    for i, asset in enumerate(assets):
+        jobs.append({
+            "asset": asset,
+            "label": "Processing",
+            "pos": i + 1,
+            "total": len(assets),
+            "pdf_path": os.path.join(daily_folder, f"{today_str}_{_safe_name(asset)}{debug_suffix}.pdf"),
+            "stop_on_fatal": True,
+            "priority": llm_scheduler.PRIORITY_PORTFOLIO,
+        })
+    for i, asset in enumerate(watchlist_assets):
+        jobs.append({
+            "asset": asset,
+            "label": "Watching",
+            "pos": i + 1,
+            "total": len(watchlist_assets),
+            "pdf_path": os.path.join(daily_folder, f"{today_str}_CHECK_{_safe_name(asset)}{debug_suffix}.pdf"),
+            "stop_on_fatal": False,
+            "priority": llm_scheduler.PRIORITY_WATCHLIST,
+        })
+
     print("\n" + "=" * 40)
-    print("PROCESSING PORTFOLIO")
+    print("PROCESSING PORTFOLIO" + (" + WATCHLIST" if watchlist_assets else ""))
     print("=" * 40)
-    for i, asset in enumerate(assets):
-        print(f"\n[{i+1}/{len(assets)}] Processing: {asset.get('Asset')}...")
-        data = await fetch_asset_data(asset)
-        if "FATAL_ERROR" in data:
-            print("\n" + "!" * 50)
-            print(f"STOPPING: {data['FATAL_ERROR']}")
-            print("!" * 50)
-            sys.exit(1)
-        analysis = await analyze_data(asset, data, assets)
-        final_record = {**asset, **analysis, **data}
-        results.append(final_record)
+    analysis_width = "batch" if batch else f"x{max(1, config.LLM_CONCURRENCY or config.CONCURRENCY)}"
+    print(f"Stages: fetch x{max(1, config.CONCURRENCY)}, analysis {analysis_width}")
+    try:
+        records = await run_pipeline(jobs, assets, alpaca_quotes, google_news, batch)
+    except FatalAssetError as e:
+        print("\n" + "!" * 50)
+        print(f"STOPPING: {e}")
+        print("!" * 50)
+        sys.exit(1)
+    results = records[:len(assets)]
+    watchlist_results = records[len(assets):]
+
+    await http_client.aclose()
+    flush_quote_cache()
+    source_ranking.flush()
+    http_cache.flush()
+    llm_cache.flush()
+    if llm_cache.mode() != "off":
+        s = llm_cache.STATS
+        print(f"LLM cache ({llm_cache.mode()}): {s['hits']} hits, {s['misses']} misses, {s['stored']} stored")
+    s = llm_provider.PROMPT_CACHE_STATS
+    if s["calls"]:
+        print(f"Prompt cache: {s['hits']}/{s['calls']} calls hit, {s['cache_read_tokens']} of "
+              f"{s['input_tokens']} input tokens read from cache, {s['cache_write_tokens']} written")
+        if s["short_prefix"]:
+            print(f"   {s['short_prefix']} calls had a prefix below the provider's cache minimum "
+                  f"({llm_provider.prompt_cache_min_tokens()} tokens)")
+    s = llm_scheduler.STATS
+    if s["queued"] or s["rate_wait_s"] or s["retries"]:
+        print(f"LLM scheduler: {s['requests']} requests, {s['queued']} queued, "
+              f"{s['rate_wait_s']:.1f}s rate wait, {s['rate_limited']} rate limited, {s['retries']} retries")
+    if batch:
+        llm_provider.end_batch()
+        s = llm_batch.STATS
+        print(f"LLM batch: {s['batches']} batch(es), {s['succeeded']} answers, {s['failed']} failed, "
+              f"{s['wait_s']:.0f}s waiting")
+
+    metrics.print_summary()
+    try:
+        metrics_json, _ = metrics.write(
+            log_file_path,
+            {
+                "stream": dict(http_client.STREAM_STATS),
+                "throttle": dict(http_client.THROTTLE_STATS),
+                "http_cache": dict(http_cache.STATS),
+                "llm_cache": dict(llm_cache.STATS),
+                "llm_scheduler": dict(llm_scheduler.STATS),
+                "prompt_cache": dict(llm_provider.PROMPT_CACHE_STATS),
+                "llm_batch": dict(llm_batch.STATS),
+            },
+        )
+        print(f"Telemetry saved to {metrics_json} (+ .csv)")
+    except Exception as e:
+        print(f"   Telemetry write failed: {e}")
+    headlines = headline_store.get_store()
+    if headlines.headlines:
         try:
-            safe_name = "".join([c for c in asset.get("Asset", "Unknown") if c.isalpha() or c.isdigit()]).strip()
-            create_pdf(os.path.join(daily_folder, f"{today_str}_{safe_name}{debug_suffix}.pdf"), final_record, config.get_model_display_name())
-        except Exception:
-            pass
-
-    if watchlist_assets:
-        print("\n" + "=" * 40)
-        print("PROCESSING WATCHLIST")
-        print("=" * 40)
-        for i, asset in enumerate(watchlist_assets):
-            print(f"\n[{i+1}/{len(watchlist_assets)}] Watching: {asset.get('Asset')}...")
-            data = await fetch_asset_data(asset)
-            analysis = await analyze_data(asset, data, assets)
-            final_record = {**asset, **analysis, **data}
-            watchlist_results.append(final_record)
-            try:
-                safe_name = "".join([c for c in asset.get("Asset", "Unknown") if c.isalpha() or c.isdigit()]).strip()
-                create_pdf(os.path.join(daily_folder, f"{today_str}_CHECK_{safe_name}{debug_suffix}.pdf"), final_record, config.get_model_display_name())
-            except Exception:
-                pass
+            news_csv = headlines.write(log_file_path)
+            s = headlines.summary()
+            print(f"Headlines: {s['headlines']} unique, {s['duplicates']} duplicates merged, "
+                  f"{s['shared']} shared by several assets -> {news_csv}")
+        except Exception as e:
+            print(f"   News table write failed: {e}")
 
     save_analysis_excel(output_file, results, watchlist_results, assets)
 
@@ -0,0 +1,140 @@
+"""Declarative price extractors for price_search: per-site rule tables, precompiled.
+
+Each site is a table entry with an ordered list of PriceRules; the first rule that
+matches wins. Marker rules ("Brief ... 12,34") search for the price in a slice of
+MARKER_WINDOW characters after each marker instead of `.*?` across the whole page,
+so a marker without a price nearby costs a short scan instead of a backtrack to
+the end of a large page.
+Adding a site means adding an entry to LINK_SITES (or a rule to a list).
+"""
+import re
+from typing import NamedTuple
+
+# Max. characters between a marker word (Brief, Geld, Kaufen) and its price
+MARKER_WINDOW = 400
+MIN_PRICE = 0.01
+MAX_PRICE = 10000
+
+
+class PriceRule(NamedTuple):
+    source: str
+    pattern: re.Pattern
+    decimal_comma: bool = True  # "12,34" -> 12.34; False: plain float ("12.34")
+    bounded: bool = False  # reject prices outside MIN_PRICE..MAX_PRICE
+    label: str = ""  # log label; defaults to source
+    marker: re.Pattern | None = None  # pattern must start within MARKER_WINDOW after a marker
+
+
+def _marker(source: str, word: str, number: str = r"(\d+,\d{2})") -> PriceRule:
+    """Rule: first price within MARKER_WINDOW characters after the marker word."""
+    return PriceRule(source, re.compile(number), marker=re.compile(word, re.IGNORECASE))
+
+
+_ITEMPROP_PRICE = re.compile(r'itemprop="price"[^>]*content="([\d\.]+)"')
+_EUR_CELL = re.compile(r">(\d+[,\.]\d{2})\s*(?:€|EUR)<")
+
+# Quick search pages (Onvista, Ariva, Comdirect); source is "<site> (<rule source>)"
+QUICK_RULES = [
+    _marker("Brief", "Brief", r"(\d+,\d{2,4})"),
+    _marker("Geld", "Geld", r"(\d+,\d{2,4})"),
+]
+
+# Product/result pages by host substring, in priority order
+LINK_SITES = [
+    ("onvista.de", [
+        _marker("Onvista (Brief)", "Brief"),
+        _marker("Onvista (Geld)", "Geld"),
+        PriceRule("Onvista (Meta)", _ITEMPROP_PRICE, decimal_comma=False),
+        PriceRule(
+            "Onvista (Data)",
+            re.compile(r'value="([\d\.]+)"[^>]*class="[^"]*price[^"]*"'),
+            decimal_comma=False,
+        ),
+    ]),
+    ("finanzen.net", [
+        PriceRule("Finanzen.net", _ITEMPROP_PRICE, decimal_comma=False),
+        PriceRule("Finanzen.net (Table)", re.compile(r'col-price"[^>]*>([\d,]+)')),
+    ]),
+    ("bnpparibas", [
+        PriceRule("BNP (Meta)", _ITEMPROP_PRICE, decimal_comma=False),
+        PriceRule(
+            "BNP (JSON)",
+            re.compile(r'"(?:ask|offer|price|kaufen)"\s*[:=]\s*"?([\d\.]+)"?', re.IGNORECASE),
+            decimal_comma=False,
+        ),
+        _marker("BNP (Text Kaufen)", "Kaufen"),
+        _marker("BNP (Text Brief)", "Brief"),
+    ]),
+]
+
+GOOGLE_RULES = [
+    PriceRule("Google Finance", re.compile(r'data-last-price="([\d\.]+)"'), decimal_comma=False),
+    PriceRule("Google Search", _EUR_CELL, label="Google Search (EUR)"),
+    PriceRule(
+        "Google Search",
+        re.compile(r"(?:Kurs|Preis|Price|Aktuell)[:\s]+(\d+[,\.]\d{2})", re.IGNORECASE),
+        label="Google Search (Kurs)",
+    ),
+    PriceRule(
+        "Google Search",
+        re.compile(r"(\d{1,4}[,\.]\d{2})\s*(?:€|EUR|Euro)"),
+        bounded=True,
+        label="Google Search (Generic)",
+    ),
+]
+
+# Generic rules for the fallback portals; source is the site's host name
+FALLBACK_RULES = [
+    PriceRule("", _ITEMPROP_PRICE, bounded=True),
+    PriceRule("", re.compile(r'class="[^"]*price[^"]*"[^>]*>([\d,\.]+)', re.IGNORECASE), bounded=True),
+    PriceRule("", re.compile(r">(\d+[,\.]\d{2})\s*(?:€|EUR)<", re.IGNORECASE), bounded=True),
+    PriceRule("", re.compile(r"Kurs[:\s]+(\d+[,\.]\d{2})", re.IGNORECASE), bounded=True),
+]
+
+
+def _parse(rule: PriceRule, text: str) -> float | None:
+    try:
+        price = float(text.replace(",", ".") if rule.decimal_comma else text)
+    except ValueError:
+        return None
+    if rule.bounded and not MIN_PRICE <= price <= MAX_PRICE:
+        return None
+    return price
+
+
+def _search(rule: PriceRule, html: str):
+    if rule.marker is None:
+        return rule.pattern.search(html)
+    # Walk markers and prices together (both lazily, one pass): each marker takes
+    # the first price starting after it, like `marker.*?price`, if it is within
+    # MARKER_WINDOW. Stops at the first hit or when the prices run out.
+    prices = rule.pattern.finditer(html)
+    price = None
+    for marker in rule.marker.finditer(html):
+        while price is None or price.start() < marker.end():
+            price = next(prices, None)
+            if price is None:
+                return None
+        if price.start() <= marker.end() + MARKER_WINDOW:
+            return price
+    return None
+
+
+def extract(rules, html: str):
+    """Return (rule, price) for the first rule matching html, else None."""
+    for rule in rules:
+        match = _search(rule, html)
+        if match:
+            price = _parse(rule, match.group(1))
+            if price is not None:
+                return rule, price
+    return None
+
+
+def site_rules(url: str) -> list:
+    """Rules of every LINK_SITES entry whose host substring occurs in url, in order."""
+    rules = []
+    for needle, site in LINK_SITES:
+        if needle in url:
+            rules.extend(site)
+    return rules
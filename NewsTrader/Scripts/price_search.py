@@ -1,40 +1,414 @@
 """Web price search: cache and deep-dive scraping for asset prices."""
-import json
 import os
-import asyncio
-import requests
 import re
+import asyncio
+from datetime import datetime, timedelta
+
+import pytz
 
 import config
+import http_client
+import metrics
+import price_extractors
+import source_ranking
+from cache_store import open_cache_store
+
+# A cached source is dropped after this many consecutive failed lookups (env WEB_PRICE_CACHE_MAX_FAILURES)
+DEFAULT_WEB_PRICE_CACHE_MAX_FAILURES = 3
+
+# Quote cache TTL while the market is open (env QUOTE_CACHE_TTL, seconds).
+# Quotes fetched while the market is closed stay valid until the next open.
+DEFAULT_QUOTE_CACHE_TTL = 300
+MARKET_TZ = pytz.timezone("Europe/Berlin")
+MARKET_OPEN_HOUR = 8    # Tradegate / L&S / Xetra pre-market
+MARKET_CLOSE_HOUR = 22
+
+_WEB_PRICE_CACHE = None
+_QUOTE_CACHE = None
+
+
+def get_web_price_cache():
+    """
+    Return the run-wide web price cache store, opened on first use.
+    Backend from env WEB_PRICE_CACHE_BACKEND: json (default) or sqlite.
+    """
+    global _WEB_PRICE_CACHE
+    if _WEB_PRICE_CACHE is None:
+        _WEB_PRICE_CACHE = open_cache_store(
+            config.WEB_PRICE_CACHE_FILE, os.environ.get("WEB_PRICE_CACHE_BACKEND")
+        )
+    return _WEB_PRICE_CACHE
 
 
 def load_web_price_cache():
-    """Load web price source cache from disk."""
+    """Load web price source cache as a plain dict."""
     try:
-        if os.path.exists(config.WEB_PRICE_CACHE_FILE):
-            with open(config.WEB_PRICE_CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+        cache = get_web_price_cache()
+        return {key: cache.get(key) for key in cache.keys()}
     except Exception:
-        pass
-    return {}
+        return {}
 
 
-def save_web_price_cache(cache):
-    """Save web price source cache to disk."""
+def save_web_price_cache(cache=None):
+    """Write web price cache entries to disk (atomic, locked). cache: optional dict to store first."""
     try:
-        cache_dir = os.path.dirname(config.WEB_PRICE_CACHE_FILE)
-        if cache_dir and not os.path.exists(cache_dir):
-            os.makedirs(cache_dir, exist_ok=True)
-        with open(config.WEB_PRICE_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
+        store = get_web_price_cache()
+        for key, value in (cache or {}).items():
+            store.set(key, value)
+        store.flush()
     except Exception as e:
         print(f"    Cache save failed: {e}")
 
 
+def get_quote_cache():
+    """Return the quote cache store (same backend setting as the web price cache)."""
+    global _QUOTE_CACHE
+    if _QUOTE_CACHE is None:
+        _QUOTE_CACHE = open_cache_store(
+            config.QUOTE_CACHE_FILE, os.environ.get("WEB_PRICE_CACHE_BACKEND")
+        )
+    return _QUOTE_CACHE
+
+
+def flush_quote_cache():
+    """Persist pending quote cache writes."""
+    try:
+        get_quote_cache().flush()
+    except Exception as e:
+        print(f"    Quote cache save failed: {e}")
+
+
+def _quote_key(asset, ticker) -> str:
+    """ISIN, then WKN, then ticker."""
+    for value in (asset.get("ISIN"), asset.get("WKN"), ticker):
+        if value and str(value) != "nan":
+            return str(value).strip()
+    return ""
+
+
+def _market_is_open(when: datetime) -> bool:
+    local = when.astimezone(MARKET_TZ)
+    return local.weekday() < 5 and MARKET_OPEN_HOUR <= local.hour < MARKET_CLOSE_HOUR
+
+
+def _next_market_open(when: datetime) -> datetime:
+    """First market open strictly after 'when' (weekends skipped, holidays ignored)."""
+    local = when.astimezone(MARKET_TZ)
+    day = local.date()
+    if local.hour >= MARKET_OPEN_HOUR:
+        day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return MARKET_TZ.localize(datetime(day.year, day.month, day.day, MARKET_OPEN_HOUR))
+
+
+def quote_expires_at(fetched_at: datetime) -> datetime:
+    """Intraday: fetched_at + QUOTE_CACHE_TTL. Market closed: next market open."""
+    if not _market_is_open(fetched_at):
+        return _next_market_open(fetched_at)
+    try:
+        ttl = int(os.environ.get("QUOTE_CACHE_TTL", DEFAULT_QUOTE_CACHE_TTL))
+    except ValueError:
+        ttl = DEFAULT_QUOTE_CACHE_TTL
+    return fetched_at + timedelta(seconds=ttl)
+
+
+def get_cached_quote(asset, ticker, now: datetime | None = None):
+    """
+    Return (kind, data, age_seconds) for a fresh cached quote, else None.
+    kind is the result key it was stored under ('Alpaca_Price' or 'Web_Price').
+    Freshness: config.MAX_QUOTE_AGE if set (--max-quote-age), else the market-aware TTL.
+    """
+    if config.MAX_QUOTE_AGE == 0:
+        return None
+    key = _quote_key(asset, ticker)
+    entry = get_quote_cache().get(key) if key else None
+    if not entry:
+        return None
+    try:
+        fetched_at = datetime.fromisoformat(entry["fetched_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    now = now or datetime.now(pytz.utc)
+    age = (now - fetched_at).total_seconds()
+    if config.MAX_QUOTE_AGE is not None:
+        fresh = age <= config.MAX_QUOTE_AGE
+    else:
+        fresh = now < quote_expires_at(fetched_at)
+    if not fresh:
+        return None
+    return entry.get("kind"), entry.get("data") or {}, age
+
+
+def store_quote(asset, ticker, kind: str, data: dict):
+    """Remember a freshly fetched quote (price, source, timestamp)."""
+    key = _quote_key(asset, ticker)
+    if not key:
+        return
+    get_quote_cache().set(key, {
+        "kind": kind,
+        "data": data,
+        "fetched_at": datetime.now(pytz.utc).isoformat(timespec="seconds"),
+    })
+
+
+def _cache_max_failures() -> int:
+    try:
+        return max(1, int(os.environ.get("WEB_PRICE_CACHE_MAX_FAILURES", DEFAULT_WEB_PRICE_CACHE_MAX_FAILURES)))
+    except ValueError:
+        return DEFAULT_WEB_PRICE_CACHE_MAX_FAILURES
+
+
+def _record_cache_success(cache_key: str, result: dict):
+    """Store/refresh the source that delivered a price and count the hit."""
+    if not cache_key:
+        return
+    cache = get_web_price_cache()
+    entry = cache.get(cache_key) or {}
+    entry["source"] = result.get("source", "")
+    entry["url"] = result.get("url", "")
+    entry["hits"] = entry.get("hits", 0) + 1
+    entry["consecutive_failures"] = 0
+    entry["last_success"] = datetime.now().isoformat(timespec="seconds")
+    cache.set(cache_key, entry)
+
+
+def _record_cache_failure(cache_key: str):
+    """Count a miss; drop the entry after too many consecutive failures."""
+    cache = get_web_price_cache()
+    entry = cache.get(cache_key)
+    if entry is None:
+        return
+    entry["misses"] = entry.get("misses", 0) + 1
+    entry["consecutive_failures"] = entry.get("consecutive_failures", 0) + 1
+    if entry["consecutive_failures"] >= _cache_max_failures():
+        print(f"    Cached source dropped after {entry['consecutive_failures']} failures: {entry.get('url')}")
+        cache.delete(cache_key)
+    else:
+        cache.set(cache_key, entry)
+
+
+# Price search mode (env PRICE_SEARCH_MODE or --price-search=):
+#   serial = try sources one after another (default)
+#   hedged = fire all sources of a tier in parallel, keep the best by priority
+DEFAULT_PRICE_SEARCH_MODE = "serial"
+# Priority inside a tier (env PRICE_SOURCE_PRIORITY, comma-separated). Unlisted sources keep their order.
+DEFAULT_PRICE_SOURCE_PRIORITY = "Onvista,Ariva,Comdirect,Finanzen.net,BNP,Google"
+
+_SOURCE_NAMES = {
+    "onvista.de": "Onvista",
+    "ariva.de": "Ariva",
+    "comdirect.de": "Comdirect",
+    "finanzen.net": "Finanzen.net",
+    "bnpparibas.com": "BNP",
+    "google.com": "Google",
+}
+# Issuer product pages change rarely: fetched as conditional GETs through http_cache
+ISSUER_PAGE_HOSTS = ("derivate.bnpparibas.com",)
+# Streaming checks re-scan this much of the previous slice: a marker rule spans at
+# most MARKER_WINDOW characters plus the marker word and the price
+STREAM_OVERLAP = price_extractors.MARKER_WINDOW + http_client.STREAM_EDGE_GUARD
+
+
+def _price_search_mode() -> str:
+    mode = os.environ.get("PRICE_SEARCH_MODE", DEFAULT_PRICE_SEARCH_MODE).strip().lower()
+    return mode if mode in ("serial", "hedged") else DEFAULT_PRICE_SEARCH_MODE
+
+
+def _source_name(url: str) -> str:
+    """Map a URL to its source name (e.g. 'Onvista'); unknown hosts -> host without www."""
+    host = url.split("/")[2] if "://" in url else url
+    for domain, name in _SOURCE_NAMES.items():
+        if host.endswith(domain):
+            return name
+    return host.replace("www.", "")
+
+
+def _order_by_priority(attempts: list) -> list:
+    """Stable-sort (source, factory) attempts by PRICE_SOURCE_PRIORITY."""
+    raw = os.environ.get("PRICE_SOURCE_PRIORITY", DEFAULT_PRICE_SOURCE_PRIORITY)
+    priority = [p.strip().lower() for p in raw.split(",") if p.strip()]
+
+    def rank(attempt):
+        source = attempt[0].lower()
+        return priority.index(source) if source in priority else len(priority)
+
+    return sorted(attempts, key=rank)
+
+
+async def _safe_attempt(factory):
+    """Run one source attempt; any error counts as 'no price'."""
+    try:
+        return await factory()
+    except Exception:
+        return None
+
+
+async def _run_tier(attempts: list, hedged: bool):
+    """
+    Run one tier of (source, factory) attempts.
+    Serial: listed order, first result wins. Hedged: all start at once in
+    PRICE_SOURCE_PRIORITY order; a result is taken as soon as every higher-priority
+    attempt has finished without one. The rest is cancelled.
+    """
+    if not hedged:
+        for _, factory in attempts:
+            result = await _safe_attempt(factory)
+            if result:
+                return result
+        return None
+
+    attempts = _order_by_priority(attempts)
+    tasks = [asyncio.create_task(_safe_attempt(factory)) for _, factory in attempts]
+    try:
+        pending = set(tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if not task.done():
+                    break
+                if task.result():
+                    return task.result()
+        return None
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _extract_quick(html: str, source: str, url: str):
+    """Brief/Geld extraction for the quick search URLs."""
+    found = price_extractors.extract(price_extractors.QUICK_RULES, html)
+    if not found:
+        return None
+    rule, price = found
+    print(f"    {source} ({rule.source}): {price}")
+    return {"price": price, "source": f"{source} ({rule.source})", "url": url}
+
+
+def _extract_link(html: str, link: str):
+    """Site-specific extraction for Onvista, Finanzen.net and BNP product pages."""
+    found = price_extractors.extract(price_extractors.site_rules(link), html)
+    if not found:
+        return None
+    rule, price = found
+    return {"price": price, "source": rule.source, "url": link}
+
+
+def _extract_google(html: str, url: str):
+    """Price extraction from a Google search result page."""
+    found = price_extractors.extract(price_extractors.GOOGLE_RULES, html)
+    if not found:
+        return None
+    rule, price = found
+    print(f"    {rule.label or rule.source}: {price}")
+    return {"price": price, "source": rule.source, "url": url}
+
+
+def _extract_fallback(html: str, site_url: str):
+    """Generic price patterns for the fallback finance sites."""
+    found = price_extractors.extract(price_extractors.FALLBACK_RULES, html)
+    if not found:
+        return None
+    _, price = found
+    source = site_url.split("/")[2].replace("www.", "")
+    print(f"    {source}: {price}")
+    return {"price": price, "source": source, "url": site_url}
+
+
+def _extract_cached(html: str, url: str):
+    """Run the extractor matching a cached URL's site."""
+    name = _source_name(url)
+    if name == "Google":
+        return _extract_google(html, url)
+    if name in ("Onvista", "Ariva", "Comdirect"):
+        result = _extract_quick(html, name, url)
+        if result:
+            return result
+    return _extract_link(html, url) or _extract_fallback(html, url)
+
+
+async def _fetch_price(
+    source: str, url: str, extract, headers: dict, timeout: float, klass: str = "", tier: str = ""
+):
+    """
+    fetch_until with a telemetry record for the attempt. Returns (response, result).
+    With klass (instrument class), the outcome also feeds the learned source ranking
+    under the source's key in tier.
+    """
+    cache = (url.split("/")[2] if "://" in url else "") in ISSUER_PAGE_HOSTS
+    m = None
+    try:
+        with metrics.track("price", source, url) as m:
+            resp, text, result = await http_client.fetch_until(
+                url, extract, headers=headers, timeout=timeout, cache=cache, overlap=STREAM_OVERLAP
+            )
+            m["status"] = resp.status_code
+            m["bytes"] = getattr(resp, "num_bytes_downloaded", len(text))
+            m["outcome"] = "hit" if result else ("miss" if resp.status_code == 200 else "http_error")
+    finally:
+        if klass and m is not None and m["outcome"] not in ("cancelled", "skipped"):
+            source_ranking.record(
+                klass, source_ranking.stat_key(tier, source), m["outcome"] == "hit", m["duration_ms"]
+            )
+    return resp, result
+
+
+async def _try_cached_source(cache_key: str, headers: dict):
+    """Go straight to the last-known-good URL for this asset. None on miss."""
+    entry = get_web_price_cache().get(cache_key) if cache_key else None
+    url = (entry or {}).get("url", "")
+    if not url.startswith("http"):
+        return None
+    print(f"    Cached source: {entry.get('source')} ({url})")
+    result = None
+    try:
+        _, result = await _fetch_price(
+            "Cached URL", url, lambda html: _extract_cached(html, url), headers, timeout=8
+        )
+    except Exception:
+        result = None
+    if result:
+        _record_cache_success(cache_key, result)
+    else:
+        _record_cache_failure(cache_key)
+    return result
+
+
+_GOOGLE_REDIRECT_LINK = re.compile(r"/url\?q=(https://www\.(?:onvista|finanzen)\.de/[^&]+)")
+_GOOGLE_HREF_LINK = re.compile(r'href="(https://www\.(?:onvista|finanzen)\.de/[^"]+)"')
+
+
+async def _discover_links(isin: str, headers: dict) -> list:
+    """Ask Google for Onvista/Finanzen.net result pages for the ISIN."""
+    search_urls = []
+    query = f"{isin} Kurs aktuell onvista finanzen"
+    url = f"https://www.google.com/search?q={query}&num=5"
+    try:
+        with metrics.track("price", "Google (links)", url) as m:
+            resp = await http_client.get(url, headers=headers, timeout=5)
+            raw_links = _GOOGLE_REDIRECT_LINK.findall(resp.text)
+            if not raw_links:
+                raw_links = _GOOGLE_HREF_LINK.findall(resp.text)
+            m.update(status=resp.status_code, bytes=len(resp.content), outcome="hit" if raw_links else "miss")
+        for l in raw_links:
+            if "google" in l:
+                continue
+            search_urls.append(l)
+    except Exception as e:
+        print(f"      Search failed: {e}")
+    return search_urls
+
+
 async def deep_dive_price_search(asset, ticker):
     """
     Searches for asset price on financial sites.
     Uses ISIN, WKN, or ticker as search term.
+
+    The last-known-good URL from the web price cache is tried first. On a miss,
+    sources are searched in tiers (quick URLs, Google-discovered links, Google
+    search, fallback sites); the next tier only runs if the whole tier fails.
     """
     isin = asset.get("ISIN")
     wkn = asset.get("WKN")
@@ -49,147 +423,129 @@ async def deep_dive_price_search(asset, ticker):
     else:
         return {"error": "No ISIN or WKN"}
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "de,en-US;q=0.7,en;q=0.3",
-    }
+    headers = http_client.BROWSER_HEADERS
+    cache_key = ticker or search_id
+    result = await _try_cached_source(cache_key, headers)
+    if result:
+        return result
 
-    quick_urls = [
-        (f"https://www.onvista.de/suche/{search_id}", "Onvista"),
-        (f"https://www.ariva.de/{search_id}", "Ariva"),
-        (f"https://www.comdirect.de/inf/search/all.html?SEARCH_VALUE={search_id}", "Comdirect"),
-    ]
+    result = await _search_tiers(asset, search_id, headers)
+    if result:
+        _record_cache_success(cache_key, result)
+        return result
+    return {"error": "No info"}
 
-    for url, source in quick_urls:
-        try:
-            resp = await asyncio.to_thread(
-                requests.get, url, headers=headers, timeout=8, allow_redirects=True
-            )
-            if resp.status_code == 200:
-                html = resp.text
-                brief = re.search(r"Brief.*?(\d+,\d{2,4})", html, re.IGNORECASE | re.DOTALL)
-                if brief:
-                    price = float(brief.group(1).replace(",", "."))
-                    print(f"    {source} (Brief): {price}")
-                    return {"price": price, "source": f"{source} (Brief)", "url": resp.url}
-                geld = re.search(r"Geld.*?(\d+,\d{2,4})", html, re.IGNORECASE | re.DOTALL)
-                if geld:
-                    price = float(geld.group(1).replace(",", "."))
-                    print(f"    {source} (Geld): {price}")
-                    return {"price": price, "source": f"{source} (Geld)", "url": resp.url}
-        except Exception:
-            pass
 
+async def _search_tiers(asset, search_id: str, headers: dict):
+    """
+    Full tiered search. Returns price dict or None.
+    In serial mode, attempts within a tier follow the learned source ranking for the
+    asset's instrument class, and a clearly best direct source is tried first on its own.
+    """
+    hedged = _price_search_mode() == "hedged"
+    klass = source_ranking.instrument_class(asset)
     isin = search_id
-    search_urls = []
-    try:
-        query = f"{isin} Kurs aktuell onvista finanzen"
-        url = f"https://www.google.com/search?q={query}&num=5"
-        resp = await asyncio.to_thread(requests.get, url, headers=headers, timeout=5)
-        raw_links = re.findall(
-            r"/url\?q=(https://www\.(?:onvista|finanzen)\.de/[^&]+)", resp.text
-        )
-        if not raw_links:
-            raw_links = re.findall(
-                r'href="(https://www\.(?:onvista|finanzen)\.de/[^"]+)"', resp.text
+
+    def quick_attempt(url, source):
+        async def attempt():
+            resp, result = await _fetch_price(
+                source, url, lambda html: _extract_quick(html, source, url), headers,
+                timeout=8, klass=klass, tier="quick",
             )
-        for l in raw_links:
-            if "google" in l:
-                continue
-            search_urls.append(l)
-    except Exception as e:
-        print(f"      Search failed: {e}")
+            if result:
+                result["url"] = str(resp.url)
+            return result
+        return (source, attempt)
+
+    def link_attempt(link):
+        async def attempt():
+            print(f"    Inspecting: {link}")
+            _, result = await _fetch_price(
+                _source_name(link), link, lambda html: _extract_link(html, link), headers,
+                timeout=5, klass=klass, tier="link",
+            )
+            return result
+        return (_source_name(link), attempt)
+
+    def google_attempt(search_query):
+        async def attempt():
+            url = f"https://www.google.com/search?q={search_query}"
+            _, result = await _fetch_price(
+                "Google", url, lambda html: _extract_google(html, url), headers,
+                timeout=5, klass=klass, tier="google",
+            )
+            return result
+        return ("Google", attempt)
+
+    def fallback_attempt(site_url):
+        async def attempt():
+            print(f"    Fallback: {site_url.split('/')[2]}")
+            _, result = await _fetch_price(
+                _source_name(site_url), site_url, lambda html: _extract_fallback(html, site_url),
+                headers, timeout=5, klass=klass, tier="fallback",
+            )
+            return result
+        return (_source_name(site_url), attempt)
 
+    quick_urls = [
+        (f"https://www.onvista.de/suche/{search_id}", "Onvista"),
+        (f"https://www.ariva.de/{search_id}", "Ariva"),
+        (f"https://www.comdirect.de/inf/search/all.html?SEARCH_VALUE={search_id}", "Comdirect"),
+    ]
     potential_urls = [
         f"https://www.onvista.de/suche/{isin}",
         f"https://www.finanzen.net/suchergebnis?_search={isin}",
     ]
     if "DE000P" in isin or "BNP" in asset.get("Asset", ""):
-        bnp_url = f"https://derivate.bnpparibas.com/product-details/{isin}/"
-        if bnp_url not in search_urls:
-            potential_urls.append(bnp_url)
-
-    urls_to_check = search_urls + [u for u in potential_urls if u not in search_urls]
+        potential_urls.append(f"https://derivate.bnpparibas.com/product-details/{isin}/")
+    fallback_sites = [
+        f"https://www.wallstreet-online.de/suche?q={isin}",
+        f"https://www.ariva.de/quote/simple.m?secu={isin}",
+        f"https://www.boerse.de/suche/?search={isin}",
+        f"https://www.comdirect.de/inf/search/all.html?SEARCH_VALUE={isin}",
+        f"https://www.finanzen100.de/suche/?q={isin}",
+    ]
 
-    for link in urls_to_check[:5]:
-        print(f"    Inspecting: {link}")
-        try:
-            page_resp = await asyncio.to_thread(
-                requests.get, link, headers=headers, timeout=5
+    # Learned first pass: one direct source that usually hits for this instrument class.
+    # Its URL is not fetched again by a later tier (quick and fallback share some URLs).
+    tried = None
+    if not hedged:
+        direct = {
+            source_ranking.stat_key(kind, src): (kind, u, src)
+            for kind, u, src in (
+                [("quick", u, src) for u, src in quick_urls]
+                + [("link", u, _source_name(u)) for u in potential_urls]
+                + [("fallback", u, _source_name(u)) for u in fallback_sites]
             )
-            if page_resp.status_code != 200:
-                continue
-            html = page_resp.text
-
-            if "onvista.de" in link:
-                match = re.search(r"Brief.*?(\d+,\d{2})", html, re.IGNORECASE | re.DOTALL)
-                if match:
-                    return {
-                        "price": float(match.group(1).replace(",", ".")),
-                        "source": "Onvista (Brief)",
-                        "url": link,
-                    }
-                match = re.search(r"Geld.*?(\d+,\d{2})", html, re.IGNORECASE | re.DOTALL)
-                if match:
-                    return {
-                        "price": float(match.group(1).replace(",", ".")),
-                        "source": "Onvista (Geld)",
-                        "url": link,
-                    }
-                match = re.search(r'itemprop="price"[^>]*content="([\d\.]+)"', html)
-                if match:
-                    return {"price": float(match.group(1)), "source": "Onvista (Meta)", "url": link}
-                match = re.search(
-                    r'value="([\d\.]+)"[^>]*class="[^"]*price[^"]*"', html
-                )
-                if match:
-                    return {"price": float(match.group(1)), "source": "Onvista (Data)", "url": link}
-
-            elif "finanzen.net" in link:
-                match = re.search(r'itemprop="price"[^>]*content="([\d\.]+)"', html)
-                if match:
-                    return {"price": float(match.group(1)), "source": "Finanzen.net", "url": link}
-                match = re.search(r'col-price"[^>]*>([\d,]+)', html)
-                if match:
-                    return {
-                        "price": float(match.group(1).replace(",", ".")),
-                        "source": "Finanzen.net (Table)",
-                        "url": link,
-                    }
-
-            if "bnpparibas" in link:
-                match = re.search(r'itemprop="price"[^>]*content="([\d\.]+)"', html)
-                if match:
-                    return {"price": float(match.group(1)), "source": "BNP (Meta)", "url": link}
-                match = re.search(
-                    r'"(?:ask|offer|price|kaufen)"\s*[:=]\s*"?([\d\.]+)"?',
-                    html,
-                    re.IGNORECASE,
-                )
-                if match:
-                    return {"price": float(match.group(1)), "source": "BNP (JSON)", "url": link}
-                match = re.search(
-                    r"Kaufen.*?(\d+,\d{2})", html, re.DOTALL | re.IGNORECASE
-                )
-                if match:
-                    return {
-                        "price": float(match.group(1).replace(",", ".")),
-                        "source": "BNP (Text Kaufen)",
-                        "url": link,
-                    }
-                match = re.search(
-                    r"Brief.*?(\d+,\d{2})", html, re.DOTALL | re.IGNORECASE
-                )
-                if match:
-                    return {
-                        "price": float(match.group(1).replace(",", ".")),
-                        "source": "BNP (Text Brief)",
-                        "url": link,
-                    }
-        except Exception:
-            pass
+        }
+        first = source_ranking.first_choice(klass, direct)
+        if first:
+            kind, url, src = direct[first]
+            print(f"    Learned first choice for {klass}: {first}")
+            maker = {"quick": lambda: quick_attempt(url, src), "link": lambda: link_attempt(url),
+                     "fallback": lambda: fallback_attempt(url)}[kind]
+            result = await _run_tier([maker()], hedged)
+            if result:
+                return result
+            tried = url
+
+    def tier(kind, items):
+        attempts = [make for url, make in items if url != tried]
+        return source_ranking.order(klass, attempts, kind) if not hedged else attempts
+
+    # Tier 1: quick search URLs (Brief/Geld)
+    result = await _run_tier(tier("quick", [(u, quick_attempt(u, src)) for u, src in quick_urls]), hedged)
+    if result:
+        return result
+
+    # Tier 2: Google-discovered links and known product pages
+    search_urls = await _discover_links(isin, headers)
+    urls_to_check = search_urls + [u for u in potential_urls if u not in search_urls]
+    result = await _run_tier(tier("link", [(l, link_attempt(l)) for l in urls_to_check[:5]]), hedged)
+    if result:
+        return result
 
+    # Tier 3: Google search result pages
     print("    Google Search Fallback for price...")
     asset_name = asset.get("Asset", "")
     search_queries = [
@@ -197,68 +553,9 @@ async def deep_dive_price_search(asset, ticker):
         f"{isin} aktueller Preis",
         f'"{asset_name}" Kurs aktuell',
     ]
+    result = await _run_tier([google_attempt(q) for q in search_queries], hedged)
+    if result:
+        return result
 
-    for search_query in search_queries:
-        try:
-            url = f"https://www.google.com/search?q={search_query}"
-            resp = await asyncio.to_thread(requests.get, url, headers=headers, timeout=5)
-            html = resp.text
-            match = re.search(r'data-last-price="([\d\.]+)"', html)
-            if match:
-                price = float(match.group(1))
-                print(f"    Google Finance: {price}")
-                return {"price": price, "source": "Google Finance", "url": url}
-            match = re.search(r">(\d+[,\.]\d{2})\s*(?:€|EUR)<", html)
-            if match:
-                price = float(match.group(1).replace(",", "."))
-                print(f"    Google Search (EUR): {price}")
-                return {"price": price, "source": "Google Search", "url": url}
-            match = re.search(
-                r"(?:Kurs|Preis|Price|Aktuell)[:\s]+(\d+[,\.]\d{2})",
-                html,
-                re.IGNORECASE,
-            )
-            if match:
-                price = float(match.group(1).replace(",", "."))
-                print(f"    Google Search (Kurs): {price}")
-                return {"price": price, "source": "Google Search", "url": url}
-            match = re.search(r"(\d{1,4}[,\.]\d{2})\s*(?:€|EUR|Euro)", html)
-            if match:
-                price = float(match.group(1).replace(",", "."))
-                if 0.01 <= price <= 10000:
-                    print(f"    Google Search (Generic): {price}")
-                    return {"price": price, "source": "Google Search", "url": url}
-        except Exception:
-            pass
-
-    fallback_sites = [
-        f"https://www.wallstreet-online.de/suche?q={isin}",
-        f"https://www.ariva.de/quote/simple.m?secu={isin}",
-        f"https://www.boerse.de/suche/?search={isin}",
-        f"https://www.comdirect.de/inf/search/all.html?SEARCH_VALUE={isin}",
-        f"https://www.finanzen100.de/suche/?q={isin}",
-    ]
-
-    for site_url in fallback_sites:
-        try:
-            print(f"    Fallback: {site_url.split('/')[2]}")
-            resp = await asyncio.to_thread(requests.get, site_url, headers=headers, timeout=5)
-            html = resp.text
-            for pattern in [
-                r'itemprop="price"[^>]*content="([\d\.]+)"',
-                r'class="[^"]*price[^"]*"[^>]*>([\d,\.]+)',
-                r">(\d+[,\.]\d{2})\s*(?:€|EUR)<",
-                r"Kurs[:\s]+(\d+[,\.]\d{2})",
-            ]:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    price_str = match.group(1).replace(",", ".")
-                    price = float(price_str)
-                    if 0.01 <= price <= 10000:
-                        source = site_url.split("/")[2].replace("www.", "")
-                        print(f"    {source}: {price}")
-                        return {"price": price, "source": source, "url": site_url}
-        except Exception:
-            pass
-
-    return {"error": "No info"}
+    # Tier 4: other finance portals
+    return await _run_tier(tier("fallback", [(u, fallback_attempt(u)) for u in fallback_sites]), hedged)
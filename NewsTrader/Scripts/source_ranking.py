@@ -0,0 +1,123 @@
+"""Learned price source ordering per instrument class.
+
+Per instrument class (ISIN country, issuer, asset type) and price source within
+a search tier ("quick:Onvista", "link:Onvista", "fallback:Ariva", ...), the
+attempts, hits and an exponentially weighted latency are kept between runs
+(source_ranking.json next to the web price cache). Sources are ordered by
+expected hits per second: (hits + 1) / (attempts + 2) divided by latency.
+Classes with fewer than MIN_SAMPLES recorded attempts keep the default order.
+Disable with env SOURCE_RANKING=off.
+"""
+import os
+
+import config
+from cache_store import open_cache_store
+
+MIN_SAMPLES = 3
+# A source is tried alone before the tiers once its smoothed hit rate reaches this
+FIRST_PASS_MIN_HIT_RATE = 0.6
+LATENCY_ALPHA = 0.3
+DEFAULT_LATENCY_MS = 1000.0
+MIN_LATENCY_MS = 50.0
+
+# ISIN prefixes of derivative issuers (others fall back to name keywords, issuer "-")
+ISSUER_PREFIXES = {
+    "DE000P": "BNP",
+    "DE000TT": "HSBC",
+    "DE000VU": "Vontobel",
+    "DE000VM": "Vontobel",
+    "DE000VQ": "Vontobel",
+    "DE000HC": "UniCredit",
+    "DE000HV": "UniCredit",
+    "DE000SU": "SocGen",
+    "DE000SN": "SocGen",
+}
+DERIVATIVE_KEYWORDS = [
+    "call", "put", "turbo", "zertifikat", "warrant", "mini", "knock",
+    "faktor", "discount", "open end", "optionsschein",
+]
+
+_STORE = None
+
+
+def enabled() -> bool:
+    return os.environ.get("SOURCE_RANKING", "on").strip().lower() not in ("off", "0", "false", "no")
+
+
+def get_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = open_cache_store(config.SOURCE_RANKING_FILE, os.environ.get("WEB_PRICE_CACHE_BACKEND"))
+    return _STORE
+
+
+def flush() -> None:
+    if _STORE is not None:
+        _STORE.flush()
+
+
+def instrument_class(asset) -> str:
+    """Class key 'country:issuer:type', e.g. 'DE:BNP:derivative' or 'US:-:stock'."""
+    isin = str(asset.get("ISIN") or "").strip().upper()
+    country = isin[:2] if len(isin) >= 2 and isin[:2].isalpha() else "--"
+    issuer = next((name for prefix, name in ISSUER_PREFIXES.items() if isin.startswith(prefix)), "-")
+    name = str(asset.get("Asset") or "").lower()
+    is_derivative = issuer != "-" or any(kw in name for kw in DERIVATIVE_KEYWORDS)
+    return f"{country}:{issuer}:{'derivative' if is_derivative else 'stock'}"
+
+
+def stat_key(tier: str, source: str) -> str:
+    """Stats key of a source in a search tier; the tiers fetch different URLs and
+    run different extractors for the same site, so their outcomes are kept apart."""
+    return f"{tier}:{source}" if tier else source
+
+
+def record(klass: str, source: str, hit: bool, duration_ms: float) -> None:
+    """Add one attempt outcome for source in klass."""
+    if not enabled() or not klass or not source:
+        return
+    store = get_store()
+    stats = dict(store.get(klass) or {})
+    s = dict(stats.get(source) or {"attempts": 0, "hits": 0, "latency_ms": duration_ms})
+    s["attempts"] += 1
+    s["hits"] += int(bool(hit))
+    s["latency_ms"] = round((1 - LATENCY_ALPHA) * s["latency_ms"] + LATENCY_ALPHA * duration_ms, 1)
+    stats[source] = s
+    store.set(klass, stats)
+
+
+def _class_stats(klass: str) -> dict:
+    if not enabled():
+        return {}
+    stats = get_store().get(klass) or {}
+    if sum(s.get("attempts", 0) for s in stats.values()) < MIN_SAMPLES:
+        return {}
+    return stats
+
+
+def hit_rate(s: dict | None) -> float:
+    s = s or {}
+    return (s.get("hits", 0) + 1) / (s.get("attempts", 0) + 2)
+
+
+def score(s: dict | None) -> float:
+    """Expected hits per second of latency (unseen sources: 0.5 per DEFAULT_LATENCY_MS)."""
+    latency = max((s or {}).get("latency_ms", DEFAULT_LATENCY_MS), MIN_LATENCY_MS)
+    return hit_rate(s) / (latency / 1000)
+
+
+def order(klass: str, attempts: list, tier: str = "") -> list:
+    """Stable-sort (source, factory) attempts of one tier by learned score for klass."""
+    stats = _class_stats(klass)
+    if not stats:
+        return list(attempts)
+    return sorted(attempts, key=lambda a: -score(stats.get(stat_key(tier, a[0]))))
+
+
+def first_choice(klass: str, sources) -> str | None:
+    """Best of sources (stats keys) if its smoothed hit rate reaches FIRST_PASS_MIN_HIT_RATE."""
+    stats = _class_stats(klass)
+    candidates = [s for s in sources if s in stats and hit_rate(stats[s]) >= FIRST_PASS_MIN_HIT_RATE]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda s: score(stats[s]))
@@ -0,0 +1,94 @@
+"""Micro-benchmark: legacy inline price regexes vs. the price_extractors registry.
+
+Runs both over HTML pages and prints mean parse time per page and whether the
+extracted prices agree. Pages come from --fixtures (saved *.html files, e.g. from
+a browser "save page") or, by default, from synthetic portal-sized pages.
+
+Usage (from Scripts/):
+    python tests/benchmark_price_extractors.py
+    python tests/benchmark_price_extractors.py --fixtures path/to/html --repeat 20
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import price_extractors
+
+# Patterns as they were inlined in price_search before the registry (quick + onvista)
+LEGACY_QUICK = [
+    (r"Brief.*?(\d+,\d{2,4})", re.IGNORECASE | re.DOTALL),
+    (r"Geld.*?(\d+,\d{2,4})", re.IGNORECASE | re.DOTALL),
+]
+LEGACY_ONVISTA = [
+    (r"Brief.*?(\d+,\d{2})", re.IGNORECASE | re.DOTALL),
+    (r"Geld.*?(\d+,\d{2})", re.IGNORECASE | re.DOTALL),
+    (r'itemprop="price"[^>]*content="([\d\.]+)"', 0),
+    (r'value="([\d\.]+)"[^>]*class="[^"]*price[^"]*"', 0),
+]
+
+
+def _legacy(patterns, html):
+    for pattern, flags in patterns:
+        match = re.search(pattern, html, flags)
+        if match:
+            return float(match.group(1).replace(",", "."))
+    return None
+
+
+def _registry(rules, html):
+    found = price_extractors.extract(rules, html)
+    return found[1] if found else None
+
+
+def synthetic_pages() -> dict:
+    """Portal-sized pages: price near the top, price at the end, no comma price at all."""
+    row = '<div class="row"><span data-x="{i}">Briefing {i} Geldanlage Tipps</span><a href="/n/{i}">mehr</a></div>\n'
+    filler = "".join(row.format(i=i) for i in range(3000))
+    price_row = '<tr><td>Brief</td><td class="v">12,34</td></tr><tr><td>Geld</td><td>12,30</td></tr>'
+    meta = '<meta itemprop="price" content="12.34">'
+    return {
+        "price_top": f"<html><body>{price_row}{filler}</body></html>",
+        "price_bottom": f"<html><body>{filler}{price_row}</body></html>",
+        "meta_only": f"<html><head>{meta}</head><body>{filler}</body></html>",
+    }
+
+
+def _bench(fn, rules, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(rules, html)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=None, help="Folder with saved *.html pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page and extractor")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        pages = {p.name: p.read_text(encoding="utf-8", errors="replace") for p in sorted(Path(args.fixtures).glob("*.html"))}
+    else:
+        pages = synthetic_pages()
+    if not pages:
+        print("No pages found.")
+        return 1
+
+    onvista_rules = price_extractors.site_rules("https://www.onvista.de/")
+    print(f"{'page':<28} {'KB':>6} {'set':<8} {'legacy ms':>10} {'registry ms':>12}  prices")
+    for name, html in pages.items():
+        for set_name, legacy, rules in (("quick", LEGACY_QUICK, price_extractors.QUICK_RULES),
+                                        ("onvista", LEGACY_ONVISTA, onvista_rules)):
+            legacy_ms, legacy_price = _bench(_legacy, legacy, html, args.repeat)
+            registry_ms, registry_price = _bench(_registry, rules, html, args.repeat)
+            agree = "same" if legacy_price == registry_price else f"{legacy_price} vs {registry_price}"
+            print(f"{name[:28]:<28} {len(html) // 1024:>6} {set_name:<8} {legacy_ms:>10.2f} {registry_ms:>12.2f}  {agree}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
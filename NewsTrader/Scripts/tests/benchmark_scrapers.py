@@ -0,0 +1,139 @@
+"""Offline scraper benchmark over a recorded fixture folder (see http_fixtures.py).
+
+1. Parse: runs the matching parser on every fixture body (price pages, Google
+   News RSS, Boersen-Zeitung) and reports success rate and parse time per source.
+2. Replay: starts the local stand-in server with the given latency and runs
+   deep_dive_price_search, get_google_news and the Boersen-Zeitung lookup for
+   every asset in assets.json; reports latency and status per host.
+
+Record fixtures with a normal run:  HTTP_RECORD_DIR=<folder> python AnalyzePortfolio_Pipeline.py
+Usage (from Scripts/):
+    python tests/benchmark_scrapers.py
+    python tests/benchmark_scrapers.py --fixtures <folder> --latency 0.2 --host-latency google.com=1
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+import http_cache
+import http_client
+import http_fixtures
+import news
+import price_search
+import source_ranking
+
+from tests.fixture_server import FixtureServer, parse_host_latency
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "http")
+
+
+def _parser_for(url: str):
+    """(source name, parse function body -> bool) for a fixture URL."""
+    if "news.google.com" in url:
+        return "Google News", lambda body: bool(news._parse_google_news(body, "DE", datetime.now().date()))
+    if "boersen-zeitung.de" in url:
+        return "Boersen-Zeitung", lambda body: bool(news._parse_boersen_zeitung(body.decode("utf-8", "replace")))
+    return price_search._source_name(url), lambda body: bool(
+        price_search._extract_cached(body.decode("utf-8", "replace"), url)
+    )
+
+
+def bench_parse(folder: str, server: FixtureServer):
+    stats = defaultdict(lambda: {"pages": 0, "ok": 0, "ms": 0.0})
+    for url, entry in http_fixtures.load_index(folder).items():
+        if entry.get("status") != 200:
+            continue
+        body = server._body(entry["file"])
+        source, parse = _parser_for(url)
+        start = time.perf_counter()
+        try:
+            ok = parse(body)
+        except Exception:
+            ok = False
+        stats[source]["ms"] += (time.perf_counter() - start) * 1000
+        stats[source]["pages"] += 1
+        stats[source]["ok"] += int(ok)
+    print(f"\nParse ({folder})")
+    print(f"{'source':<20} {'pages':>6} {'success':>8} {'ms/page':>9}")
+    for source, s in sorted(stats.items()):
+        print(f"{source:<20} {s['pages']:>6} {s['ok'] / s['pages']:>8.0%} {s['ms'] / s['pages']:>9.2f}")
+
+
+async def _replay_assets(assets):
+    found = 0
+    for asset in assets:
+        start = time.perf_counter()
+        result = await price_search.deep_dive_price_search(asset, asset.get("Ticker", ""))
+        price_s = time.perf_counter() - start
+        name = asset.get("Asset", "")
+        query = f'"{name}"+Aktie' if len(name.split()) > 1 else f"{name}+Aktie"
+        items = await news.get_google_news(query, "DE")
+        resp = await http_client.get(f"https://www.boersen-zeitung.de/suche?q={name.replace(' ', '+')}")
+        bz_items = news._parse_boersen_zeitung(resp.text) if resp.status_code == 200 else []
+        found += int("price" in result)
+        print(f"  {name:<24} price={result.get('price')} ({price_s:.2f}s) news={len(items)} bz={len(bz_items)}")
+    await http_client.aclose()
+    return found
+
+
+def bench_replay(folder: str, server: FixtureServer):
+    assets_file = os.path.join(folder, "assets.json")
+    if not os.path.exists(assets_file):
+        print(f"\nReplay skipped: no {assets_file}")
+        return
+    assets = json.loads(Path(assets_file).read_text(encoding="utf-8"))
+    tmp_dir = tempfile.mkdtemp(prefix="newstrader_bench_")
+    config.WEB_PRICE_CACHE_FILE = os.path.join(tmp_dir, "web_price_cache.json")
+    price_search._WEB_PRICE_CACHE = None
+    config.SOURCE_RANKING_FILE = os.path.join(tmp_dir, "source_ranking.json")
+    source_ranking._STORE = None
+    config.HTTP_CACHE_DIR = os.path.join(tmp_dir, "http_cache")
+    http_cache._INDEX = None
+    os.environ["HTTP_REPLAY_URL"] = server.url
+    print(f"\nReplay via {server.url} (latency {server.latency}s, per host {server.host_latency or '-'})")
+    start = time.perf_counter()
+    found = asyncio.run(_replay_assets(assets))
+    total = time.perf_counter() - start
+    os.environ.pop("HTTP_REPLAY_URL", None)
+
+    per_host = defaultdict(list)
+    for host, status, seconds in server.requests:
+        per_host[host].append((status, seconds))
+    print(f"\n{'host':<26} {'requests':>8} {'200':>6} {'avg ms':>8} {'max ms':>8}")
+    for host, rows in sorted(per_host.items()):
+        ok = sum(1 for status, _ in rows if status == 200)
+        times = [s * 1000 for _, s in rows]
+        print(f"{host:<26} {len(rows):>8} {ok / len(rows):>6.0%} {sum(times) / len(times):>8.1f} {max(times):>8.1f}")
+    print(f"\nPrices found: {found}/{len(assets)}  total {total:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Recorded fixture folder")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stand-in latency per request (s)")
+    parser.add_argument("--host-latency", default=None, help="Per host, e.g. onvista.de=0.5,google.com=1")
+    parser.add_argument("--parse-only", action="store_true", help="Skip the replay part")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.fixtures, 0, args.latency, parse_host_latency(args.host_latency)).start()
+    try:
+        bench_parse(args.fixtures, server)
+        if not args.parse_only:
+            bench_replay(args.fixtures, server)
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Local stand-in for the provider batch APIs (Anthropic Message Batches, OpenAI Batch).
+
+Anthropic: POST /v1/messages/batches, GET /v1/messages/batches/<id>, GET /results/<id>
+OpenAI:    POST /v1/files, POST /v1/batches, GET /v1/batches/<id>, GET /v1/files/<id>/content
+
+Each prompt is answered by answer(prompt) -> text (None = request errored); a
+prompt sent as content blocks is kept as sent and answered by its joined text. A
+batch is reported as in progress for polls_until_done status requests. Point
+ANTHROPIC_BASE_URL=<url> or OPENAI_BASE_URL=<url>/v1 at it.
+"""
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(block["text"] for block in content)
+    return content
+
+
+class FakeBatchServer:
+    def __init__(self, answer, polls_until_done: int = 1):
+        self.answer = answer
+        self.polls_until_done = polls_until_done
+        self.batches = {}   # id -> {"requests": [(custom_id, prompt, max_tokens)], "polls": n}
+        self.files = {}     # id -> bytes
+        self._ids = itertools.count(1)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def _status(self, batch_id: str) -> bool:
+        """Count a poll; True once the batch has ended."""
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        return batch["polls"] > self.polls_until_done
+
+    def _anthropic_results(self, batch_id: str) -> bytes:
+        lines = []
+        for cid, prompt, _ in self.batches[batch_id]["requests"]:
+            text = self.answer(_text(prompt))
+            if text is None:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "invalid_request_error", "message": "prompt rejected"}}}
+            else:
+                result = {"type": "succeeded", "message": {"content": [{"type": "text", "text": text}]}}
+            lines.append(json.dumps({"custom_id": cid, "result": result}))
+        return "\n".join(lines).encode()
+
+    def _openai_output(self, batch_id: str) -> tuple[str, str]:
+        output, errors = [], []
+        for cid, prompt, _ in self.batches[batch_id]["requests"]:
+            text = self.answer(_text(prompt))
+            if text is None:
+                errors.append(json.dumps({"custom_id": cid, "response": {"status_code": 400, "body": {
+                    "error": {"message": "prompt rejected"}}}, "error": None}))
+            else:
+                output.append(json.dumps({"custom_id": cid, "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": text}}]}}, "error": None}))
+        output_id, error_id = self._new_id("file"), self._new_id("file")
+        self.files[output_id] = "\n".join(output).encode()
+        self.files[error_id] = "\n".join(errors).encode()
+        return output_id, error_id
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body, content_type: str = "application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == "/v1/messages/batches":
+                    batch_id = server._new_id("msgbatch")
+                    requests = [(r["custom_id"], r["params"]["messages"][0]["content"], r["params"]["max_tokens"])
+                                for r in json.loads(body)["requests"]]
+                    server.batches[batch_id] = {"requests": requests, "polls": 0}
+                    self._send(200, {"id": batch_id, "processing_status": "in_progress"})
+                elif self.path == "/v1/files":
+                    # multipart/form-data: the file part is the JSONL between its headers and the boundary
+                    boundary = self.headers["Content-Type"].split("boundary=", 1)[1].encode()
+                    part = next(p for p in body.split(b"--" + boundary) if b'name="file"' in p)
+                    file_id = server._new_id("file")
+                    server.files[file_id] = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+                    self._send(200, {"id": file_id, "purpose": "batch"})
+                elif self.path == "/v1/batches":
+                    lines = server.files[json.loads(body)["input_file_id"]].decode().splitlines()
+                    requests = [(r["custom_id"], r["body"]["messages"][0]["content"], r["body"]["max_tokens"])
+                                for r in map(json.loads, lines)]
+                    batch_id = server._new_id("batch")
+                    server.batches[batch_id] = {"requests": requests, "polls": 0}
+                    self._send(200, {"id": batch_id, "status": "validating"})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:3] == ["v1", "messages", "batches"]:
+                    batch_id = parts[3]
+                    ended = server._status(batch_id)
+                    self._send(200, {"id": batch_id, "processing_status": "ended" if ended else "in_progress",
+                                     "results_url": f"{server.url}/results/{batch_id}"})
+                elif parts[0] == "results":
+                    self._send(200, server._anthropic_results(parts[1]), "application/x-jsonl")
+                elif parts[:2] == ["v1", "batches"]:
+                    batch_id = parts[2]
+                    if server._status(batch_id):
+                        output_id, error_id = server._openai_output(batch_id)
+                        self._send(200, {"id": batch_id, "status": "completed",
+                                         "output_file_id": output_id, "error_file_id": error_id})
+                    else:
+                        self._send(200, {"id": batch_id, "status": "in_progress"})
+                elif parts[:2] == ["v1", "files"] and parts[-1] == "content":
+                    self._send(200, server.files[parts[2]], "application/jsonl")
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
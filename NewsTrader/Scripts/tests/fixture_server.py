@@ -0,0 +1,116 @@
+"""Local HTTP stand-in serving recorded responses (see http_fixtures.py).
+
+GET /fetch?url=<original url> answers with the recorded status, content type and
+body, after the configured latency. Unknown URLs get 404. Body placeholders
+__TODAY_RFC2822__ and __TODAY_ISO__ are replaced by the current date, so
+hand-written fixtures pass the "published today" filters.
+
+Usage (from Scripts/):
+    python tests/fixture_server.py --dir tests/fixtures/http --port 8765 --latency 0.2
+    set HTTP_REPLAY_URL=http://127.0.0.1:8765 before starting the pipeline
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import http_fixtures
+
+
+class FixtureServer:
+    """Threaded stand-in server. latency: seconds per request; host_latency: per-host overrides."""
+
+    def __init__(self, folder: str, port: int = 0, latency: float = 0.0, host_latency: dict | None = None):
+        self.folder = folder
+        self.latency = latency
+        self.host_latency = host_latency or {}
+        self.requests = []  # (host, status, seconds) per served request
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                start = time.perf_counter()
+                url = parse_qs(urlsplit(self.path).query).get("url", [""])[0]
+                host = (urlsplit(url).hostname or "").replace("www.", "")
+                delay = next((v for k, v in server.host_latency.items() if k in host), server.latency)
+                if delay:
+                    time.sleep(delay)
+                entry = http_fixtures.load_index(server.folder).get(url)
+                status, content_type, body = 404, "text/plain", b"no fixture"
+                if entry:
+                    status = entry.get("status", 200)
+                    content_type = entry.get("content_type") or "text/html; charset=utf-8"
+                    body = server._body(entry["file"])
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.requests.append((host, status, time.perf_counter() - start))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _body(self, name: str) -> bytes:
+        body = Path(self.folder, name).read_bytes()
+        now = datetime.now().astimezone()
+        return (body.replace(b"__TODAY_RFC2822__", format_datetime(now).encode())
+                    .replace(b"__TODAY_ISO__", now.strftime("%Y-%m-%d").encode()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def parse_host_latency(spec: str | None) -> dict:
+    """'onvista.de=0.5,google.com=1' -> {'onvista.de': 0.5, 'google.com': 1.0}"""
+    result = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            host, value = part.split("=", 1)
+            result[host.strip()] = float(value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "fixtures", "http"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--host-latency", default=None, help="Per host, e.g. onvista.de=0.5,google.com=1")
+    args = parser.parse_args()
+    server = FixtureServer(args.dir, args.port, args.latency, parse_host_latency(args.host_latency))
+    print(f"Serving {args.dir} at {server.url} (set HTTP_REPLAY_URL={server.url})")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
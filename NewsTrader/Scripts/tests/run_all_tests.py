@@ -47,6 +47,12 @@ TEST_CATALOG: list[tuple[int, str, str]] = [
     (22, "pipeline/openai/gpt-4o-mini/off", "Pipeline: openai/gpt-4o-mini multistep=off"),
     (23, "pipeline/openai/gpt-4o-mini/on/4096", "Pipeline: openai/gpt-4o-mini multistep=on/4096"),
     (24, "pipeline/openai/gpt-4o-mini/on/8192", "Pipeline: openai/gpt-4o-mini multistep=on/8192"),
+    (25, "unit_price_search", "Unit tests for price_search.py and cache_store.py"),
+    (26, "unit_news", "Unit tests for news.py"),
+    (27, "unit_data_providers", "Unit tests for data_providers.py"),
+    (28, "unit_scrapers", "Offline scraper tests (fixture server)"),
+    (29, "unit_llm_provider", "Unit tests for llm_provider.py (fake chat model)"),
+    (30, "unit_orchestrator", "Unit tests for orchestrator.py (stubbed stages)"),
 ]
 
 NUM_TO_SPEC = {num: spec for num, spec, _ in TEST_CATALOG}
@@ -92,7 +98,7 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
-  python run_all_tests.py                    Run all 24 tests
+  python run_all_tests.py                    Run all numbered tests
   python run_all_tests.py --test=1,4,12      Run tests 1, 4, 12
   python run_all_tests.py --list             List all tests
   python run_all_tests.py --test=1,2 --dry-run   Preview (no execution)
@@ -26,6 +26,12 @@ SCRIPT_DIR = TESTS_DIR.parent
 # Module name -> script filename
 MODULE_TO_SCRIPT = {
     "unit_ai_analysis": "test_unit_ai_analysis.py",
+    "unit_price_search": "test_unit_price_search.py",
+    "unit_news": "test_unit_news.py",
+    "unit_data_providers": "test_unit_data_providers.py",
+    "unit_scrapers": "test_unit_scrapers.py",
+    "unit_llm_provider": "test_unit_llm_provider.py",
+    "unit_orchestrator": "test_unit_orchestrator.py",
     "dummy_pipeline": "test_dummy_pipeline.py",
     "model_check": "test_model_check.py",
     "pipeline": "test_pipeline.py",
@@ -77,7 +83,7 @@ def load_config(free_models: bool = False) -> configparser.ConfigParser:
     # Defaults
     cp.set("general", "stop_on_failure", cp.get("general", "stop_on_failure", fallback="false"))
     cp.set("general", "timeout", cp.get("general", "timeout", fallback="300"))
-    for key in ("unit_ai_analysis", "dummy_pipeline", "model_check", "pipeline", "error_handling", "data_providers"):
+    for key in MODULE_TO_SCRIPT:
         cp.set("tests", key, cp.get("tests", key, fallback="true"))
     for p in ("ollama", "anthropic", "openai"):
         if free_models:
@@ -96,7 +102,7 @@ def parse_run_spec(spec: str) -> list[tuple[str, str | None]]:
         module = parts[0].strip().lower()
         if module not in MODULE_TO_SCRIPT:
             raise SystemExit(f"Unknown module in --run: {module}. Valid: {list(MODULE_TO_SCRIPT)}")
-        if module in ("unit_ai_analysis", "dummy_pipeline", "error_handling", "data_providers"):
+        if module not in ("model_check", "pipeline"):
             if len(parts) > 1:
                 raise SystemExit(f"Module {module} has no parameters. Use --run={module}")
             result.append((module, None))
@@ -0,0 +1,136 @@
+"""Unit tests for data_providers.py. No network needed (stub worker, fake Alpaca client)."""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+import data_providers
+from data_providers import TiingoWorker, TiingoWorkerError
+
+from tests.test_helpers import report, skip
+
+STUB_WORKER = str(Path(__file__).resolve().parent / "tiingo_worker_stub.py")
+
+
+class _FakeQuote:
+    def __init__(self, bid, ask):
+        self.bid_price = bid
+        self.ask_price = ask
+
+
+class _FakeAlpacaClient:
+    """Answers every symbol except 'BAD'; a chunk containing 'BAD' is rejected."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_stock_latest_quote(self, req):
+        symbols = req.symbol_or_symbols
+        self.requests.append(symbols)
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        if "BAD" in symbols:
+            raise ValueError("invalid symbol")
+        return {s: _FakeQuote(1.0, 3.0) for s in symbols}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: unit tests for data_providers (Tiingo worker client and fallback, Alpaca quote batching)")
+        return 0
+
+    failed = 0
+
+    # Tiingo worker: concurrent calls multiplexed over one process
+    worker = TiingoWorker([sys.executable, STUB_WORKER])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda i: worker.call("sleep", seconds=0.3, i=i), range(4)))
+    elapsed = time.perf_counter() - start
+    if [r["i"] for r in results] == [0, 1, 2, 3] and elapsed < 1.0:
+        report("tiingo_worker_multiplexed", True, f"4 calls in {elapsed:.2f}s")
+    else:
+        report("tiingo_worker_multiplexed", False, f"results={results} elapsed={elapsed:.2f}s")
+        failed += 1
+
+    # Tiingo worker: error responses raise, a crashed worker is restarted
+    errors = []
+    for cmd in ("fail", "crash"):
+        try:
+            worker.call(cmd)
+        except TiingoWorkerError:
+            errors.append("died")
+        except RuntimeError:
+            errors.append("error")
+    after_crash = worker.call("echo", n=1)
+    if errors == ["error", "died"] and after_crash == {"n": 1} and worker.restarts >= 1:
+        report("tiingo_worker_restart", True, f"restarts={worker.restarts}")
+    else:
+        report("tiingo_worker_restart", False, f"errors={errors} after_crash={after_crash} restarts={worker.restarts}")
+        failed += 1
+    worker.close()
+
+    # Tiingo calls: a timed-out worker is restarted on the next call (that call uses the
+    # runner); only TIINGO_WORKER_MAX_FAILURES failures in a row leave the runner for good
+    if hasattr(data_providers, "_call_tiingo"):
+        saved = (data_providers.TIINGO_PYTHON, data_providers._run_tiingo, data_providers._TIINGO_WORKER,
+                 data_providers._TIINGO_WORKER_FAILURES)
+        runner = []
+        data_providers.TIINGO_PYTHON = sys.executable
+        data_providers._run_tiingo = lambda argv: runner.append(argv[0]) or ["runner"]
+        worker = TiingoWorker([sys.executable, STUB_WORKER], call_timeout=0.2)
+        data_providers._TIINGO_WORKER = worker
+        data_providers._TIINGO_WORKER_FAILURES = 0
+        try:
+            answers = [data_providers._call_tiingo("sleep", ["slow"], seconds=2)]
+            answers.append(data_providers._call_tiingo("echo", ["echo"], n=1))
+            for _ in range(data_providers.TIINGO_WORKER_MAX_FAILURES):
+                answers.append(data_providers._call_tiingo("sleep", ["slow"], seconds=2))
+            answers.append(data_providers._call_tiingo("echo", ["echo"], n=2))
+        finally:
+            worker.close()
+            (data_providers.TIINGO_PYTHON, data_providers._run_tiingo, data_providers._TIINGO_WORKER,
+             data_providers._TIINGO_WORKER_FAILURES) = saved
+        if answers == [["runner"], {"n": 1}, ["runner"], ["runner"], ["runner"], ["runner"]] \
+                and runner == ["slow", "slow", "slow", "slow", "echo"] and worker.restarts >= 2:
+            report("tiingo_worker_fallback", True, f"restarts={worker.restarts}")
+        else:
+            report("tiingo_worker_fallback", False, f"answers={answers} runner={runner} restarts={worker.restarts}")
+            failed += 1
+    else:
+        skip("tiingo_worker_fallback", "Tiingo runs in-process on this platform")
+
+    # Alpaca: chunked batch requests, ISINs skipped, rejected chunk retried per symbol
+    if data_providers.ALPACA_AVAILABLE:
+        saved = (config.ALPACA_KEY, data_providers._ALPACA_CLIENT, data_providers.ALPACA_QUOTE_BATCH_SIZE)
+        fake = _FakeAlpacaClient()
+        config.ALPACA_KEY = "test"
+        data_providers._ALPACA_CLIENT = fake
+        data_providers.ALPACA_QUOTE_BATCH_SIZE = 2
+        quotes = data_providers.get_alpaca_latest_quotes(["AAPL", "MSFT", "DE0007164600", "BAD", "NVDA", "AAPL"])
+        config.ALPACA_KEY, data_providers._ALPACA_CLIENT, data_providers.ALPACA_QUOTE_BATCH_SIZE = saved
+        expected_requests = [["AAPL", "MSFT"], ["BAD", "NVDA"], "BAD", "NVDA"]
+        if sorted(quotes) == ["AAPL", "MSFT", "NVDA"] and quotes["AAPL"]["mid_price"] == 2.0 \
+                and fake.requests == expected_requests:
+            report("alpaca_batched_quotes", True, "OK")
+        else:
+            report("alpaca_batched_quotes", False, f"quotes={quotes} requests={fake.requests}")
+            failed += 1
+    else:
+        skip("alpaca_batched_quotes", "alpaca-py not installed")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""Unit tests for llm_provider.py, llm_cache.py, llm_scheduler.py and llm_batch.py.
+No LLM needed (fake chat model, local fake batch server)."""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+import ai_analysis
+import config
+import llm_batch
+import llm_cache
+import llm_provider
+import llm_scheduler
+
+from tests.fake_batch_server import FakeBatchServer
+from tests.test_helpers import report
+
+
+class _Signal(BaseModel):
+    signal: str
+
+
+class _CountingChatModel(BaseChatModel):
+    """
+    Answers 'answer <n>'; records the bind kwargs and messages of every call.
+    Usage metadata of every (unstructured) answer reports 1200 input tokens, 1000
+    of them read from the cache, to check that the usage data is summed up.
+    """
+
+    calls: list = []
+    messages: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(kwargs)
+        self.messages.append(list(messages))
+        usage = {"input_tokens": 1200, "output_tokens": 10, "total_tokens": 1210,
+                 "input_token_details": {"cache_read": 1000, "cache_creation": 0}}
+        message = AIMessage(content=f"answer {len(self.calls)}", usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @property
+    def _llm_type(self) -> str:
+        return "counting"
+
+    def with_structured_output(self, schema, **kwargs):
+        def run(messages, **bind_kwargs):
+            self.calls.append({"structured": schema.__name__, **bind_kwargs})
+            self.messages.append(list(messages))
+            return schema(signal="BUY") if schema is _Signal else None
+        return RunnableLambda(run)
+
+
+class _RateLimited(Exception):
+    """Looks like an SDK status error: status_code plus response headers."""
+
+    def __init__(self, retry_after: str):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+
+def _batch_answer(prompt: str) -> str | None:
+    """Fake batch model: SAP gets a full analysis, BASF one without Confidence, REJECT an error."""
+    if "REJECT" in prompt:
+        return None
+    answer = {"Recommendation": "Buy", "recommended_quantity": 5, "Reasoning": "News: ...",
+              "quantity_reasoning": "5 shares to reach 5%", "Confidence": "High"}
+    if "BASF" in prompt:
+        del answer["Confidence"]
+    return "Analysis:\n" + json.dumps(answer)
+
+
+async def _run_batch(batch, calls) -> tuple[list, int]:
+    """Members join, wait for their answers, and the batch is closed like the orchestrator does."""
+    for _ in calls:
+        batch.join()
+
+    async def member(call):
+        try:
+            return await call()
+        except llm_batch.BatchError as e:
+            return f"error: {e}"
+        finally:
+            batch.leave()
+
+    tasks = [asyncio.create_task(member(call)) for call in calls]
+    await asyncio.sleep(0.05)
+    held_until_close = len(batch._pending)
+    batch.close()
+    return await asyncio.gather(*tasks), held_until_close
+
+
+def _use_fake_llm() -> _CountingChatModel:
+    llm = _CountingChatModel()
+    llm_provider._LLM = llm
+    llm_provider._PROVIDER = "anthropic"
+    llm_provider._MODEL = "fake-model"
+    return llm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: unit tests for llm_provider (response cache modes, TTL, LRU eviction, runnable registry, request scheduler, batch mode, prompt prefix caching)")
+        return 0
+
+    failed = 0
+    tmp_dir = tempfile.mkdtemp(prefix="newstrader_test_")
+    config.LLM_CACHE_FILE = os.path.join(tmp_dir, "llm_cache.json")
+    llm_cache._STORE = None
+
+    # Response cache: readwrite answers repeats from disk; other kwargs/schema are other keys
+    llm = _use_fake_llm()
+    os.environ["LLM_CACHE"] = "readwrite"
+    first = asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+    again = asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+    other_limit = asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=200))
+    structured = asyncio.run(llm_provider.ainvoke_structured("Analyze SAP", _Signal, max_tokens=100))
+    structured_again = asyncio.run(llm_provider.ainvoke_structured("Analyze SAP", _Signal, max_tokens=100))
+    llm_cache.flush()
+    model_calls = len(llm.calls)
+
+    # A new process (fresh store) in read mode: served from the file, nothing new stored
+    llm_cache._STORE = None
+    os.environ["LLM_CACHE"] = "read"
+    from_file = asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+    asyncio.run(llm_provider.ainvoke("Analyze BASF", max_tokens=100))
+    read_only_miss = asyncio.run(llm_provider.ainvoke("Analyze BASF", max_tokens=100))
+    if (first == again == from_file == "answer 1" and other_limit == "answer 2"
+            and structured == structured_again == {"signal": "BUY"} and model_calls == 3
+            and read_only_miss == "answer 5" and len(llm.calls) == 5):
+        report("llm_cache_modes", True, "OK")
+    else:
+        report("llm_cache_modes", False, f"first={first} again={again} other={other_limit} "
+                                         f"from_file={from_file} structured={structured} calls={llm.calls}")
+        failed += 1
+
+    # TTL: expired entries are asked again (read mode leaves them in the store);
+    # LRU: flush drops the least recently used
+    os.environ["LLM_CACHE_TTL"] = "0"
+    time.sleep(0.01)
+    keys_before = sorted(llm_cache.get_store().keys())
+    asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+    kept_in_read = sorted(llm_cache.get_store().keys())
+    os.environ["LLM_CACHE"] = "readwrite"
+    expired = asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+    os.environ.pop("LLM_CACHE_TTL", None)
+    store = llm_cache.get_store()
+    for key in store.keys():
+        store.delete(key)
+    for i, key in enumerate(["old", "mid", "new"]):
+        store.set(key, {"value": "x" * 100, "created": time.time(), "last_used": i, "size": 100})
+    os.environ["LLM_CACHE_MAX_BYTES"] = "250"
+    llm_cache.flush()
+    os.environ.pop("LLM_CACHE_MAX_BYTES", None)
+    kept = sorted(llm_cache.get_store().keys())
+    if (expired == "answer 7" and llm_cache.STATS["expired"] >= 2 and kept == ["mid", "new"]
+            and keys_before and kept_in_read == keys_before):
+        report("llm_cache_ttl_lru", True, "OK")
+    else:
+        report("llm_cache_ttl_lru", False, f"expired={expired} stats={llm_cache.STATS} kept={kept} "
+                                           f"kept_in_read={kept_in_read}")
+        failed += 1
+    os.environ.pop("LLM_CACHE", None)
+
+    # Runnable registry: each (schema, max_tokens, temperature) is bound once; init_llm clears it
+    llm = _use_fake_llm()
+    for _ in range(3):
+        asyncio.run(llm_provider.ainvoke("Analyze SAP", max_tokens=100))
+        asyncio.run(llm_provider.ainvoke_structured("Analyze SAP", _Signal, max_tokens=100))
+    asyncio.run(llm_provider.ainvoke_retry("Analyze SAP"))
+    variants = sorted((s.__name__ if s else "", t, temp) for s, t, temp in llm_provider._RUNNABLES)
+    reused = llm_provider._runnable(100) is llm_provider._runnable(100)
+    os.environ.update({"AI_PROVIDER": "openai", "OPENAI_API_KEY": "sk-test"})
+    llm_provider.init_llm()
+    cleared = not llm_provider._RUNNABLES
+    if variants == [("", 100, None), ("", 400, 0.3), ("_Signal", 100, None)] and reused and cleared \
+            and len(llm.calls) == 7:
+        report("llm_runnable_registry", True, "OK")
+    else:
+        report("llm_runnable_registry", False, f"variants={variants} reused={reused} cleared={cleared}")
+        failed += 1
+    llm_provider._LLM = None
+
+    # Scheduler: one slot; queued calls run portfolio before watchlist, then in arrival order
+    async def _priority_run():
+        os.environ["LLM_MAX_IN_FLIGHT"] = "1"
+        scheduler = llm_scheduler.Scheduler("ollama")
+        os.environ.pop("LLM_MAX_IN_FLIGHT", None)
+        order, running, peak = [], [0], [0]
+
+        async def job(name, priority):
+            llm_scheduler.set_priority(priority)
+
+            async def call():
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.02)
+                order.append(name)
+                running[0] -= 1
+                return name
+            return await scheduler.run(call, 10)
+
+        first = asyncio.create_task(job("first", llm_scheduler.PRIORITY_WATCHLIST))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(job(name, prio)) for name, prio in (
+            ("watch1", llm_scheduler.PRIORITY_WATCHLIST), ("port1", llm_scheduler.PRIORITY_PORTFOLIO),
+            ("watch2", llm_scheduler.PRIORITY_WATCHLIST), ("port2", llm_scheduler.PRIORITY_PORTFOLIO))]
+        await asyncio.gather(first, *rest)
+        return order, peak[0], scheduler.in_flight
+
+    order, peak, in_flight = asyncio.run(_priority_run())
+    bucket = llm_scheduler._Bucket(60)
+    burst_wait, next_wait = bucket.reserve(60), bucket.reserve(1)
+    if order == ["first", "port1", "port2", "watch1", "watch2"] and peak == 1 and in_flight == 0 \
+            and burst_wait == 0 and 0.9 < next_wait <= 1.0:
+        report("llm_scheduler_priority_limits", True, "OK")
+    else:
+        report("llm_scheduler_priority_limits", False, f"order={order} peak={peak} in_flight={in_flight} "
+                                                       f"waits={burst_wait},{next_wait}")
+        failed += 1
+
+    # 429: Retry-After pauses the whole provider, then the call is retried
+    async def _backoff_run():
+        scheduler = llm_scheduler.Scheduler("anthropic")
+        attempts = []
+
+        async def limited():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise _RateLimited("0.3")
+            return "ok"
+
+        async def other():
+            await asyncio.sleep(0.05)
+            return await scheduler.run(lambda: asyncio.sleep(0, time.monotonic()), 10)
+
+        start = time.monotonic()
+        result, other_at = await asyncio.gather(scheduler.run(limited, 10), other())
+        return result, attempts[1] - start, other_at - start
+
+    llm_scheduler.STATS.update(rate_limited=0, retries=0)
+    result, retried_after, other_after = asyncio.run(_backoff_run())
+    if result == "ok" and retried_after >= 0.29 and other_after >= 0.29 \
+            and llm_scheduler.STATS["rate_limited"] == 1 and llm_scheduler.STATS["retries"] == 1:
+        report("llm_scheduler_backoff", True, "OK")
+    else:
+        report("llm_scheduler_backoff", False, f"result={result} retried_after={retried_after:.2f} "
+                                               f"other_after={other_after:.2f} stats={llm_scheduler.STATS}")
+        failed += 1
+
+    # --llm-batch: one batch per run through the fake provider servers, parsed by analyze_data
+    server = FakeBatchServer(_batch_answer, polls_until_done=2).start()
+    os.environ.update({"ANTHROPIC_BASE_URL": server.url, "OPENAI_BASE_URL": f"{server.url}/v1",
+                       "LLM_BATCH_POLL": "0.05", "ANTHROPIC_API_KEY": "test", "OPENAI_API_KEY": "test"})
+    llm = _use_fake_llm()
+    batch = llm_provider.start_batch()
+    assets = [{"Asset": name, "Ticker": name, "Invest": 1000} for name in ("SAP", "BASF", "REJECT")]
+    # prefix marked for caching whatever its length, to see the blocks go through the batch
+    os.environ["LLM_PROMPT_CACHE_MIN_TOKENS"] = "1"
+    analyses, held = asyncio.run(_run_batch(batch, [
+        lambda a=a: ai_analysis.analyze_data(a, {"News": []}, assets) for a in assets
+    ]))
+    os.environ.pop("LLM_PROMPT_CACHE_MIN_TOKENS", None)
+    anthropic_requests = [len(b["requests"]) for b in server.batches.values()]
+    anthropic_prompts = [p for b in server.batches.values() for _, p, _ in b["requests"]]
+    sap, basf, rejected = analyses
+    llm_provider._PROVIDER, llm_provider._MODEL = "openai", "gpt-test"
+    batch = llm_provider.start_batch()
+    texts, held_openai = asyncio.run(_run_batch(batch, [
+        lambda: llm_provider.ainvoke_batch("Analyze SAP", 200, prefix="RULES\n\n"),
+        lambda: llm_provider.ainvoke_batch("Analyze REJECT", 200, prefix="RULES\n\n"),
+    ]))
+    llm_provider.end_batch()
+    server.stop()
+    openai_requests = [len(b["requests"]) for b in server.batches.values()][len(anthropic_requests):]
+    openai_prompts = [p for b in list(server.batches.values())[len(anthropic_requests):] for _, p, _ in b["requests"]]
+    # Anthropic: one user message with the shared prefix as a marked block; OpenAI: prefix + prompt as one text
+    prompts_ok = (len(anthropic_prompts) == 3 and len({p[0]["text"] for p in anthropic_prompts}) == 1
+                  and all(p[0].get("cache_control") == {"type": "ephemeral"} for p in anthropic_prompts)
+                  and openai_prompts == ["RULES\n\nAnalyze SAP", "RULES\n\nAnalyze REJECT"])
+    if (held == 3 and held_openai == 2 and anthropic_requests == [3] and openai_requests == [2] and not llm.calls
+            and prompts_ok
+            and sap.get("Recommendation") == "Buy" and sap.get("Confidence") == "High"
+            and basf.get("_missing_fields") == ["Confidence"] and rejected.get("_parse_failed")
+            and texts[0].startswith("Analysis:") and "prompt rejected" in texts[1]
+            and llm_batch.STATS["succeeded"] == 3 and llm_batch.STATS["failed"] == 2):
+        report("llm_batch_mode", True, "OK")
+    else:
+        report("llm_batch_mode", False, f"held={held} batches={anthropic_requests}/{openai_requests} "
+                                        f"prompts_ok={prompts_ok} "
+                                        f"sap={sap} basf={basf} texts={texts} stats={llm_batch.STATS}")
+        failed += 1
+
+    # Prompt prefix caching: analyze_data sends a prefix shared by all assets. Its rules
+    # alone are below the 1024-token minimum of Anthropic (Sonnet/Opus) and OpenAI, so by
+    # default it goes unmarked and is counted as short; with a lower minimum Anthropic marks it.
+    llm = _use_fake_llm()
+    llm_provider._MODEL = "claude-sonnet-4-5"
+    llm_provider.PROMPT_CACHE_STATS.update(dict.fromkeys(llm_provider.PROMPT_CACHE_STATS, 0))
+    os.environ["AI_MULTI_STEP"] = "off"
+    assets = [{"Asset": name, "Ticker": name, "Invest": 1000} for name in ("SAP", "BASF")]
+    asyncio.run(ai_analysis.analyze_data(assets[0], {"News": []}, assets))
+    unmarked = bool(llm.messages) and all(isinstance(m[0].content, str) for m in llm.messages)
+    short_prefix = llm_provider.PROMPT_CACHE_STATS["short_prefix"]
+    llm.messages.clear()
+    llm_provider.PROMPT_CACHE_STATS.update(dict.fromkeys(llm_provider.PROMPT_CACHE_STATS, 0))
+    os.environ["LLM_PROMPT_CACHE_MIN_TOKENS"] = "1"
+    for asset in assets:
+        asyncio.run(ai_analysis.analyze_data(asset, {"News": []}, assets))
+    blocks = [m[0].content for m in llm.messages if isinstance(m[0].content, list)]
+    prefixes = {b[0]["text"] for b in blocks}
+    marked = all(b[0].get("cache_control") == {"type": "ephemeral"} for b in blocks)
+    suffixes_ok = all(b[1]["text"].startswith("ASSET: ") for b in blocks)
+    no_asset_in_prefix = not any(name in p for p in prefixes for name in ("SAP", "BASF"))
+    stats = dict(llm_provider.PROMPT_CACHE_STATS)
+    os.environ["LLM_PROMPT_CACHE"] = "off"
+    asyncio.run(llm_provider.ainvoke("ASSET: SAP", prefix="ROLE: ...\n\n"))
+    os.environ.pop("LLM_PROMPT_CACHE", None)
+    cache_off_message = llm.messages[-1]
+    llm_provider._PROVIDER = "openai"
+    asyncio.run(llm_provider.ainvoke("ASSET: SAP", prefix="ROLE: ...\n\n"))
+    openai_message = llm.messages[-1]
+    os.environ.pop("LLM_PROMPT_CACHE_MIN_TOKENS", None)
+    llm_provider._PROVIDER, llm_provider._MODEL = "anthropic", "claude-3-5-haiku-latest"
+    haiku_min = llm_provider.prompt_cache_min_tokens()
+    # per asset: structured call (no JSON block), fallback and retry (JSON block) -> 2 distinct prefixes;
+    # usage data is recorded for the 4 unstructured calls; OpenAI and cache off get one user message
+    if (unmarked and short_prefix == 3 and len(blocks) == 6 and len(prefixes) == 2 and marked and suffixes_ok
+            and no_asset_in_prefix and stats["calls"] == 4 and stats["short_prefix"] == 0
+            and stats["cache_read_tokens"] == 4000 and haiku_min == 2048
+            and [m.content for m in openai_message] == [m.content for m in cache_off_message]
+            == ["ROLE: ...\n\nASSET: SAP"]):
+        report("prompt_prefix_cache", True, "OK")
+    else:
+        report("prompt_prefix_cache", False, f"unmarked={unmarked} short={short_prefix} blocks={len(blocks)} "
+                                             f"prefixes={len(prefixes)} marked={marked} stats={stats} "
+                                             f"haiku_min={haiku_min} openai={openai_message} "
+                                             f"off={cache_off_message}")
+        failed += 1
+    llm_provider._LLM = None
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
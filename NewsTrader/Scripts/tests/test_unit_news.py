@@ -0,0 +1,229 @@
+"""Unit tests for news.py. No network needed (Tiingo and HTTP are faked)."""
+import argparse
+import asyncio
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+import headline_store
+import http_client
+import news
+
+from tests.test_helpers import report
+
+
+def _rss_feed(today_items: int, old_items: int) -> bytes:
+    """Google News style feed, newest first; one item of yesterday among today's."""
+    now = datetime.now().astimezone()
+    dates = [now - timedelta(seconds=i) for i in range(today_items)]
+    dates.insert(1, now - timedelta(days=1))
+    dates += [now - timedelta(days=2 + i // 100) for i in range(old_items)]
+    items = "".join(
+        f"<item><title>Headline {i}</title><link>https://news.example/{i}</link>"
+        f"<pubDate>{format_datetime(d)}</pubDate><description>{'text ' * 100}</description></item>"
+        for i, d in enumerate(dates)
+    )
+    return f'<?xml version="1.0"?><rss><channel><title>Feed</title>{items}</channel></rss>'.encode()
+
+
+async def _stream_google_news(feed: bytes, sent: list):
+    async def body():
+        for start in range(0, len(feed), 8_192):
+            sent.append(min(8_192, len(feed) - start))
+            yield feed[start:start + 8_192]
+
+    def handler(request):
+        return httpx.Response(200, content=body(), headers={"Content-Type": "application/rss+xml"})
+
+    http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    http_client._CLIENT_LOOP = asyncio.get_running_loop()
+    try:
+        return await news.get_google_news("SAP", "DE")
+    finally:
+        await http_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: unit tests for news (shared Tiingo feed, local matching, streaming RSS parser,")
+        print("  headline store dedup, batched Google News queries and recall vs per-asset queries)")
+        return 0
+
+    failed = 0
+    original_tiingo = news.tiingo_get_news
+    today_iso = datetime.now().strftime("%Y-%m-%d")
+
+    # Shared Tiingo feed: one fetch for many concurrent assets, matched locally
+    calls = []
+
+    def fake_tiingo_get_news(tickers=None, limit=20, **kwargs):
+        calls.append(limit)
+        return [
+            {"title": "Rheinmetall AG wins new order", "publishedDate": f"{today_iso}T08:00:00Z", "url": "u1"},
+            {"title": "Siemens Energy raises outlook", "publishedDate": f"{today_iso}T09:00:00Z", "url": "u2"},
+            {"title": "Rheinmetall AG shares slip", "publishedDate": "2000-01-01T09:00:00Z", "url": "u3"},
+        ]
+
+    news.tiingo_get_news = fake_tiingo_get_news
+    news._TIINGO_FEED.update({"fetched_at": None, "items": [], "index": {}})
+
+    async def _lookup_all():
+        feeds = await asyncio.gather(*(news.get_tiingo_feed() for _ in range(5)))
+        return feeds[0]
+
+    feed = asyncio.run(_lookup_all())
+    matched = news.match_tiingo_news(feed, "Rheinmetall AG", today_iso)
+    no_match = news.match_tiingo_news(feed, "Rheinmetall Energy", today_iso)
+    if len(calls) == 1 and [m["url"] for m in matched] == ["u1"] and no_match == []:
+        report("tiingo_feed_fetched_once", True, "OK")
+    else:
+        report("tiingo_feed_fetched_once", False, f"calls={len(calls)} matched={matched} no_match={no_match}")
+        failed += 1
+
+    # TTL expired: next lookup fetches again
+    os.environ["TIINGO_NEWS_TTL"] = "0"
+    asyncio.run(news.get_tiingo_feed())
+    os.environ.pop("TIINGO_NEWS_TTL", None)
+    if len(calls) == 2:
+        report("tiingo_feed_refetch_after_ttl", True, "OK")
+    else:
+        report("tiingo_feed_refetch_after_ttl", False, f"calls={len(calls)}")
+        failed += 1
+
+    news.tiingo_get_news = original_tiingo
+
+    # Google News RSS: parsed while streaming, download stops once the feed is past today
+    os.environ["HTTP_CACHE"] = "off"
+    feed = _rss_feed(today_items=5, old_items=3000)
+    sent = []
+    items = asyncio.run(_stream_google_news(feed, sent))
+    capped = news._parse_google_news(_rss_feed(today_items=30, old_items=0), "DE", datetime.now().date())
+    os.environ.pop("HTTP_CACHE", None)
+    titles = [i["title"] for i in items]
+    if (titles == ["Headline 0", "Headline 2", "Headline 3", "Headline 4", "Headline 5"]
+            and sum(sent) < len(feed) // 10 and len(capped) == news.GOOGLE_NEWS_MAX_ITEMS):
+        report("google_news_stream_parser", True, f"OK (read {sum(sent) // 1024} KB of {len(feed) // 1024} KB)")
+    else:
+        report("google_news_stream_parser", False, f"titles={titles} read={sum(sent)} capped={len(capped)}")
+        failed += 1
+
+    # Headline store: exact (normalized) and near-duplicate titles share one id across
+    # sources and assets; the news table lists the most shared headlines first
+    store = headline_store.HeadlineStore()
+    fed = "Fed signals rate cut in September as inflation cools"
+    macro = store.add({"source": "Google News (DE)", "title": f"{fed} - Reuters"}, "SAP SE")
+    same = store.add({"source": "Tiingo", "title": fed}, "adidas AG")
+    near = store.add({"source": "Tiingo", "title": f"{fed} further"}, "Siemens AG")
+    other = store.add({"source": "Tiingo", "title": "Siemens Energy raises its outlook for the year"}, "Siemens AG")
+    start = time.perf_counter()
+    for i in range(3000):
+        store.add({"source": "Bulk", "title": f"Company {i} reports quarter number {i * 7} results"}, f"Asset {i % 50}")
+    bulk_ms = (time.perf_counter() - start) * 1000
+    table = store.write(os.path.join(tempfile.mkdtemp(prefix="newstrader_test_"), "run_Pipeline.log"))
+    with open(table, encoding="utf-8") as f:
+        first = next(csv.DictReader(f))
+    if (macro == same == near != other and first["asset_count"] == "3"
+            and first["sources"] == "Google News (DE); Tiingo" and store.summary()["duplicates"] == 2
+            and len(store.headlines) == 3002):
+        report("headline_store_dedup", True, f"OK (3000 headlines in {bulk_ms:.0f} ms)")
+    else:
+        report("headline_store_dedup", False, f"ids={macro, same, near, other} first={first} "
+                                              f"summary={store.summary()} headlines={len(store.headlines)}")
+        failed += 1
+
+    # Batched Google News: one OR query per batch and country, items routed by name
+    # (legal form ignored); a derivative shares its underlying's search name
+    original_google = news.get_google_news
+    queries = []
+
+    async def fake_google_news(query, country_code="US", max_items=news.GOOGLE_NEWS_MAX_ITEMS):
+        queries.append((country_code, query))
+        titles = {
+            "DE": ["SAP hebt Prognose an - Handelsblatt", "adidas und SAP starten Partnerschaft",
+                   "Rheinmetall erhält Auftrag", "Dax schließt fester"],
+            "US": ["Apple unveils new iPhone lineup"],
+        }[country_code]
+        return [{"source": f"Google News ({country_code})", "title": t, "date": "", "url": t} for t in titles]
+
+    news.get_google_news = fake_google_news
+    batch_assets = [
+        {"Asset": "SAP SE", "ISIN": "DE0007164600"},
+        {"Asset": "HSBC Call 2026 auf SAP SE", "ISIN": "DE000TT12345"},
+        {"Asset": "adidas AG", "ISIN": "DE000A1EWWW0"},
+        {"Asset": "Rheinmetall AG", "ISIN": "DE0007030033"},
+        {"Asset": "Apple Inc", "ISIN": "US0378331005"},
+    ]
+    try:
+        routed = asyncio.run(news.prefetch_google_news(batch_assets, 2))
+        apple = asyncio.run(news.aggregate_news(batch_assets[4], "AAPL", routed))
+    finally:
+        news.get_google_news = original_google
+    sap_titles = [i["title"] for i in routed.get(("DE", "SAP SE"), [])]
+    if (len(queries) == 3 and queries[0] == ("DE", '("SAP SE" OR "adidas AG")+Aktie')
+            and queries[2] == ("US", '"Apple Inc"')
+            and len(sap_titles) == 2 and len(routed[("DE", "adidas AG")]) == 1
+            and len(routed[("DE", "Rheinmetall AG")]) == 1 and apple["count"] == 1):
+        report("batched_news_queries", True, f"OK ({len(queries)} queries for {len(batch_assets)} assets)")
+    else:
+        report("batched_news_queries", False, f"queries={queries} routed={routed} apple={apple}")
+        failed += 1
+
+    # Batched routing finds the same headlines as per-asset queries on a fixture
+    # feed (fake Google: whole-word match of any OR'ed name; suffix must be kept)
+    feed = ["SAP hebt Prognose an", "Sapphire Rapids: Intel senkt Preise", "adidas und SAP starten Partnerschaft",
+            "Rheinmetall erhält Auftrag", "Adidas-Aktie fällt", "Dax schließt fester", "BASF Ludwigshafen"]
+    queries = []
+
+    async def fixture_google_news(query, country_code="US", max_items=news.GOOGLE_NEWS_MAX_ITEMS):
+        queries.append(query)
+        suffix = news._google_news_suffix(country_code)
+        if not query.endswith(suffix):
+            return []
+        terms = [t.strip('"') for t in query[:len(query) - len(suffix)].strip("()").split(" OR ")]
+        return [{"source": f"Google News ({country_code})", "title": t, "date": "", "url": t} for t in feed
+                if any(re.search(rf"(?<!\w){re.escape(term)}(?!\w)", t, re.IGNORECASE) for term in terms)]
+
+    news.get_google_news = fixture_google_news
+    recall_assets = [{"Asset": name, "ISIN": "DE0000000001"} for name in ("SAP", "adidas", "Rheinmetall", "BASF")]
+    try:
+        routed = asyncio.run(news.prefetch_google_news(recall_assets, 3))
+        batch_queries = list(queries)
+        single = {
+            a["Asset"]: asyncio.run(fixture_google_news(news._google_news_query(a["Asset"], "DE"), "DE"))
+            for a in recall_assets
+        }
+    finally:
+        news.get_google_news = original_google
+    mismatched = {
+        name: ([i["title"] for i in routed.get(("DE", name), [])], [i["title"] for i in items])
+        for name, items in single.items()
+        if [i["title"] for i in routed.get(("DE", name), [])] != [i["title"] for i in items]
+    }
+    if (not mismatched and all(q.endswith("+Aktie") for q in batch_queries)
+            and len(single["SAP"]) == 2 and len(single["adidas"]) == 2):
+        report("batched_news_recall", True, f"OK ({len(batch_queries)} batched queries)")
+    else:
+        report("batched_news_recall", False, f"queries={batch_queries} batched vs single={mismatched}")
+        failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
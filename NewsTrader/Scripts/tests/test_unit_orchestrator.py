@@ -0,0 +1,178 @@
+"""Unit tests for orchestrator.py. No network or LLM (fetch and analysis are stubbed)."""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+import orchestrator
+
+from tests.test_helpers import report
+
+
+def _jobs(n: int, stop_on_fatal: bool = True) -> list:
+    return [
+        {"asset": {"Asset": f"Asset {i}", "Ticker": f"T{i}"}, "label": "Portfolio", "pos": i + 1, "total": n,
+         "pdf_path": "", "stop_on_fatal": stop_on_fatal, "priority": 0}
+        for i in range(n)
+    ]
+
+
+class _Stages:
+    """Stubs for fetch_asset_data / analyze_data / create_pdf with per-asset delays,
+    in-flight counters and cancellation tracking."""
+
+    def __init__(self, fetch_delay=None, analyze_delay=None, fatal=()):
+        self.fetch_delay = fetch_delay or (lambda i: 0.01)
+        self.analyze_delay = analyze_delay or (lambda i: 0.0)
+        self.fatal = set(fatal)
+        self.fetching = 0
+        self.max_fetching = 0
+        self.analyzing = 0
+        self.max_analyzing = 0
+        self.fetch_started = []
+        self.fetch_done = []
+        self.analyze_started = []  # (asset, fetches finished at that moment)
+        self.cancelled = []
+
+    def install(self):
+        orchestrator.fetch_asset_data = self.fetch
+        orchestrator.analyze_data = self.analyze
+        orchestrator.create_pdf = lambda *args, **kwargs: None
+
+    async def fetch(self, asset, alpaca_quotes=None, google_news=None):
+        i = int(asset["Ticker"][1:])
+        self.fetch_started.append(i)
+        self.fetching += 1
+        self.max_fetching = max(self.max_fetching, self.fetching)
+        try:
+            await asyncio.sleep(self.fetch_delay(i))
+        except asyncio.CancelledError:
+            self.cancelled.append(("fetch", i))
+            raise
+        finally:
+            self.fetching -= 1
+        self.fetch_done.append(i)
+        if i in self.fatal:
+            return {"FATAL_ERROR": f"no price for {asset['Asset']}"}
+        return {"Price": float(i)}
+
+    async def analyze(self, asset, data, all_assets):
+        i = int(asset["Ticker"][1:])
+        self.analyze_started.append((i, len(self.fetch_done)))
+        self.analyzing += 1
+        self.max_analyzing = max(self.max_analyzing, self.analyzing)
+        try:
+            await asyncio.sleep(self.analyze_delay(i))
+        except asyncio.CancelledError:
+            self.cancelled.append(("analyze", i))
+            raise
+        finally:
+            self.analyzing -= 1
+        return {"Recommendation": f"HOLD {i}"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: unit tests for orchestrator (asset order, concurrency bound, fatal error,")
+        print("  fetch/analysis overlap, fatal error drains both stages)")
+        return 0
+
+    failed = 0
+    original = (orchestrator.fetch_asset_data, orchestrator.analyze_data, orchestrator.create_pdf)
+    original_widths = (config.CONCURRENCY, config.LLM_CONCURRENCY)
+    try:
+        # Results keep input order although later assets finish first;
+        # at most CONCURRENCY assets are fetched at once
+        config.CONCURRENCY = 3
+        config.LLM_CONCURRENCY = 0
+        stages = _Stages(fetch_delay=lambda i: 0.05 - 0.005 * i)
+        stages.install()
+        jobs = _jobs(8)
+        results = asyncio.run(orchestrator.run_pipeline(jobs, [j["asset"] for j in jobs]))
+        names = [r.get("Asset") for r in results]
+        if (names == [f"Asset {i}" for i in range(8)] and stages.fetch_done != sorted(stages.fetch_done)
+                and results[5]["Recommendation"] == "HOLD 5" and 1 < stages.max_fetching <= 3):
+            report("assets_keep_order_bounded", True, f"OK (max {stages.max_fetching} in flight)")
+        else:
+            report("assets_keep_order_bounded", False, f"names={names} done={stages.fetch_done} "
+                                                        f"max_fetching={stages.max_fetching}")
+            failed += 1
+
+        # FATAL_ERROR raises FatalAssetError and cancels the remaining work
+        stages = _Stages(fetch_delay=lambda i: 0.01 if i == 1 else 0.2, fatal={1})
+        stages.install()
+        jobs = _jobs(8)
+        raised = None
+        try:
+            asyncio.run(orchestrator.run_pipeline(jobs, [j["asset"] for j in jobs]))
+        except orchestrator.FatalAssetError as e:
+            raised = e
+        cancelled = [i for stage, i in stages.cancelled if stage == "fetch"]
+        # The three in-flight fetches: one fatal, two cancelled; the other five never start
+        if raised is not None and sorted(cancelled) == [0, 2] and sorted(stages.fetch_started) == [0, 1, 2]:
+            report("fatal_error_cancels", True, "OK")
+        else:
+            report("fatal_error_cancels", False, f"raised={raised!r} started={stages.fetch_started} "
+                                                  f"cancelled={stages.cancelled}")
+            failed += 1
+
+        # Two stages: analysis starts while fetching goes on, results stay in index
+        # order although analyses finish out of order, LLM_CONCURRENCY bounds analysis
+        config.CONCURRENCY = 2
+        config.LLM_CONCURRENCY = 3
+        stages = _Stages(fetch_delay=lambda i: 0.02, analyze_delay=lambda i: 0.06 - 0.006 * i)
+        stages.install()
+        jobs = _jobs(8)
+        results = asyncio.run(orchestrator.run_pipeline(jobs, [j["asset"] for j in jobs]))
+        names = [r.get("Asset") for r in results]
+        overlap = [i for i, fetched in stages.analyze_started if fetched < len(jobs)]
+        if (names == [f"Asset {i}" for i in range(8)] and overlap
+                and 1 < stages.max_analyzing <= 3 and stages.max_fetching <= 2):
+            report("pipeline_stages_overlap", True, f"OK ({len(overlap)} analyses started while fetching)")
+        else:
+            report("pipeline_stages_overlap", False, f"names={names} started={stages.analyze_started} "
+                                                      f"max_analyzing={stages.max_analyzing}")
+            failed += 1
+
+        # FATAL_ERROR while analyses run: both stages stop, nothing is left pending
+        stages = _Stages(fetch_delay=lambda i: 0.01, analyze_delay=lambda i: 5.0, fatal={3})
+        stages.install()
+        jobs = _jobs(8)
+
+        async def _run_fatal():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            try:
+                await asyncio.wait_for(orchestrator.run_pipeline(jobs, [j["asset"] for j in jobs]), timeout=3)
+            except orchestrator.FatalAssetError as e:
+                leftover = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                return e, loop.time() - start, leftover
+            return None, loop.time() - start, []
+
+        raised, elapsed, leftover = asyncio.run(_run_fatal())
+        analyses_cancelled = [i for stage, i in stages.cancelled if stage == "analyze"]
+        if raised is not None and elapsed < 1.0 and analyses_cancelled and not leftover:
+            report("pipeline_fatal_drains", True, f"OK ({elapsed * 1000:.0f} ms, "
+                                                   f"{len(analyses_cancelled)} analyses cancelled)")
+        else:
+            report("pipeline_fatal_drains", False, f"raised={raised!r} elapsed={elapsed:.2f}s "
+                                                    f"cancelled={stages.cancelled} leftover={leftover}")
+            failed += 1
+    finally:
+        orchestrator.fetch_asset_data, orchestrator.analyze_data, orchestrator.create_pdf = original
+        config.CONCURRENCY, config.LLM_CONCURRENCY = original_widths
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
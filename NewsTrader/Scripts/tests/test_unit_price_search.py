@@ -0,0 +1,345 @@
+"""Unit tests for price_search.py and cache_store.py. No network needed (HTTP is faked)."""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+import config
+import http_client
+import price_extractors
+import price_search
+import source_ranking
+from cache_store import open_cache_store
+
+from tests.test_helpers import report
+
+
+class _FakeResponse:
+    def __init__(self, text, url, status_code=200):
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.url = url
+        self.status_code = status_code
+
+
+def _fake_http(pages: dict, calls: list, delays: dict | None = None):
+    """Replace http_client.get/fetch_until with fakes serving pages by URL substring."""
+    async def get(url, headers=None, timeout=None, **kwargs):
+        calls.append(url)
+        for needle, body in pages.items():
+            if needle in url:
+                await asyncio.sleep((delays or {}).get(needle, 0))
+                return _FakeResponse(body, url)
+        return _FakeResponse("", url, 404)
+
+    async def fetch_until(url, extract, headers=None, timeout=None, **kwargs):
+        resp = await get(url, headers=headers, timeout=timeout)
+        if resp.status_code != 200:
+            return resp, "", None
+        return resp, resp.text, extract(resp.text)
+
+    http_client.get = get
+    http_client.fetch_until = fetch_until
+
+
+async def _stream_price_page(price_at: int, total: int, chunk: int, sent: list, scanned: list | None = None):
+    """Serve a page of total bytes through a MockTransport with the price at price_at.
+    scanned collects the length of each text slice handed to the extractor."""
+    async def body():
+        filler = b"<div>x</div>" * (chunk // 12)
+        pos = 0
+        while pos < total:
+            data = filler[:chunk]
+            if pos <= price_at < pos + chunk:
+                data = b"<td>Brief</td><td>12,34</td>" + data
+            sent.append(len(data))
+            yield data
+            pos += len(data)
+
+    def handler(request):
+        return httpx.Response(200, content=body(), headers={"Content-Type": "text/html; charset=utf-8"})
+
+    http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    http_client._CLIENT_LOOP = asyncio.get_running_loop()
+    def extract(html):
+        if scanned is not None:
+            scanned.append(len(html))
+        return price_search._extract_quick(html, "Ariva", "https://www.ariva.de/X")
+
+    try:
+        return await http_client.fetch_until("https://www.ariva.de/X", extract, overlap=price_search.STREAM_OVERLAP)
+    finally:
+        await http_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: unit tests for cache_store (json, sqlite), price_search tiers,")
+        print("  hedged priority, web price cache hit/miss, quote cache TTL, extractor registry,")
+        print("  streaming early exit, learned source ranking")
+        return 0
+
+    failed = 0
+    tmp_dir = tempfile.mkdtemp(prefix="newstrader_test_")
+    original_get = http_client.get
+    original_fetch_until = http_client.fetch_until
+    # Learned ranking off (and kept in tmp) so the fixed-order tests below stay deterministic
+    config.SOURCE_RANKING_FILE = os.path.join(tmp_dir, "source_ranking.json")
+    source_ranking._STORE = None
+    os.environ["SOURCE_RANKING"] = "off"
+
+    # cache_store: JSON flush merges keys written by another store instance
+    path = os.path.join(tmp_dir, "merge.json")
+    a = open_cache_store(path)
+    b = open_cache_store(path)
+    a.set("A", {"v": 1})
+    a.flush()
+    b.set("B", {"v": 2})
+    b.flush()
+    on_disk = json.loads(Path(path).read_text(encoding="utf-8"))
+    if on_disk == {"A": {"v": 1}, "B": {"v": 2}}:
+        report("json_store_merges_on_flush", True, "OK")
+    else:
+        report("json_store_merges_on_flush", False, f"Got {on_disk}")
+        failed += 1
+
+    # cache_store: SQLite imports the JSON file once and upserts per key
+    sqlite_store = open_cache_store(path, "sqlite")
+    sqlite_store.set("A", {"v": 3})
+    sqlite_store.delete("B")
+    sqlite_store.close()
+    sqlite_store = open_cache_store(path, "sqlite")
+    if sqlite_store.get("A") == {"v": 3} and sqlite_store.get("B") is None:
+        report("sqlite_store_upsert_delete", True, "OK")
+    else:
+        report("sqlite_store_upsert_delete", False, f"A={sqlite_store.get('A')} B={sqlite_store.get('B')}")
+        failed += 1
+    sqlite_store.close()
+
+    # Serial search: quick tier keeps Onvista -> Ariva -> Comdirect order
+    config.WEB_PRICE_CACHE_FILE = os.path.join(tmp_dir, "web_price_cache.json")
+    price_search._WEB_PRICE_CACHE = None
+    os.environ["PRICE_SEARCH_MODE"] = "serial"
+    calls = []
+    _fake_http({"ariva.de": "<td>Brief</td><td>12,34</td>"}, calls)
+    result = asyncio.run(price_search.deep_dive_price_search({"ISIN": "DE0001234567"}, "T1"))
+    if result.get("price") == 12.34 and len(calls) == 2:
+        report("serial_quick_tier", True, "OK")
+    else:
+        report("serial_quick_tier", False, f"Got {result}, calls={calls}")
+        failed += 1
+
+    # Cache hit: second lookup goes straight to the cached URL
+    calls.clear()
+    result = asyncio.run(price_search.deep_dive_price_search({"ISIN": "DE0001234567"}, "T1"))
+    entry = price_search.get_web_price_cache().get("T1") or {}
+    if result.get("price") == 12.34 and len(calls) == 1 and entry.get("hits") == 2:
+        report("web_cache_hit_single_request", True, "OK")
+    else:
+        report("web_cache_hit_single_request", False, f"Got {result}, calls={calls}, entry={entry}")
+        failed += 1
+
+    # Cache miss: entry dropped after WEB_PRICE_CACHE_MAX_FAILURES consecutive failures
+    os.environ["WEB_PRICE_CACHE_MAX_FAILURES"] = "2"
+    _fake_http({}, calls)
+    for _ in range(2):
+        asyncio.run(price_search.deep_dive_price_search({"ISIN": "DE0001234567"}, "T1"))
+    if price_search.get_web_price_cache().get("T1") is None:
+        report("web_cache_drop_after_failures", True, "OK")
+    else:
+        report("web_cache_drop_after_failures", False, f"Entry={price_search.get_web_price_cache().get('T1')}")
+        failed += 1
+    os.environ.pop("WEB_PRICE_CACHE_MAX_FAILURES", None)
+
+    # Hedged search: priority source wins even if a lower one answers first
+    os.environ["PRICE_SEARCH_MODE"] = "hedged"
+    os.environ["PRICE_SOURCE_PRIORITY"] = "Ariva,Comdirect,Onvista"
+    price_search._WEB_PRICE_CACHE = None
+    config.WEB_PRICE_CACHE_FILE = os.path.join(tmp_dir, "hedged.json")
+    calls.clear()
+    _fake_http(
+        {"ariva.de": "Brief 2,22", "comdirect.de": "Brief 3,33", "onvista.de": "Brief 1,11"},
+        calls,
+        delays={"ariva.de": 0.2, "comdirect.de": 0.0, "onvista.de": 0.0},
+    )
+    result = asyncio.run(price_search.deep_dive_price_search({"ISIN": "DE0001234567"}, "T2"))
+    if result.get("price") == 2.22 and len(calls) == 3:
+        report("hedged_priority_order", True, "OK")
+    else:
+        report("hedged_priority_order", False, f"Got {result}, calls={calls}")
+        failed += 1
+    os.environ.pop("PRICE_SEARCH_MODE", None)
+    os.environ.pop("PRICE_SOURCE_PRIORITY", None)
+
+    # Quote cache: intraday TTL, closed market valid until next open, --max-quote-age
+    config.QUOTE_CACHE_FILE = os.path.join(tmp_dir, "quote_cache.json")
+    price_search._QUOTE_CACHE = None
+    asset = {"ISIN": "DE0001234567", "Asset": "Test AG"}
+    price_search.store_quote(asset, "T3", "Web_Price", {"price": 1.5, "source": "Ariva (Brief)"})
+    stored_at = datetime.fromisoformat(price_search.get_quote_cache().get("DE0001234567")["fetched_at"])
+    friday_open = price_search.MARKET_TZ.localize(datetime(2026, 1, 16, 10, 0))
+    friday_late = price_search.MARKET_TZ.localize(datetime(2026, 1, 16, 23, 0))
+    intraday_fresh = price_search.quote_expires_at(friday_open) == friday_open + timedelta(seconds=300)
+    weekend_until_monday = price_search.quote_expires_at(friday_late) == price_search.MARKET_TZ.localize(
+        datetime(2026, 1, 19, 8, 0)
+    )
+    config.MAX_QUOTE_AGE = 60
+    hit = price_search.get_cached_quote(asset, "T3", now=stored_at + timedelta(seconds=30))
+    miss = price_search.get_cached_quote(asset, "T3", now=stored_at + timedelta(seconds=90))
+    config.MAX_QUOTE_AGE = 0
+    disabled = price_search.get_cached_quote(asset, "T3", now=stored_at)
+    config.MAX_QUOTE_AGE = None
+    if (intraday_fresh and weekend_until_monday and hit and hit[0] == "Web_Price"
+            and hit[1].get("price") == 1.5 and miss is None and disabled is None):
+        report("quote_cache_ttl", True, "OK")
+    else:
+        report("quote_cache_ttl", False, f"intraday={intraday_fresh} weekend={weekend_until_monday} "
+                                         f"hit={hit} miss={miss} disabled={disabled}")
+        failed += 1
+
+    # Extractor registry: per-site rules in priority order, marker window, bounded decoys
+    decoys = "<span>Briefing Geldanlage</span>" * 2000
+    samples = [
+        (price_extractors.QUICK_RULES, "<td>Brief</td><td>1,2345</td><td>Geld</td><td>1,2300</td>", ("Brief", 1.2345)),
+        (price_extractors.QUICK_RULES, decoys + "x" * 500 + "<td>Geld</td><td>7,50</td>", ("Geld", 7.5)),
+        (price_extractors.QUICK_RULES, "Brief" + "x" * 1000 + "9,99", None),
+        (price_extractors.site_rules("https://www.onvista.de/x"), '<meta itemprop="price" content="3.21">', ("Onvista (Meta)", 3.21)),
+        (price_extractors.site_rules("https://www.finanzen.net/x"), '<td class="col-price">45,60</td>', ("Finanzen.net (Table)", 45.6)),
+        (price_extractors.site_rules("https://derivate.bnpparibas.com/x"), '{"ask": "0.87"}', ("BNP (JSON)", 0.87)),
+        (price_extractors.GOOGLE_RULES, '<div data-last-price="101.5">101,50 EUR</div>', ("Google Finance", 101.5)),
+        (price_extractors.FALLBACK_RULES, '<span class="price">1.234,56</span> Kurs: 12,34', ("", 12.34)),
+    ]
+    mismatches = []
+    for rules, html, expected in samples:
+        found = price_extractors.extract(rules, html)
+        got = (found[0].source, found[1]) if found else None
+        if got != expected:
+            mismatches.append(f"{expected} -> {got}")
+    start = time.perf_counter()
+    no_price = price_extractors.extract(price_extractors.QUICK_RULES, decoys * 20)
+    elapsed = time.perf_counter() - start
+    if not mismatches and no_price is None and elapsed < 1.0:
+        report("extractor_registry", True, f"OK ({elapsed * 1000:.0f} ms for {len(decoys) * 20 // 1024} KB without price)")
+    else:
+        report("extractor_registry", False, f"mismatches={mismatches} no_price={no_price} elapsed={elapsed:.2f}s")
+        failed += 1
+
+    # Learned ranking (stats per tier and source): BNP tried alone first for BNP
+    # derivatives; a failing source moves back; the first choice is the ranked tier's
+    # URL, and its URL is not fetched again by a later tier
+    os.environ["SOURCE_RANKING"] = "on"
+    os.environ["PRICE_SEARCH_MODE"] = "serial"
+    config.WEB_PRICE_CACHE_FILE = os.path.join(tmp_dir, "ranking_cache.json")
+    price_search._WEB_PRICE_CACHE = None
+    store = source_ranking.get_store()
+    store.set("DE:BNP:derivative", {"link:BNP": {"attempts": 10, "hits": 10, "latency_ms": 200.0},
+                                    "quick:Onvista": {"attempts": 10, "hits": 2, "latency_ms": 900.0}})
+    store.set("US:-:stock", {"quick:Ariva": {"attempts": 10, "hits": 0, "latency_ms": 800.0}})
+    store.set("FR:-:stock", {"quick:Ariva": {"attempts": 10, "hits": 0, "latency_ms": 800.0},
+                             "fallback:Ariva": {"attempts": 10, "hits": 10, "latency_ms": 300.0}})
+    store.set("NL:-:stock", {"quick:Comdirect": {"attempts": 10, "hits": 9, "latency_ms": 300.0}})
+    calls.clear()
+    _fake_http({"bnpparibas.com": '{"ask": "0.87"}'}, calls)
+    bnp = asyncio.run(price_search.deep_dive_price_search({"ISIN": "DE000PZ12345", "Asset": "BNP Call SAP"}, "T4"))
+    bnp_calls = list(calls)
+    calls.clear()
+    _fake_http({"comdirect.de": "Brief 5,55"}, calls)
+    us = asyncio.run(price_search.deep_dive_price_search({"ISIN": "US0378331005", "Asset": "Apple"}, "T5"))
+    us_calls = list(calls)
+    calls.clear()
+    _fake_http({"simple.m": "Kurs: 7,77"}, calls)
+    fr = asyncio.run(price_search.deep_dive_price_search({"ISIN": "FR0000120271", "Asset": "Total"}, "T6"))
+    fr_calls = list(calls)
+    calls.clear()
+    _fake_http({}, calls)
+    asyncio.run(price_search.deep_dive_price_search({"ISIN": "NL0010273215", "Asset": "ASML"}, "T7"))
+    nl_comdirect = [c for c in calls if "comdirect.de" in c]
+    bnp_stats = (source_ranking.get_store().get("DE:BNP:derivative") or {}).get("link:BNP", {})
+    if (bnp.get("price") == 0.87 and len(bnp_calls) == 1 and bnp_stats.get("attempts") == 11
+            and us.get("price") == 5.55 and not any("ariva.de" in c for c in us_calls)
+            and fr.get("price") == 7.77 and len(fr_calls) == 1 and "simple.m" in fr_calls[0]
+            and len(nl_comdirect) == 1 and "comdirect.de" in calls[0]):
+        report("learned_source_ranking", True, "OK")
+    else:
+        report("learned_source_ranking", False, f"bnp={bnp} calls={bnp_calls} us={us} us_calls={us_calls} "
+                                                 f"fr={fr} fr_calls={fr_calls} nl_comdirect={nl_comdirect}")
+        failed += 1
+    os.environ.pop("PRICE_SEARCH_MODE", None)
+    os.environ.pop("SOURCE_RANKING", None)
+
+    http_client.get = original_get
+    http_client.fetch_until = original_fetch_until
+
+    # Streaming fetch: stops reading once the price is found, byte cap otherwise;
+    # a page without a price is scanned about once, not once per check
+    sent = []
+    _, text, result = asyncio.run(_stream_price_page(price_at=40_000, total=2_000_000, chunk=8_192, sent=sent))
+    early_bytes = sum(sent)
+    capped = []
+    scanned = []
+    _, capped_text, capped_result = asyncio.run(
+        _stream_price_page(price_at=10_000_000, total=3_000_000, chunk=8_192, sent=capped, scanned=scanned)
+    )
+    if (result and result.get("price") == 12.34 and early_bytes < 100_000
+            and capped_result is None and sum(capped) <= http_client.MAX_PAGE_BYTES + 2 * 8_192
+            and sum(scanned) < 2.2 * len(capped_text)):
+        report("stream_early_exit", True, f"OK (read {early_bytes // 1024} KB of 2000 KB)")
+    else:
+        report("stream_early_exit", False, f"result={result} read={early_bytes} capped_read={sum(capped)} "
+                                            f"scanned={sum(scanned)} of {len(capped_text)}")
+        failed += 1
+
+    # A marker in one slice with its price in the next is still found (overlap)
+    async def _split_marker_page():
+        async def body():
+            yield b"<div>x</div>" * 1360 + b"<td>Brief</td>" + b" " * 80
+            yield b" " * 200 + b"<td>12,34</td>" + b"<div>x</div>" * 1400
+            yield b"<div>x</div>" * 1400
+
+        def handler(request):
+            return httpx.Response(200, content=body(), headers={"Content-Type": "text/html; charset=utf-8"})
+
+        http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http_client._CLIENT_LOOP = asyncio.get_running_loop()
+        slices = []
+
+        def extract(html):
+            slices.append(html)
+            return price_search._extract_quick(html, "Ariva", "https://www.ariva.de/X")
+
+        try:
+            _, _, found = await http_client.fetch_until(
+                "https://www.ariva.de/X", extract, overlap=price_search.STREAM_OVERLAP
+            )
+        finally:
+            await http_client.aclose()
+        return found, slices
+
+    found, slices = asyncio.run(_split_marker_page())
+    # Found by the second mid-stream check, not by the final pass over the whole page
+    if found and found.get("price") == 12.34 and len(slices) == 2 and "12,34" not in slices[0]:
+        report("stream_overlap_split_marker", True, "OK")
+    else:
+        report("stream_overlap_split_marker", False, f"found={found} slices={[len(x) for x in slices]}")
+        failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Offline scraper tests: price_search and news against recorded fixtures.
+
+Requests go to the local stand-in server (tests/fixture_server.py) serving
+tests/fixtures/http; no internet needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+import config
+import http_cache
+import http_client
+import http_fixtures
+import metrics
+import news
+import price_search
+import source_ranking
+
+from tests.fixture_server import FixtureServer
+from tests.test_helpers import report
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "http")
+
+
+async def _lookup(assets):
+    prices = {}
+    for asset in assets:
+        result = await price_search.deep_dive_price_search(asset, asset["Ticker"])
+        prices[asset["Ticker"]] = (result.get("price"), result.get("source"))
+    items = await news.get_google_news('"SAP SE"+Aktie', "DE")
+    resp = await http_client.get("https://www.boersen-zeitung.de/suche?q=SAP+SE")
+    await http_client.aclose()
+    return prices, items, resp
+
+
+async def _throttle_and_breaker(served: list):
+    """Rate limit and circuit breaker against a MockTransport (hosts rate.test, blocked.test, down.test)."""
+    state = {"down": True}
+
+    def handler(request):
+        url = request.url
+        served.append(url.host)
+        if url.host == "blocked.test":
+            return httpx.Response(429, headers={"Retry-After": "30"})
+        if url.host == "down.test" and state["down"]:
+            raise httpx.ConnectTimeout("timeout", request=request)
+        return httpx.Response(200, text="ok")
+
+    http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    http_client._CLIENT_LOOP = asyncio.get_running_loop()
+    http_client.reset_host_state()
+    outcomes = {}
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(http_client.get(f"https://rate.test/{i}") for i in range(15)))
+        outcomes["rate_elapsed"] = time.perf_counter() - start
+        outcomes["rate_waits"] = http_client.THROTTLE_STATS["waits"]
+
+        first = await http_client.get("https://blocked.test/a")
+        try:
+            with metrics.track("price", "Blocked", "https://blocked.test/b") as m:
+                await http_client.fetch_until("https://blocked.test/b", lambda html: None)
+        except http_client.CircuitOpenError:
+            pass
+        outcomes["blocked"] = (first.status_code, m["outcome"])
+
+        for _ in range(4):
+            try:
+                await http_client.get("https://down.test/")
+            except httpx.HTTPError as e:
+                outcomes.setdefault("down_errors", []).append(type(e).__name__)
+        # After the cool-down one probe goes through and closes the circuit again
+        state["down"] = False
+        http_client._CIRCUITS["down.test"]["open_until"] = time.monotonic() - 1
+        probe = await http_client.get("https://down.test/")
+        after = await http_client.get("https://down.test/")
+        outcomes["recovered"] = (probe.status_code, after.status_code)
+    finally:
+        await http_client.aclose()
+    return outcomes
+
+
+class _BrokenBody(httpx.AsyncByteStream):
+    """Response body that fails after its first chunk."""
+
+    async def __aiter__(self):
+        yield b"<html>"
+        raise httpx.ReadError("connection reset")
+
+
+async def _broken_streams():
+    """Streamed 200 responses whose body fails: each counts as one failure of the host."""
+    def handler(request):
+        return httpx.Response(200, stream=_BrokenBody())
+
+    http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    http_client._CLIENT_LOOP = asyncio.get_running_loop()
+    http_client.reset_host_state()
+    errors = []
+    try:
+        calls = [lambda: http_client.fetch_until("https://broken.test/a", lambda html: None),
+                 lambda: http_client.fetch_stream("https://broken.test/b", lambda chunk: False)] * 2
+        for call in calls:
+            try:
+                await call()
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+    finally:
+        await http_client.aclose()
+    return errors
+
+
+async def _conditional_gets(served: list):
+    """Two runs against an ETag-serving MockTransport: the second run gets 304s only."""
+    pages = {"/rss": b"<rss>" + b"x" * 5000 + b"</rss>", "/product": b'<html>{"ask": "0.87"}' + b" " * 50000}
+
+    def handler(request):
+        served.append(request.headers.get("if-none-match", ""))
+        etag = f'"{request.url.path}-v1"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, content=pages[request.url.path], headers={"ETag": etag})
+
+    http_client._CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    http_client._CLIENT_LOOP = asyncio.get_running_loop()
+    extract = lambda html: price_search._extract_link(html, "https://derivate.bnpparibas.com/p")
+    try:
+        runs = []
+        for _ in range(2):
+            rss = await http_client.get("https://news.example/rss", cache=True)
+            _, _, price = await http_client.fetch_until("https://derivate.bnpparibas.com/product", extract, cache=True)
+            runs.append((rss.status_code, len(rss.content), (price or {}).get("price")))
+    finally:
+        await http_client.aclose()
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=None, help="Path to test.config (ignored for unit tests)")
+    parser.add_argument("--filter", default=None, help="Filter params (ignored for unit tests)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run")
+    parser.add_argument("--timeout", type=int, default=300, help="Timeout (ignored for unit tests)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print("Would run: offline scraper tests (price search, Google News, Boersen-Zeitung) via fixture server,")
+        print("  response recording, source telemetry, host rate limit and circuit breaker")
+        print("  (also for streamed bodies that fail),")
+        print("  conditional GET cache")
+        return 0
+
+    failed = 0
+    tmp_dir = tempfile.mkdtemp(prefix="newstrader_test_")
+    config.WEB_PRICE_CACHE_FILE = os.path.join(tmp_dir, "web_price_cache.json")
+    price_search._WEB_PRICE_CACHE = None
+    config.SOURCE_RANKING_FILE = os.path.join(tmp_dir, "source_ranking.json")
+    source_ranking._STORE = None
+    config.HTTP_CACHE_DIR = os.path.join(tmp_dir, "http_cache")
+    http_cache._INDEX = None
+    os.environ["PRICE_SEARCH_MODE"] = "serial"
+    assets = json.loads(Path(FIXTURES, "assets.json").read_text(encoding="utf-8"))
+
+    metrics.reset()
+    server = FixtureServer(FIXTURES).start()
+    record_dir = os.path.join(tmp_dir, "recorded")
+    os.environ["HTTP_REPLAY_URL"] = server.url
+    os.environ["HTTP_RECORD_DIR"] = record_dir
+    try:
+        prices, items, bz_resp = asyncio.run(_lookup(assets))
+    finally:
+        os.environ.pop("HTTP_REPLAY_URL", None)
+        os.environ.pop("HTTP_RECORD_DIR", None)
+        os.environ.pop("PRICE_SEARCH_MODE", None)
+        server.stop()
+
+    # Price search: quick tier (Brief on Onvista, Geld on Ariva after Onvista 404)
+    expected = {"SAP": (123.45, "Onvista (Brief)"), "ADS": (201.1, "Ariva (Geld)")}
+    if prices == expected:
+        report("replay_price_search", True, "OK")
+    else:
+        report("replay_price_search", False, f"Got {prices}")
+        failed += 1
+
+    # Google News RSS: only items published today
+    if len(items) == 2 and all(i["source"] == "Google News (DE)" for i in items):
+        report("replay_google_news", True, "OK")
+    else:
+        report("replay_google_news", False, f"Got {items}")
+        failed += 1
+
+    # Boersen-Zeitung parser: login/abo links and short titles skipped, known titles deduplicated
+    bz_items = news._parse_boersen_zeitung(bz_resp.text, ["SAP setzt auf kuenstliche Intelligenz im Geschaeft"])
+    if [i["url"] for i in bz_items] == ["https://www.boersen-zeitung.de/unternehmen/sap-cloud-umsatz"]:
+        report("parse_boersen_zeitung", True, "OK")
+    else:
+        report("parse_boersen_zeitung", False, f"Got {bz_items}")
+        failed += 1
+
+    # Record: every replayed response is captured under its original URL
+    recorded = http_fixtures.load_index(record_dir)
+    source_index = http_fixtures.load_index(FIXTURES)
+    missing = [url for url in source_index if url not in recorded]
+    if not missing and recorded["https://www.onvista.de/suche/DE000A1EWWW0"]["status"] == 404:
+        report("record_responses", True, f"OK ({len(recorded)} responses)")
+    else:
+        report("record_responses", False, f"missing={missing} recorded={list(recorded)}")
+        failed += 1
+
+    # Telemetry: one record per source attempt, written as JSON + CSV next to the log
+    by_source = {(r["source"], r["outcome"]) for r in metrics.records()}
+    log_path = os.path.join(tmp_dir, "run_Pipeline.log")
+    json_path, csv_path = metrics.write(log_path)
+    written = json.loads(Path(json_path).read_text(encoding="utf-8"))
+    expected_records = {("Onvista", "hit"), ("Onvista", "http_error"), ("Ariva", "hit"), ("Google News (DE)", "hit")}
+    if expected_records <= by_source and written["summary"] and os.path.exists(csv_path):
+        report("source_telemetry", True, f"OK ({len(written['records'])} records)")
+    else:
+        report("source_telemetry", False, f"records={sorted(by_source)}")
+        failed += 1
+
+    # Rate limit: 10/s with burst 10 delays the last 5 of 15 requests; 429 and
+    # 3 timeouts in a row pause the host; a probe after the cool-down closes it again
+    os.environ["HTTP_HOST_RATE"] = "default=10"
+    served = []
+    try:
+        outcomes = asyncio.run(_throttle_and_breaker(served))
+    finally:
+        os.environ.pop("HTTP_HOST_RATE", None)
+    expected_down = ["ConnectTimeout"] * 3 + ["CircuitOpenError"]
+    if (outcomes["rate_waits"] == 5 and 0.4 <= outcomes["rate_elapsed"] < 2.0
+            and outcomes["blocked"] == (429, "skipped") and served.count("blocked.test") == 1
+            and outcomes["down_errors"] == expected_down and outcomes["recovered"] == (200, 200)
+            and served.count("down.test") == 5):
+        report("host_rate_limit_circuit_breaker", True, f"OK ({outcomes['rate_elapsed']:.2f}s for 15 requests)")
+    else:
+        report("host_rate_limit_circuit_breaker", False, f"outcomes={outcomes} served={served}")
+        failed += 1
+
+    # A body that fails after the 200 is one failure (not a success and a failure):
+    # three in a row pause the host
+    errors = asyncio.run(_broken_streams())
+    if errors == ["ReadError"] * 3 + ["CircuitOpenError"]:
+        report("stream_error_recorded_once", True, "OK")
+    else:
+        report("stream_error_recorded_once", False, f"errors={errors} circuits={http_client._CIRCUITS}")
+        failed += 1
+
+    # Conditional GET cache: second run sends the ETag and serves the 304 from disk;
+    # flush keeps the folder under HTTP_CACHE_MAX_BYTES by evicting the least recently used
+    http_client.reset_host_state()
+    served = []
+    runs = asyncio.run(_conditional_gets(served))
+    saved = http_cache.STATS["bytes_saved"]
+    os.environ["HTTP_CACHE_MAX_BYTES"] = "51000"
+    http_cache.flush()
+    os.environ.pop("HTTP_CACHE_MAX_BYTES", None)
+    http_cache._INDEX = None
+    kept = list(http_cache._index())
+    if (runs[0] == runs[1] == (200, 5011, 0.87) and served[:2] == ["", ""] and all(served[2:])
+            and saved > 50000 and kept == ["https://derivate.bnpparibas.com/product"]):
+        report("conditional_get_cache", True, f"OK ({saved // 1024} KB served from cache)")
+    else:
+        report("conditional_get_cache", False, f"runs={runs} served={served} saved={saved} kept={kept}")
+        failed += 1
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Stub Tiingo worker for tests: same line-delimited JSON protocol as tiingo_worker.py.
+
+Commands: echo (returns args), sleep (args.seconds, then args), crash (exits the process).
+"""
+import json
+import sys
+import threading
+import time
+
+_write_lock = threading.Lock()
+
+
+def _send(message):
+    with _write_lock:
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+
+def _handle(request):
+    args = request.get("args") or {}
+    if request.get("cmd") == "sleep":
+        time.sleep(args.get("seconds", 0))
+    _send({"id": request.get("id"), "result": args})
+
+
+def main():
+    _send({"id": None, "ready": True})
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("cmd") == "crash":
+            sys.exit(3)
+        if request.get("cmd") == "fail":
+            _send({"id": request.get("id"), "error": "stub failure"})
+            continue
+        threading.Thread(target=_handle, args=(request,), daemon=True).start()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Long-lived Tiingo worker: started once per run by data_providers (Linux).
+
+Runs inside the tiingo-mcp-server venv (cwd = tiingo-mcp-server) and answers
+line-delimited JSON requests on stdin:
+    {"id": 1, "cmd": "get_news", "args": {"limit": 50}}
+with one line per response on stdout:
+    {"id": 1, "result": [...]}   or   {"id": 1, "error": "..."}
+Requests are handled in a small thread pool, so responses may arrive out of order.
+Standalone on purpose: it must not import NewsTrader modules (different venv).
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+
+_write_lock = threading.Lock()
+
+
+def _send(message: dict) -> None:
+    line = json.dumps(message, ensure_ascii=False, default=str)
+    with _write_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def _load_handlers() -> dict:
+    sys.path.insert(0, os.getcwd())
+    from tiingo_mcp_server.tiingo_functions import get_news_sync, get_ticker_price_sync
+
+    return {
+        "get_ticker_price": lambda args: get_ticker_price_sync(args["ticker"]),
+        "get_news": lambda args: get_news_sync(
+            tickers=args.get("tickers"), limit=args.get("limit", 20)
+        ),
+    }
+
+
+def _handle(handlers: dict, request: dict) -> None:
+    req_id = request.get("id")
+    try:
+        handler = handlers.get(request.get("cmd"))
+        if handler is None:
+            raise ValueError(f"Unknown command: {request.get('cmd')}")
+        _send({"id": req_id, "result": handler(request.get("args") or {})})
+    except Exception as e:
+        _send({"id": req_id, "error": f"{type(e).__name__}: {e}"})
+
+
+def main() -> int:
+    try:
+        handlers = _load_handlers()
+    except Exception as e:
+        _send({"id": None, "error": f"Tiingo worker start failed: {type(e).__name__}: {e}"})
+        return 1
+    _send({"id": None, "ready": True})
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                _send({"id": None, "error": "Invalid JSON request"})
+                continue
+            pool.submit(_handle, handlers, request)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())